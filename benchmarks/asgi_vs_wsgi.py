@@ -0,0 +1,126 @@
+"""
+Throughput and tail latency of the sync views under WSGI against the async views under ASGI.
+
+Both applications are driven in-process, so no server has to be installed:
+WSGI requests run on a thread pool of ``--concurrency`` workers, the way a
+threaded WSGI server would serve them, and ASGI requests are that many
+concurrent tasks on one event loop. ``--db-latency`` adds a sleep to every
+query to stand in for a networked database.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+from common import scratch_database, seed
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db.backends import utils
+from django.urls import reverse
+from rest_framework.views import APIView
+
+from watchlist_app.models import StreamPlatform, Watchlist
+
+
+def wsgi_environ(path, query):
+    return {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO()}
+
+
+def asgi_scope(path, query):
+    return {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver')], 'server': ('testserver', 80), 'client': ('127.0.0.1', 0)}
+
+
+def run_wsgi(application, path, query, requests, concurrency):
+    def request():
+        start = time.perf_counter()
+        result = application(wsgi_environ(path, query), lambda status, headers, exc_info=None: None)
+        for _ in result:
+            pass
+        result.close()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(lambda _: request(), range(requests)))
+        return time.perf_counter() - start, latencies
+
+
+async def run_asgi(application, path, query, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    # The client never hangs up, so the handler's disconnect listener just waits.
+    connected = asyncio.Event()
+
+    async def send(message):
+        pass
+
+    async def request():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await connected.wait()
+
+        async with semaphore:
+            start = time.perf_counter()
+            await application(asgi_scope(path, query), receive, send)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(request() for _ in range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--db-latency', type=float, default=0.0, help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    execute = utils.CursorWrapper._execute
+
+    def slow_execute(self, *execute_args, **kwargs):
+        time.sleep(args.db_latency / 1000)
+        return execute(self, *execute_args, **kwargs)
+
+    # The response cache only serves the sync routes, which would leave WSGI timing cache hits.
+    with scratch_database(), mock.patch.object(APIView, 'check_throttles'), \
+            mock.patch.dict(settings.WATCHMATE_RESPONSE_CACHE, {'ENABLED': False}):
+        seed(users=50, watchlists=200, reviews=5000)
+        watchlist = Watchlist.objects.first().pk
+        platform = StreamPlatform.objects.first().pk
+        endpoints = [('movie-list', (), ''), ('movie-list', (), 'page=2'), ('movie-detail', (watchlist,), ''),
+                     ('review-list', (watchlist,), ''), ('streamplatform-detail', (platform,), '')]
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+
+        print(f'{"endpoint":<32} {"server":<6} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+        with mock.patch.object(utils.CursorWrapper, '_execute', slow_execute):
+            for name, url_args, query in endpoints:
+                for server, async_prefix in (('wsgi', ''), ('asgi', 'async-')):
+                    path = reverse(f'watchlist_app:{async_prefix}{name}', args=url_args)
+                    if server == 'wsgi':
+                        elapsed, latencies = run_wsgi(wsgi, path, query, args.requests, args.concurrency)
+                    else:
+                        elapsed, latencies = asyncio.run(
+                            run_asgi(asgi, path, query, args.requests, args.concurrency))
+                    label = f'{name}?{query}' if query else name
+                    print(f'{label:<32} {server:<6} {args.requests / elapsed:>8.0f} '
+                          f'{statistics.median(latencies) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
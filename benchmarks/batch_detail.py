@@ -0,0 +1,65 @@
+"""
+A carousel of --titles watchlists loaded one WatchDetailAV GET per title versus
+one batch GET (?ids=...), with a cold and a warm detail cache. Requests carry a
+DB token, so each one pays authentication as it would from the front end.
+"""
+import argparse
+
+from common import median_time, scratch_database, seed
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from watchlist_app.models import Watchlist
+
+
+def count_queries(func):
+    """SQL queries run by ``func()``; CaptureQueriesContext loses count as each request resets the log."""
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        func()
+    return len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seed(users=1, watchlists=max(args.titles, 1000), reviews=0)
+        token = Token.objects.create(user=User.objects.first())
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        ids = list(Watchlist.objects.order_by('?').values_list('pk', flat=True)[:args.titles])
+
+        def per_title():
+            for pk in ids:
+                client.get(reverse('watchlist_app:movie-detail', args=[pk]))
+
+        def batch():
+            client.get(reverse('watchlist_app:movie-batch'), {'ids': ','.join(map(str, ids))})
+
+        print(f'{"strategy":<10} {"requests":>9} {"cold":>9} {"queries":>8} {"warm":>9} {"queries":>8}')
+        for name, load, requests in (('per-title', per_title, len(ids)), ('batch', batch, 1)):
+            def cold():
+                cache.clear()
+                load()
+
+            cold_queries, warm_queries = count_queries(cold), count_queries(load)
+            cold_time, warm_time = median_time(cold), median_time(load)
+            print(f'{name:<10} {requests:>9} {cold_time * 1000:>7.1f}ms {cold_queries:>8} '
+                  f'{warm_time * 1000:>7.1f}ms {warm_queries:>8}')
+
+
+if __name__ == '__main__':
+    main()
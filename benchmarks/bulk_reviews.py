@@ -0,0 +1,46 @@
+"""Throughput of ReviewBulkCreate vs looping the single ReviewCreate endpoint."""
+import argparse
+import time
+from unittest import mock
+
+from common import scratch_database, seed
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from watchlist_app.models import Review, Watchlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reviews', type=int, default=2000)
+    args = parser.parse_args()
+
+    with scratch_database(), mock.patch.object(APIView, 'check_throttles'):
+        seed(users=2, watchlists=args.reviews, reviews=0)
+        single_user, bulk_user = User.objects.order_by('pk')
+        watchlist_ids = list(Watchlist.objects.order_by('pk').values_list('pk', flat=True))
+        client = APIClient()
+
+        client.force_authenticate(single_user)
+        start = time.perf_counter()
+        for watchlist_id in watchlist_ids:
+            client.post(reverse('watchlist_app:review-create', args=[watchlist_id]),
+                        {'rating': 4, 'watchlist': watchlist_id, 'active': True}, format='json')
+        single = time.perf_counter() - start
+
+        client.force_authenticate(bulk_user)
+        start = time.perf_counter()
+        client.post(reverse('watchlist_app:review-bulk-create'),
+                    [{'watchlist': watchlist_id, 'rating': 4} for watchlist_id in watchlist_ids], format='json')
+        bulk = time.perf_counter() - start
+
+        assert Review.objects.count() == 2 * len(watchlist_ids)
+        print(f'single endpoint: {args.reviews / single:>10.0f} reviews/s')
+        print(f'bulk endpoint:   {args.reviews / bulk:>10.0f} reviews/s ({single / bulk:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
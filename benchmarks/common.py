@@ -0,0 +1,52 @@
+"""
+Shared setup for the standalone benchmark scripts in this directory.
+
+Each script runs against a throwaway copy of the test database, e.g.::
+
+    python benchmarks/pagination.py --rows 1000000
+"""
+import logging
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'watchmate.settings')
+
+import django  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+django.setup()
+setup_test_environment()
+# SQL debug logging would dominate every measurement.
+logging.getLogger('django').setLevel(logging.WARNING)
+
+from django.db import connection  # noqa: E402
+
+from watchlist_app.seeding import rebuild_derived, seed  # noqa: E402, F401
+from watchlist_app.tasks import stop_queue  # noqa: E402
+
+
+@contextmanager
+def scratch_database():
+    """Create an empty, migrated database for the duration of a benchmark."""
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        # The write-behind dispatcher started by the first request must not outlive its database.
+        stop_queue()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def median_time(func, repeat=5):
+    """Median wall-clock seconds of ``func()`` over ``repeat`` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
@@ -0,0 +1,103 @@
+"""
+Concurrent ReviewCreate writers against readers, before and after the SQLite connection profile.
+
+"baseline" is SQLite's defaults: a rollback journal, synchronous=FULL and a new
+connection per request. "profile" is WATCHMATE_SQLITE_PRAGMAS (WAL,
+synchronous=NORMAL, mmap) with persistent connections. Under WAL readers stop
+waiting for the writer, and commits skip most fsyncs, so the writer lock is
+held for less time.
+"""
+import argparse
+import threading
+import time
+from unittest import mock
+
+from common import scratch_database, seed
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from watchlist_app.models import Watchlist
+
+CONFIGURATIONS = {
+    'baseline': ({'journal_mode': 'DELETE', 'synchronous': 'FULL'}, 0),
+    'profile': (settings.WATCHMATE_SQLITE_PRAGMAS, 600),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def worker(requests, results, errors):
+    client = APIClient()
+    client.raise_request_exception = False
+    for send in requests:
+        start = time.perf_counter()
+        response = send(client)
+        results.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+    connections.close_all()
+
+
+def run(writers, readers, requests):
+    users = User.objects.filter(username__startswith='writer').order_by('pk')
+    watchlist_ids = list(Watchlist.objects.order_by('pk').values_list('pk', flat=True))
+    write_latencies, read_latencies, errors = [], [], []
+    threads = []
+    for user in users[:writers]:
+        key = Token.objects.get(user=user).key
+
+        def write(client, pk, key=key):
+            return client.post(reverse('watchlist_app:review-create', args=[pk]),
+                               {'watchlist': pk, 'rating': 4, 'description': 'Concurrent'},
+                               HTTP_AUTHORIZATION=f'Token {key}')
+
+        sends = [lambda client, pk=pk, write=write: write(client, pk) for pk in watchlist_ids[:requests]]
+        threads.append(threading.Thread(target=worker, args=(sends, write_latencies, errors)))
+    for i in range(readers):
+        pk = watchlist_ids[i % len(watchlist_ids)]
+        sends = [lambda client, pk=pk: client.get(reverse('watchlist_app:review-list', args=[pk]))] * requests
+        threads.append(threading.Thread(target=worker, args=(sends, read_latencies, errors)))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, write_latencies, read_latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+    args = parser.parse_args()
+
+    print(f'{"configuration":<14} {"writes/s":>9} {"write p50":>10} {"write p99":>10} '
+          f'{"read p50":>9} {"read p99":>9} {"errors":>7}')
+    for name, (pragmas, conn_max_age) in CONFIGURATIONS.items():
+        with override_settings(WATCHMATE_SQLITE_PRAGMAS=pragmas), scratch_database(), \
+                mock.patch.object(APIView, 'check_throttles'), \
+                mock.patch.dict(connections.settings['default'], {'CONN_MAX_AGE': conn_max_age}):
+            connections.close_all()
+            seed(users=args.writers, watchlists=args.requests, reviews=0, username_prefix='writer')
+            Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in User.objects.all())
+            connections.close_all()
+            elapsed, writes, reads, errors = run(args.writers, args.readers, args.requests)
+        print(f'{name:<14} {len(writes) / elapsed:>9.0f} {percentile(writes, 0.5) * 1000:>8.1f}ms '
+              f'{percentile(writes, 0.99) * 1000:>8.1f}ms {percentile(reads, 0.5) * 1000:>7.1f}ms '
+              f'{percentile(reads, 0.99) * 1000:>7.1f}ms {len(errors):>7}')
+
+
+if __name__ == '__main__':
+    main()
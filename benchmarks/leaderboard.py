@@ -0,0 +1,42 @@
+"""Top-N latency: WatchListGV ordered by avg_rating vs the precomputed leaderboard endpoint."""
+import argparse
+from unittest import mock
+
+from common import median_time, scratch_database, seed
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from watchlist_app.leaderboards import refresh_scores
+from watchlist_app.ratings import reconcile_ratings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--watchlists', type=int, default=100_000)
+    parser.add_argument('--reviews', type=int, default=500_000)
+    args = parser.parse_args()
+
+    client = APIClient()
+    with scratch_database(), mock.patch.object(APIView, 'check_throttles'):
+        seed(users=-(-args.reviews // args.watchlists), platforms=20, watchlists=args.watchlists,
+             reviews=args.reviews)
+        reconcile_ratings()
+        print(f'{args.watchlists} watchlists, {args.reviews} reviews; '
+              f'refresh_leaderboards: {median_time(refresh_scores, repeat=1):.2f} s')
+
+        ordered = reverse('watchlist_app:movie-new')
+        board = reverse('watchlist_app:movie-leaderboard')
+        print(f'{"request":<44} {"ms":>8}')
+        for label, url, params in (
+                ('list2/?ordering=-avg_rating (first page)', ordered, {'ordering': '-avg_rating'}),
+                ('leaderboard/?n=10', board, {'n': 10}),
+                ('leaderboard/?n=100', board, {'n': 100}),
+                ('leaderboard/?n=100&platform=1', board, {'n': 100, 'platform': 1}),
+                ('leaderboard/?n=100&kind=trending', board, {'n': 100, 'kind': 'trending'})):
+            print(f'{label:<44} {median_time(lambda: client.get(url, params)) * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
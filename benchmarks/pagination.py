@@ -0,0 +1,46 @@
+"""Deep-page latency of keyset (ReviewKeysetPagination) vs offset (LOPagination) pagination."""
+import argparse
+
+from common import median_time, scratch_database, seed
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from watchlist_app.api.pagination import LOPagination, ReviewKeysetPagination
+from watchlist_app.models import Review, Watchlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='number of reviews to generate')
+    parser.add_argument('--watchlists', type=int, default=10)
+    args = parser.parse_args()
+
+    factory = APIRequestFactory()
+    with scratch_database():
+        seed(users=-(-args.rows // args.watchlists), watchlists=args.watchlists, reviews=args.rows)
+        watchlist = Watchlist.objects.order_by('pk').first()
+        queryset = Review.objects.filter(watchlist=watchlist).order_by('-created', '-id')
+        per_watchlist = queryset.count()
+        keyset = ReviewKeysetPagination()
+
+        print(f'{args.rows} reviews, {per_watchlist} in the paged watchlist')
+        print(f'{"depth":>10} {"offset ms":>12} {"keyset ms":>12}')
+        for depth in sorted({0, per_watchlist // 100, per_watchlist // 10, per_watchlist // 2,
+                             per_watchlist - keyset.page_size - 1}):
+            anchor = queryset[depth - 1] if depth else None
+            offset_request = Request(factory.get('/', {'skip': depth, 'limit': keyset.page_size}))
+            cursor = keyset.encode_cursor(anchor) if anchor else ''
+            keyset_request = Request(factory.get('/', {'size': keyset.page_size, 'cursor': cursor}))
+
+            def offset_page():
+                LOPagination().paginate_queryset(queryset, offset_request)
+
+            def keyset_page():
+                ReviewKeysetPagination().paginate_queryset(queryset, keyset_request)
+
+            print(f'{depth:>10} {median_time(offset_page) * 1000:>12.2f} {median_time(keyset_page) * 1000:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
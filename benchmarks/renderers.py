@@ -0,0 +1,34 @@
+"""Encoding time of DRF's JSONRenderer vs FastJSONRenderer on StreamPlatformSerializer payloads."""
+import argparse
+
+from common import median_time, scratch_database, seed
+
+from rest_framework.renderers import JSONRenderer
+
+from watchlist_app.api.optimizers import optimize_queryset
+from watchlist_app.api.serializers import StreamPlatformSerializer
+from watchlist_app.models import StreamPlatform
+from watchmate.renderers import FastJSONRenderer, orjson
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--watchlists', type=int, default=20000)
+    parser.add_argument('--platforms', type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seed(platforms=args.platforms, watchlists=args.watchlists, reviews=0)
+        queryset = optimize_queryset(StreamPlatform.objects.all(), StreamPlatformSerializer)
+        data = StreamPlatformSerializer(queryset, many=True).data
+
+    size = len(JSONRenderer().render(data)) / 1e6
+    print(f'payload: {args.platforms} platforms, {args.watchlists} watchlists, {size:.1f} MB '
+          f'(orjson {"installed" if orjson else "missing, fallback in use"})')
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        seconds = median_time(lambda: renderer.render(data))
+        print(f'{type(renderer).__name__:<18} {seconds * 1000:>8.1f} ms {size / seconds:>8.1f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Throughput, p50/p95/p99 latency and queries per request for every API route.
+
+Seeds a scratch database (see ``manage.py seed_benchmark``), sends
+``--requests`` requests to each case below through the test client, one at a
+time, and prints the results as JSON with stable key order, so runs from two
+commits can be diffed or checked with ``--compare``::
+
+    python benchmarks/routes.py --output before.json
+    git checkout feature && python benchmarks/routes.py --compare before.json
+
+Write cases build a fresh target for every request (a new user, review or
+token) before the clock starts, so each request does the same work.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from collections import Counter
+from importlib import import_module
+from unittest import mock
+
+from common import rebuild_derived, scratch_database, seed
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from user_app.api.serializers import ClaimsTokenObtainPairSerializer
+from watchlist_app.management.commands.seed_benchmark import PRESETS
+from watchlist_app.models import Review, StreamPlatform, Watchlist
+
+URLCONFS = {'watchlist_app': 'watchlist_app.api.urls', 'user_app': 'user_app.api.urls'}
+PASSWORD = 'bench-password'
+
+
+class Fixture:
+    """Rows shared by the cases, created once after seeding."""
+
+    def __init__(self):
+        self.staff = f'Token {Token.objects.create(user=User.objects.create(username="bench-staff", is_staff=True))}'
+        self.reviewer = User.objects.create_user('bench-reviewer', password=PASSWORD)
+        self.watchlist = Watchlist.objects.order_by('pk').first()
+        self.platform = StreamPlatform.objects.order_by('pk').first()
+        self.review = Review.objects.create(review_user=self.reviewer, watchlist=self.watchlist, rating=4,
+                                            description='Benchmark review')
+        self.watchlist_ids = list(Watchlist.objects.order_by('pk').values_list('pk', flat=True)[:20])
+        self.users = 0
+
+    def new_user(self):
+        self.users += 1
+        user = User.objects.create(username=f'bench-user-{self.users}')
+        return user, f'Token {Token.objects.create(user=user)}'
+
+    def jwt(self):
+        return ClaimsTokenObtainPairSerializer.get_token(self.reviewer)
+
+
+class Case:
+    """
+    One request shape against a named route. ``prepare(fixture, i)`` returns the
+    per-request parts (args, query, data, auth) and runs outside the timing.
+    """
+
+    def __init__(self, name, method='get', label='', prepare=None, **parts):
+        self.name = name
+        self.method = method
+        self.label = label
+        self.prepare = prepare
+        self.parts = parts
+
+    @property
+    def key(self):
+        return f'{self.name} {self.method.upper()}' + (f' [{self.label}]' if self.label else '')
+
+    def request(self, fixture, i):
+        parts = {'args': (), 'query': None, 'data': None, 'auth': None}
+        parts.update({name: value(fixture) if callable(value) else value for name, value in self.parts.items()})
+        if self.prepare:
+            parts.update(self.prepare(fixture, i))
+        return parts
+
+
+def _new_review(fixture, i):
+    user, auth = fixture.new_user()
+    review = Review.objects.create(review_user=user, watchlist=fixture.watchlist, rating=3, description='Doomed')
+    return {'args': (review.pk,), 'auth': auth}
+
+
+def _new_watchlist(fixture, i):
+    watchlist = Watchlist.objects.create(platform=fixture.platform, title=f'Doomed {i}', description='Benchmark')
+    return {'args': (watchlist.pk,)}
+
+
+def _new_review_post(fixture, i):
+    _, auth = fixture.new_user()
+    return {'auth': auth, 'data': {'watchlist': fixture.watchlist.pk, 'rating': 4, 'description': 'Benchmark'}}
+
+
+def _new_bulk_post(fixture, i):
+    _, auth = fixture.new_user()
+    return {'auth': auth, 'data': [{'watchlist': pk, 'rating': pk % 5 + 1} for pk in fixture.watchlist_ids]}
+
+
+def _new_logout(fixture, i):
+    return {'auth': fixture.new_user()[1]}
+
+
+def _register(fixture, i):
+    return {'data': {'username': f'bench-new-{i}', 'email': f'bench-new-{i}@example.com', 'password': PASSWORD,
+                     'password2': PASSWORD}}
+
+
+def _credentials(fixture):
+    return {'username': fixture.reviewer.username, 'password': PASSWORD}
+
+
+def _watchlist(fixture):
+    return (fixture.watchlist.pk,)
+
+
+CASES = [
+    Case('watchlist_app:api-root'),
+    Case('watchlist_app:movie-list'),
+    Case('watchlist_app:movie-list', label='page', query={'page': 2}),
+    Case('watchlist_app:movie-detail', args=_watchlist),
+    Case('watchlist_app:movie-detail', 'delete', auth=lambda fixture: fixture.staff, prepare=_new_watchlist),
+    Case('watchlist_app:movie-batch',
+         query=lambda fixture: {'ids': ','.join(str(pk) for pk in fixture.watchlist_ids)}),
+    Case('watchlist_app:movie-new'),
+    Case('watchlist_app:movie-search', query={'q': 'title 1'}),
+    Case('watchlist_app:movie-leaderboard'),
+    Case('watchlist_app:movie-leaderboard', label='trending', query={'kind': 'trending'}),
+    Case('watchlist_app:streamplatform-list'),
+    Case('watchlist_app:streamplatform-list', 'post', auth=lambda fixture: fixture.staff,
+         prepare=lambda fixture, i: {'data': {'name': f'Bench {i}', 'about': 'Benchmark',
+                                              'website': 'https://example.com'}}),
+    Case('watchlist_app:streamplatform-detail', args=lambda fixture: (fixture.platform.pk,)),
+    Case('watchlist_app:review-create', 'post', args=_watchlist, prepare=_new_review_post),
+    Case('watchlist_app:review-list', args=_watchlist),
+    Case('watchlist_app:review-detail', args=lambda fixture: (fixture.review.pk,)),
+    Case('watchlist_app:review-detail', 'put', args=lambda fixture: (fixture.review.pk,),
+         auth=lambda fixture: f'Bearer {fixture.jwt().access_token}',
+         prepare=lambda fixture, i: {'data': {'watchlist': fixture.watchlist.pk, 'rating': i % 5 + 1,
+                                              'description': 'Updated'}}),
+    Case('watchlist_app:review-detail', 'delete', prepare=_new_review),
+    Case('watchlist_app:user-review-detail', query={'username': 'user1'}),
+    Case('watchlist_app:reviewer-profile', args=('user1',)),
+    Case('watchlist_app:review-bulk-create', 'post', prepare=_new_bulk_post),
+    Case('watchlist_app:async-movie-list'),
+    Case('watchlist_app:async-movie-detail', args=_watchlist),
+    Case('watchlist_app:async-review-list', args=_watchlist),
+    Case('watchlist_app:async-streamplatform-list'),
+    Case('watchlist_app:async-streamplatform-detail', args=lambda fixture: (fixture.platform.pk,)),
+    # A replay of the log written by the cases above; main() ends the stream after the first batch.
+    Case('watchlist_app:change-feed', query={'since': 0}),
+    Case('user_app:login', 'post', data=_credentials),
+    Case('user_app:register', 'post', prepare=_register),
+    Case('user_app:logout', 'post', prepare=_new_logout),
+    Case('user_app:token_obtain_pair', 'post', data=_credentials),
+    Case('user_app:token_refresh', 'post', prepare=lambda fixture, i: {'data': {'refresh': str(fixture.jwt())}}),
+    Case('user_app:token_logout', 'post',
+         prepare=lambda fixture, i: {'auth': f'Bearer {fixture.jwt().access_token}'}),
+]
+
+
+def route_names():
+    """Every named route in the API urlconfs, namespaced like reverse() expects."""
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+
+    return {f'{namespace}:{name}' for namespace, module in URLCONFS.items()
+            for name in walk(import_module(module).urlpatterns)}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_case(client, fixture, case, requests, warmup):
+    latencies, queries, statuses = [], [], Counter()
+    for i in range(warmup + requests):
+        parts = case.request(fixture, i)
+        path = reverse(case.name, args=parts['args'])
+        extra = {'HTTP_AUTHORIZATION': parts['auth']} if parts['auth'] else {}
+        send = getattr(client, case.method)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            if case.method == 'get':
+                response = send(path, parts['query'], **extra)
+            else:
+                response = send(path, parts['data'], format='json', **extra)
+            if response.streaming:
+                with warnings.catch_warnings():
+                    # Async views stream from an async iterator, consumed synchronously here.
+                    warnings.simplefilter('ignore')
+                    b''.join(response)
+            elapsed = time.perf_counter() - start
+            query_count = len(captured)
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(query_count)
+            statuses[str(response.status_code)] += 1
+    return {
+        'requests': requests,
+        'throughput': round(requests / sum(latencies), 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def compare(baseline, results, threshold, routes=''):
+    """Print per-route changes of the cases matching ``routes``; returns the keys that regressed."""
+    regressions = []
+    print(f'{"route":<58} {"p95 ms":>19} {"queries/req":>15}  status', file=sys.stderr)
+    for key in sorted(key for key in set(baseline['routes']) | set(results['routes']) if routes in key):
+        before, after = baseline['routes'].get(key), results['routes'].get(key)
+        if before is None or after is None:
+            print(f'{key:<58} {"new" if before is None else "removed"}', file=sys.stderr)
+            continue
+        slower = after['p95_ms'] > before['p95_ms'] * (1 + threshold)
+        more_queries = after['queries_per_request'] > before['queries_per_request']
+        status_changed = after['statuses'] != before['statuses']
+        flag = 'REGRESSION' if slower or more_queries or status_changed else ''
+        if flag:
+            regressions.append(key)
+        print(f'{key:<58} {before["p95_ms"]:>8.2f} -> {after["p95_ms"]:>8.2f} '
+              f'{before["queries_per_request"]:>6.1f} -> {after["queries_per_request"]:>5.1f}  {flag}',
+              file=sys.stderr)
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per case')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per case, run first')
+    parser.add_argument('--routes', default='', help='only run cases whose key contains this text')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to diff against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p95 slowdown (as a fraction) that --compare reports as a regression')
+    args = parser.parse_args()
+
+    uncovered = route_names() - {case.name for case in CASES}
+    if uncovered:
+        parser.error(f'no benchmark case for {", ".join(sorted(uncovered))}')
+
+    results = {
+        'meta': {'commit': git_commit(), 'preset': args.preset, **PRESETS[args.preset], 'requests': args.requests,
+                 'python': platform.python_version(), 'django': django.get_version(),
+                 'database': connection.vendor},
+        'routes': {},
+    }
+    # Change feed streams stop after replaying one batch instead of staying open for new events.
+    with scratch_database(), mock.patch.object(APIView, 'check_throttles'), \
+            mock.patch.dict(settings.WATCHMATE_CHANGE_FEED, {'MAX_DURATION': 0}):
+        seed(**PRESETS[args.preset])
+        rebuild_derived()
+        fixture = Fixture()
+        client = APIClient()
+        client.raise_request_exception = False
+        for case in CASES:
+            if args.routes in case.key:
+                print(f'{case.key} ...', file=sys.stderr)
+                results['routes'][case.key] = run_case(client, fixture, case, args.requests, args.warmup)
+
+    output = json.dumps(results, indent=2, sort_keys=True) + '\n'
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        sys.stdout.write(output)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold, args.routes)
+        if regressions:
+            sys.exit(f'{len(regressions)} route(s) regressed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Watchlist search latency: icontains scan vs the FTS5 and in-process BM25 search backends."""
+import argparse
+import random
+
+from common import median_time, scratch_database, seed
+
+from django.db import transaction
+from django.db.models import Q
+
+from watchlist_app.models import StreamPlatform, Watchlist
+from watchlist_app.search import FTS5SearchBackend, PythonSearchBackend, SearchResults, tokenize
+
+WORDS = ('dark knight city night shift river storm garden empire shadow silver ocean winter summer '
+         'ghost machine island secret broken golden last first lost hidden wild iron crown glass '
+         'velvet thunder echo harbor desert forest signal orbit').split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--watchlists', type=int, default=100_000)
+    parser.add_argument('--page-size', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with scratch_database():
+        seed(users=1, platforms=5, watchlists=0, reviews=0)
+        platform_ids = list(StreamPlatform.objects.values_list('pk', flat=True))
+        with transaction.atomic():
+            # Unique serial words keep the vocabulary realistic in size, not just the 40 common words.
+            Watchlist.objects.bulk_create(
+                (Watchlist(title=' '.join(rng.sample(WORDS, 3)) + f' s{i}',
+                           description=' '.join(rng.choices(WORDS, k=12)), platform_id=platform_ids[i % 5])
+                 for i in range(args.watchlists)), batch_size=5000)
+        fts5 = FTS5SearchBackend('default')
+        build = median_time(fts5.rebuild, repeat=1)
+        python = PythonSearchBackend()
+        python_build = median_time(python.rebuild, repeat=1)
+        print(f'{args.watchlists} watchlists; index build: FTS5 {build:.2f} s, python {python_build:.2f} s')
+
+        print(f'{"query":<16} {"icontains ms":>13} {"fts5 ms":>9} {"python ms":>10} {"matches":>8}')
+        for query in ('storm', 'silver ghost', 'empire cr', 's4242', 'nothingmatches'):
+            terms = tokenize(query)
+
+            def icontains():
+                condition = Q()
+                for term in terms:
+                    condition &= Q(title__icontains=term) | Q(description__icontains=term)
+                queryset = Watchlist.objects.filter(condition).order_by('pk')
+                queryset.count()
+                list(queryset[:args.page_size])
+
+            def backend_page(backend):
+                python.ranked = None  # time the ranking, not the memoized last query
+                results = SearchResults(query, backend=backend)
+                results.count()
+                return results[:args.page_size]
+
+            timings = [median_time(icontains), median_time(lambda: backend_page(fts5)),
+                       median_time(lambda: backend_page(python))]
+            matches = SearchResults(query, backend=fts5).count()
+            print(f'{query:<16} ' + ' '.join(f'{t * 1000:>{w}.2f}' for t, w in zip(timings, (13, 9, 10)))
+                  + f' {matches:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Rows/sec of the DRF serializers vs the values()-based FastSerializer for the list endpoints."""
+import argparse
+
+from common import median_time, scratch_database, seed
+
+from watchlist_app.api.fastpath import FastSerializer
+from watchlist_app.api.optimizers import optimize_queryset
+from watchlist_app.api.serializers import StreamPlatformSerializer, WatchlistSerializer
+from watchlist_app.models import StreamPlatform, Watchlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--watchlists', type=int, default=20000)
+    parser.add_argument('--platforms', type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seed(platforms=args.platforms, watchlists=args.watchlists, reviews=0)
+        cases = [
+            ('WatchlistSerializer', Watchlist.objects.all(), WatchlistSerializer),
+            ('StreamPlatformSerializer', StreamPlatform.objects.all(), StreamPlatformSerializer),
+        ]
+        for name, queryset, serializer_class in cases:
+            optimized = optimize_queryset(queryset, serializer_class)
+            fast = FastSerializer.for_serializer(serializer_class)
+            drf_time = median_time(lambda: serializer_class(optimized.all(), many=True).data, repeat=3)
+            fast_time = median_time(lambda: fast.serialize(queryset.all()), repeat=3)
+            print(f'{name:<26} drf {args.watchlists / drf_time:>10.0f} rows/s   '
+                  f'fast {args.watchlists / fast_time:>10.0f} rows/s   ({drf_time / fast_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
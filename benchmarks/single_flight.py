@@ -0,0 +1,82 @@
+"""
+Concurrent GET /watch/<pk>/ for one title right after its cache entry was
+invalidated, with and without single-flight.
+
+Every round bumps the title's version, then --threads clients request it at
+once. Without single-flight each cache miss builds the payload itself; with it
+one build serves them all. "collapse" is the share of requests served without
+a build of their own.
+"""
+import argparse
+import threading
+import time
+from unittest import mock
+
+from common import scratch_database, seed
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from watchlist_app import caching
+from watchlist_app.models import Watchlist
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_round(url, threads, latencies):
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        client = APIClient()
+        barrier.wait()
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - start)
+        connections.close_all()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"single-flight":<14} {"builds/round":>12} {"collapse":>9} {"p50":>9} {"p99":>9} {"round":>9}')
+    with scratch_database():
+        seed(users=1, watchlists=10, reviews=0)
+        pk = Watchlist.objects.order_by('pk').values_list('pk', flat=True).first()
+        url = reverse('watchlist_app:movie-detail', args=[pk])
+        for enabled in (False, True):
+            builds, latencies, elapsed = [], [], 0.0
+            make_entry = caching._make_entry
+
+            def counted(*entry_args):
+                builds.append(1)
+                return make_entry(*entry_args)
+
+            with mock.patch.dict(settings.WATCHMATE_SINGLE_FLIGHT, {'ENABLED': enabled}), \
+                    mock.patch.object(caching, '_make_entry', counted):
+                for _ in range(args.rounds):
+                    caching.invalidate('watchlist', pk)
+                    start = time.perf_counter()
+                    run_round(url, args.threads, latencies)
+                    elapsed += time.perf_counter() - start
+            requests = args.rounds * args.threads
+            print(f'{"on" if enabled else "off":<14} {len(builds) / args.rounds:>12.1f} '
+                  f'{1 - len(builds) / requests:>8.1%} {percentile(latencies, 0.5) * 1000:>7.1f}ms '
+                  f'{percentile(latencies, 0.99) * 1000:>7.1f}ms {elapsed / args.rounds * 1000:>7.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
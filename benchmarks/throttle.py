@@ -0,0 +1,48 @@
+"""Per-check cost of DRF's SimpleRateThrottle (timestamp list) vs the sliding-window counter."""
+import argparse
+
+from common import median_time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from user_app.api.throtlling import SlidingWindowAnonRateThrottle
+
+
+def make_throttle(throttle_class, rate):
+    throttle = throttle_class.__new__(throttle_class)
+    throttle.rate = rate
+    throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+    return throttle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--checks', type=int, default=2000)
+    args = parser.parse_args()
+
+    request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+    request.user = AnonymousUser()
+    print(f'{"rate":>10} {"SimpleRateThrottle":>20} {"SlidingWindow":>15}')
+    for limit in (10, 100, 1000, 10000):
+        rate = f'{limit}/min'
+        timings = []
+        for throttle_class in (AnonRateThrottle, SlidingWindowAnonRateThrottle):
+            throttle = make_throttle(throttle_class, rate)
+            clock = iter(range(10 ** 9))
+            # Spread the checks over one window so the history list holds up to ``limit`` entries.
+            throttle.timer = lambda: 1_000_000 + next(clock) * 60 / args.checks
+
+            def run():
+                cache.clear()
+                for _ in range(args.checks):
+                    throttle.allow_request(request, None)
+
+            timings.append(median_time(run) / args.checks * 1e6)
+        print(f'{rate:>10} {timings[0]:>17.1f} µs {timings[1]:>12.1f} µs')
+
+
+if __name__ == '__main__':
+    main()
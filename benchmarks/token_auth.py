@@ -0,0 +1,60 @@
+"""Queries and latency per authenticated ReviewList GET with DB tokens, cached DB tokens and stateless JWTs."""
+import argparse
+from unittest import mock
+
+from common import median_time, scratch_database, seed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from user_app.api.authentication import (CachedTokenAuthentication, JWTClaimsAuthentication, get_token_cache,
+                                         token_cache_stats)
+from user_app.api.serializers import ClaimsTokenObtainPairSerializer
+from watchlist_app.api.views import ReviewList
+from watchlist_app.models import Watchlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    with scratch_database(), mock.patch.object(APIView, 'check_throttles'):
+        seed(users=50, watchlists=20, reviews=1000)
+        user = User.objects.first()
+        token = Token.objects.create(user=user)
+        access = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        url = reverse('watchlist_app:review-list', args=[Watchlist.objects.first().pk])
+        client = APIClient()
+
+        print(f'{"authentication":<28} {"auth queries/req":>17} {"total queries/req":>18} {"ms/req":>8}')
+        for authentication_class, header in ((TokenAuthentication, f'Token {token.key}'),
+                                             (CachedTokenAuthentication, f'Token {token.key}'),
+                                             (JWTClaimsAuthentication, f'Bearer {access}')):
+            client.credentials(HTTP_AUTHORIZATION=header)
+            get_token_cache.cache_clear()
+            token_cache_stats.reset()
+            with mock.patch.object(ReviewList, 'authentication_classes', [authentication_class]):
+                client.get(url)  # warm the token cache
+
+                def run():
+                    for _ in range(args.requests):
+                        client.get(url)
+
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+                total_queries = len(queries)
+                auth_queries = sum('authtoken_token' in query['sql'] for query in queries)
+                seconds = median_time(run)
+            print(f'{authentication_class.__name__:<28} {auth_queries / args.requests:>17.2f} '
+                  f'{total_queries / args.requests:>18.2f} {seconds / args.requests * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Latency of a reviewer's history (first and a deep keyset page) and profile as
+the reviewer's review count grows; both should stay flat.
+"""
+import argparse
+from unittest import mock
+
+from common import median_time, scratch_database, seed
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from watchlist_app.profiles import refresh_profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated review counts')
+    parser.add_argument('--depth', type=int, default=20, help='pages walked for the deep page')
+    args = parser.parse_args()
+
+    print(f'{"reviews":>8} {"first page":>11} {"deep page":>10} {"profile":>9}')
+    for size in map(int, args.sizes.split(',')):
+        with scratch_database(), mock.patch.object(APIView, 'check_throttles'):
+            seed(users=1, watchlists=size, reviews=size, username_prefix='power')
+            refresh_profiles()
+            client = APIClient()
+            url = reverse('watchlist_app:user-review-detail')
+            first = median_time(lambda: client.get(url, {'username': 'power0'}))
+
+            next_url = f'{url}?username=power0'
+            for _ in range(args.depth):
+                next_url = client.get(next_url).data['next'] or next_url
+            deep = median_time(lambda: client.get(next_url))
+            profile = median_time(lambda: client.get(reverse('watchlist_app:reviewer-profile', args=['power0'])))
+        print(f'{size:>8} {first * 1000:>9.2f}ms {deep * 1000:>8.2f}ms {profile * 1000:>7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+ReviewCreate latency with the rating recompute inline ("sync") vs deferred to
+the write-behind queue ("thread"), for a burst of reviews of one watchlist.
+
+The aggregates are updated by each review either way. For the queue it also
+reports how many recomputes the burst cost and how long after the last write
+the Bayesian score, change feed and cached payloads had caught up.
+"""
+import argparse
+import statistics
+import time
+from unittest import mock
+
+from common import scratch_database, seed
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from watchlist_app import tasks
+from watchlist_app.models import OutboxTask, Watchlist
+from watchlist_app.ratings import recompute_rating
+
+
+def recomputes():
+    key = (('outcome', 'done'), ('task', tasks.task_name(recompute_rating)))
+    return tasks.TASKS.values.get(key, 0)
+
+
+def burst(reviews):
+    watchlist = Watchlist.objects.get()
+    url = reverse('watchlist_app:review-create', args=[watchlist.pk])
+    client = APIClient()
+    latencies = []
+    for user in User.objects.order_by('pk')[:reviews]:
+        client.force_authenticate(user)
+        start = time.perf_counter()
+        response = client.post(url, {'rating': 4, 'watchlist': watchlist.pk}, format='json')
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 201, response.status_code
+    return watchlist, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=1000)
+    parser.add_argument('--delay', type=float, default=settings.WATCHMATE_TASKS['RATING_DELAY'],
+                        help='RATING_DELAY, the coalescing window in seconds')
+    args = parser.parse_args()
+
+    print(f'{"mode":<8} {"p50":>8} {"p99":>8} {"recomputes":>11} {"converged after":>16}')
+    for mode in ('sync', 'thread'):
+        with scratch_database(), mock.patch.object(APIView, 'check_throttles'), \
+                mock.patch.dict(settings.WATCHMATE_TASKS, {'MODE': mode, 'RATING_DELAY': args.delay}):
+            seed(users=args.reviews, watchlists=1, reviews=0)
+            before = recomputes()
+            watchlist, latencies = burst(args.reviews)
+            written = time.perf_counter()
+            while OutboxTask.objects.exists():
+                time.sleep(0.01)
+            converged = time.perf_counter() - written
+            tasks.stop_queue()
+            watchlist.refresh_from_db()
+            assert watchlist.number_rating == args.reviews, watchlist.number_rating
+            latencies.sort()
+            runs = recomputes() - before if mode == 'thread' else args.reviews
+            print(f'{mode:<8} {statistics.median(latencies) * 1000:>6.2f}ms '
+                  f'{latencies[int(0.99 * (len(latencies) - 1))] * 1000:>6.2f}ms {runs:>11} '
+                  f'{converged * 1000 if mode == "thread" else 0:>14.0f}ms')
+            connections.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from user_app.api.revocation import get_revocation_list
+from watchmate.metrics import registry
+
+TOKEN_CACHE = registry.counter('watchmate_token_cache_total', 'Token authentications, by token cache outcome.')
+
+
+class LocalTokenCache:
+    """In-process LRU of token key -> (user, token) with a TTL; invalidation only reaches this process."""
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            credentials, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return credentials
+
+    def set(self, key, credentials):
+        with self.lock:
+            self.entries[key] = (credentials, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SharedTokenCache:
+    """Token key -> (user, token) kept in a Django cache, so invalidation reaches every worker."""
+
+    def __init__(self, alias='default', ttl=300):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f'watchmate:token:{key}'
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, credentials):
+        self.cache.set(self._key(key), credentials, self.ttl)
+
+    def delete(self, *keys):
+        self.cache.delete_many([self._key(key) for key in keys])
+
+    def __len__(self):
+        return 0
+
+
+class TokenCacheStats:
+    """Hit and miss counts of this process, read from the watchmate_token_cache_total counter."""
+
+    @property
+    def hits(self):
+        return TOKEN_CACHE.values.get((('outcome', 'hit'),), 0)
+
+    @property
+    def misses(self):
+        return TOKEN_CACHE.values.get((('outcome', 'miss'),), 0)
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hit_ratio,
+                'size': len(get_token_cache())}
+
+    def reset(self):
+        with TOKEN_CACHE.lock:
+            TOKEN_CACHE.values.clear()
+
+
+token_cache_stats = TokenCacheStats()
+
+
+@lru_cache(maxsize=None)
+def get_token_cache():
+    config = getattr(settings, 'WATCHMATE_TOKEN_CACHE', {})
+    ttl = config.get('TTL', 300)
+    if config.get('BACKEND', 'local') == 'shared':
+        return SharedTokenCache(config.get('ALIAS', 'default'), ttl)
+    return LocalTokenCache(config.get('MAXSIZE', 10000), ttl)
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    if setting == 'WATCHMATE_TOKEN_CACHE':
+        get_token_cache.cache_clear()
+
+
+def invalidate_tokens(*keys):
+    get_token_cache().delete(*keys)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created=False, **kwargs):
+    # Deactivation, password and permission changes must not be served from a stale user.
+    if not created:
+        invalidate_tokens(*Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers token -> user, so warm requests skip
+    the Token/User join. Entries are dropped when the token is deleted or the
+    user is saved, and expire after ``WATCHMATE_TOKEN_CACHE['TTL']`` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        credentials = cache.get(key)
+        if credentials is not None:
+            TOKEN_CACHE.inc(outcome='hit')
+            return credentials
+
+        TOKEN_CACHE.inc(outcome='miss')
+        credentials = super().authenticate_credentials(key)
+        cache.set(key, credentials)
+        return credentials
+
+
+class ClaimsTokenUser(TokenUser):
+    """TokenUser whose id has the User primary key's type, so it compares equal to ``*_user_id`` columns."""
+
+    @cached_property
+    def id(self):
+        return User._meta.pk.to_python(self.token[jwt_settings.USER_ID_CLAIM])
+
+
+class JWTClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    Bearer JWT authentication that never touches the database: the user is a
+    TokenUser built from the token's claims (user_id, username, is_staff), and
+    logged-out tokens are rejected through the in-memory revocation list.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if get_revocation_list().is_revoked(validated_token[jwt_settings.JTI_CLAIM]):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
@@ -0,0 +1,120 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+
+class BloomFilter:
+    """Fixed-size bloom filter; ``capacity`` items keep false positives near ``error_rate``."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked JWT ids, checked on every request without a database round trip.
+
+    Revoked ids go into a pair of bloom filters: the current generation and the
+    previous one. A generation lasts as long as the longest-lived token, so an
+    id is remembered until the token it names has expired anyway, and memory
+    stays fixed however many tokens are revoked. Revocations are also appended
+    to a shared cache log, which other processes replay every ``sync_interval``
+    seconds. The log starts a new epoch whenever its counter has to be created
+    again, e.g. after an eviction or a cache restart, and readers then replay
+    it from the beginning.
+    """
+
+    def __init__(self, capacity=100000, error_rate=1e-6, sync_interval=5, alias='default'):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.cache = caches[alias]
+        self.lifetime = max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME).total_seconds()
+        self.lock = threading.Lock()
+        self.generation = None
+        self.current = self.previous = None
+        self.synced_at = 0.0
+        # Start from the beginning so a fresh worker learns about earlier revocations.
+        self.log_position = 0
+        self.log_epoch = None
+
+    def _rotate(self, now):
+        generation = int(now // self.lifetime)
+        if generation != self.generation:
+            if self.generation is not None and generation == self.generation + 1:
+                self.previous = self.current
+            else:
+                self.previous = BloomFilter(self.capacity, self.error_rate)
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.generation = generation
+
+    def _add(self, jti):
+        with self.lock:
+            self._rotate(time.time())
+            self.current.add(jti)
+
+    def revoke(self, jti):
+        self._add(jti)
+        if self.cache.add('watchmate:jwt:revoked', 0, None):
+            self.cache.set('watchmate:jwt:revoked:epoch', uuid.uuid4().hex, None)
+        position = self.cache.incr('watchmate:jwt:revoked')
+        self.cache.set(f'watchmate:jwt:revoked:{position}', jti, self.lifetime)
+
+    def sync(self):
+        """Replay revocations recorded by other processes since the last sync."""
+        now = time.monotonic()
+        if now - self.synced_at < self.sync_interval:
+            return
+        self.synced_at = now
+        log = self.cache.get_many(['watchmate:jwt:revoked', 'watchmate:jwt:revoked:epoch'])
+        position, epoch = log.get('watchmate:jwt:revoked', 0), log.get('watchmate:jwt:revoked:epoch')
+        if epoch != self.log_epoch or position < self.log_position:
+            # The log was lost and started over; its positions no longer match ours.
+            self.log_epoch, self.log_position = epoch, 0
+        for start in range(self.log_position + 1, position + 1, 1000):
+            keys = [f'watchmate:jwt:revoked:{n}' for n in range(start, min(start + 1000, position + 1))]
+            for jti in self.cache.get_many(keys).values():
+                self._add(jti)
+        self.log_position = position
+
+    def is_revoked(self, jti):
+        self.sync()
+        with self.lock:
+            self._rotate(time.time())
+            return jti in self.current or jti in self.previous
+
+
+@lru_cache(maxsize=None)
+def get_revocation_list():
+    config = getattr(settings, 'WATCHMATE_JWT_REVOCATION', {})
+    return RevocationList(config.get('CAPACITY', 100000), config.get('ERROR_RATE', 1e-6),
+                          config.get('SYNC_INTERVAL', 5), config.get('ALIAS', 'default'))
+
+
+@receiver(setting_changed)
+def reset_revocation_list(setting, **kwargs):
+    if setting in ('WATCHMATE_JWT_REVOCATION', 'SIMPLE_JWT'):
+        get_revocation_list.cache_clear()
@@ -1,5 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from user_app.api.revocation import get_revocation_list
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -26,3 +31,44 @@ class RegistrationSerializer(serializers.ModelSerializer):
         user.set_password(password)
         user.save()
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the claims JWTClaimsAuthentication builds its TokenUser from."""
+
+    @classmethod
+    def get_token(cls, user):
+        return cls.set_claims(super().get_token(user), user)
+
+    @staticmethod
+    def set_claims(token, user):
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        return token
+
+
+class RevocationCheckingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses revoked refresh tokens and revokes the old one when it is rotated.
+    The user is read again, so the new tokens carry its current username and
+    is_staff, and a deleted or deactivated user cannot refresh.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        revocation_list = get_revocation_list()
+        if revocation_list.is_revoked(refresh[jwt_settings.JTI_CLAIM]):
+            raise InvalidToken('Token has been revoked')
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: refresh.get(jwt_settings.USER_ID_CLAIM)}).first()
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise InvalidToken(self.error_messages['no_active_account'])
+        ClaimsTokenObtainPairSerializer.set_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            revocation_list.revoke(refresh[jwt_settings.JTI_CLAIM])
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -1,8 +1,148 @@
-from  rest_framework.throttling import UserRateThrottle
+import sqlite3
+import threading
+import time
+from functools import lru_cache
 
-class ReviewCreateThrottle(UserRateThrottle):
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle, AnonRateThrottle, ScopedRateThrottle
+
+
+class CacheCounterStore:
+    """Counters kept in a Django cache; needs a backend with atomic incr (locmem, redis, memcached)."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def incr(self, key, delta, ttl):
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # Expired between add() and incr().
+            self.cache.add(key, delta, ttl)
+            return delta
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+
+class SQLiteCounterStore:
+    """Counters in a standalone SQLite file, shared by every worker process on the host."""
+    purge_every = 1000
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+        self.writes = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS throttle_counter '
+                               '(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL)')
+            self.local.connection = connection
+        return connection
+
+    def incr(self, key, delta, ttl):
+        now = time.time()
+        self.writes += 1
+        if self.writes % self.purge_every == 0:
+            self.connection.execute('DELETE FROM throttle_counter WHERE expires < ?', (now,))
+        # A single upsert statement, so concurrent increments cannot be lost.
+        row = self.connection.execute(
+            'INSERT INTO throttle_counter (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'value = CASE WHEN expires < ? THEN excluded.value ELSE value + excluded.value END, '
+            'expires = CASE WHEN expires < ? THEN excluded.expires ELSE expires END '
+            'RETURNING value',
+            (key, delta, now + ttl, now, now),
+        ).fetchone()
+        return row[0]
+
+    def get(self, key):
+        row = self.connection.execute('SELECT value FROM throttle_counter WHERE key = ? AND expires >= ?',
+                                      (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+
+@lru_cache(maxsize=None)
+def _load_store(backend, options):
+    return import_string(backend)(**dict(options))
+
+
+def get_counter_store():
+    config = getattr(settings, 'WATCHMATE_THROTTLE_STORE', {})
+    backend = config.get('BACKEND', 'user_app.api.throtlling.CacheCounterStore')
+    return _load_store(backend, tuple(sorted(config.get('OPTIONS', {}).items())))
+
+
+@receiver(setting_changed)
+def reset_counter_store(setting, **kwargs):
+    if setting == 'WATCHMATE_THROTTLE_STORE':
+        _load_store.cache_clear()
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window counter: the previous fixed window's count, weighted by how
+    much of it still overlaps the sliding window, plus the current window's
+    count. Every check is one atomic increment and one read of fixed-size
+    counters, whatever the rate, instead of rewriting a list of timestamps.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        store = get_counter_store()
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        self.elapsed = offset / self.duration
+        current_key = f'{self.key}:{int(window)}'
+        self.previous = store.get(f'{self.key}:{int(window) - 1}')
+        self.current = store.incr(current_key, 1, self.duration * 2)
+        if self.previous * (1 - self.elapsed) + self.current <= self.num_requests:
+            return self.throttle_success()
+        # Rejected requests do not count against the window.
+        self.current = store.incr(current_key, -1, self.duration * 2)
+        return self.throttle_failure()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        if self.current >= self.num_requests or not self.previous:
+            return (1 - self.elapsed) * self.duration
+        # Time until the previous window's weighted share leaves room for one more request.
+        free = self.num_requests - self.current - 1
+        return max(0.0, (1 - free / self.previous - self.elapsed) * self.duration)
+
+
+class SlidingWindowUserRateThrottle(UserRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class SlidingWindowAnonRateThrottle(AnonRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class SlidingWindowScopedRateThrottle(ScopedRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class ReviewCreateThrottle(SlidingWindowUserRateThrottle):
     scope = 'review-create'
 
 
-class ReviewListThrottle(UserRateThrottle):
-    scope = 'review-list'
\ No newline at end of file
+class ReviewListThrottle(SlidingWindowUserRateThrottle):
+    scope = 'review-list'
@@ -1,8 +1,8 @@
 from rest_framework.authtoken.views import obtain_auth_token
 from django.urls import path
 
-from user_app.views import registration_view, logout_view
-# from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from user_app.views import registration_view, logout_view, jwt_logout_view
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 # from .views import UserCreateView
 app_name = "user_app"
 
@@ -11,8 +11,9 @@ urlpatterns = [
     path('login/', obtain_auth_token, name='login'),
     path('register/', registration_view, name='register'),
     path('logout/', logout_view, name='logout'),
+    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/logout/', jwt_logout_view, name='token_logout'),
     # path('logout/', obtain_auth_token, name='logout'),
     # path('register/', registration_view, name='register'),
-    # path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    # path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
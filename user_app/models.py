@@ -3,8 +3,15 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from watchlist_app import tasks
+
+
+def create_token(user_id):
+    Token.objects.get_or_create(user_id=user_id)
+
 
 @receiver(post_save, sender=User)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
+    # Off the request path; login uses get_or_create too, so an early login is unaffected.
     if created:
-        Token.objects.create(user=instance)
+        tasks.defer(create_token, instance.pk, key=f'auth-token:{instance.pk}')
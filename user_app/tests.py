@@ -1,8 +1,21 @@
-from rest_framework.test import APITestCase
+import os
+import tempfile
+
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from user_app.api.authentication import (CachedTokenAuthentication, JWTClaimsAuthentication, get_token_cache,
+                                         token_cache_stats)
+from user_app.api.revocation import BloomFilter, RevocationList
+from user_app.api.throtlling import SQLiteCounterStore, SlidingWindowUserRateThrottle, get_counter_store
+from watchlist_app.models import Review, StreamPlatform, Watchlist
+from watchmate.metrics import registry
 
 
 class UserRegistrationTest(APITestCase):
@@ -40,3 +53,177 @@ class LoginLogoutTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['message'], 'Logged out successfully')
 
+
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        get_token_cache.cache_clear()
+        token_cache_stats.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def authenticate(self):
+        return CachedTokenAuthentication().authenticate(self.request)
+
+    def test_warm_cache_skips_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+        self.assertEqual(token_cache_stats.as_dict(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5, 'size': 1})
+        self.assertIn('watchmate_token_cache_total{outcome="hit"} 1\n', registry.render())
+
+    def test_logout_invalidates(self):
+        self.authenticate()
+        response = self.client.post(reverse('user_app:logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('user_app:logout'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_shared_backend(self):
+        cache.clear()
+        with self.settings(WATCHMATE_TOKEN_CACHE={'BACKEND': 'shared', 'ALIAS': 'default', 'TTL': 60}):
+            self.authenticate()
+            with self.assertNumQueries(0):
+                self.authenticate()
+            self.token.delete()
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
+
+
+class JWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=True)
+        response = self.client.post(reverse('user_app:token_obtain_pair'),
+                                    {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.access, self.refresh = response.data['access'], response.data['refresh']
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + access)
+        return JWTClaimsAuthentication().authenticate(request)
+
+    def test_verify_without_queries(self):
+        with self.assertNumQueries(0):
+            user, token = self.authenticate(self.access)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'testuser', True))
+
+    def test_create_review_with_jwt(self):
+        platform = StreamPlatform.objects.create(name='Netflix', about='Streaming', website='https://netflix.com')
+        watchlist = Watchlist.objects.create(title='Movie', description='Description', platform=platform)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access)
+        response = self.client.post(reverse('watchlist_app:review-create', args=[watchlist.pk]),
+                                    {'rating': 4, 'description': 'Good', 'watchlist': watchlist.pk, 'active': True},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Review.objects.get().review_user, self.user)
+
+    def test_refresh_rotates(self):
+        url = reverse('user_app:token_refresh')
+        response = self.client.post(url, {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.authenticate(response.data['access'])[0].username, 'testuser')
+        response = self.client.post(url, {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reloads_claims(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.post(reverse('user_app:token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user, token = self.authenticate(response.data['access'])
+        self.assertFalse(user.is_staff)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        response = self.client.post(reverse('watchlist_app:streamplatform-list'),
+                                    {'name': 'Netflix', 'about': 'Streaming', 'website': 'https://netflix.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_rejects_missing_user(self):
+        self.user.delete()
+        response = self.client.post(reverse('user_app:token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejects_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(reverse('user_app:token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access)
+        response = self.client.post(reverse('user_app:token_logout'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertRaises(InvalidToken):
+            self.authenticate(self.access)
+        response = self.client.post(reverse('user_app:token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_logout_with_jwt(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access)
+        response = self.client.post(reverse('user_app:logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertRaises(InvalidToken):
+            self.authenticate(self.access)
+
+    def test_revocations_replayed_after_log_reset(self):
+        reader, writer = RevocationList(sync_interval=0), RevocationList(sync_interval=0)
+        for n in range(3):
+            writer.revoke(f'before-{n}')
+        self.assertTrue(reader.is_revoked('before-2'))
+        cache.clear()
+        writer.revoke('after')
+        self.assertTrue(reader.is_revoked('after'))
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=1000, error_rate=1e-3)
+        for n in range(1000):
+            bloom.add(f'revoked-{n}')
+        self.assertTrue(all(f'revoked-{n}' in bloom for n in range(1000)))
+        self.assertLess(sum(f'valid-{n}' in bloom for n in range(10000)), 50)
+
+
+class SlidingWindowThrottleTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.request = APIRequestFactory().get('/')
+        self.request.user = self.user
+
+    def make_throttle(self, now, rate='4/m'):
+        throttle = SlidingWindowUserRateThrottle.__new__(SlidingWindowUserRateThrottle)
+        throttle.rate = rate
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.timer = lambda: now
+        return throttle
+
+    def check(self, now):
+        return self.make_throttle(now).allow_request(self.request, None)
+
+    def test_limits_and_slides(self):
+        start = 600.0
+        self.assertEqual([self.check(start + i) for i in range(5)], [True, True, True, True, False])
+        # Halfway through the next window the previous one still weighs 4 * 0.5 = 2.
+        self.assertEqual([self.check(start + 90) for _ in range(3)], [True, True, False])
+        throttle = self.make_throttle(start + 90)
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_sqlite_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = {'BACKEND': 'user_app.api.throtlling.SQLiteCounterStore',
+                     'OPTIONS': {'path': os.path.join(directory, 'throttle.sqlite3')}}
+            with self.settings(WATCHMATE_THROTTLE_STORE=store):
+                self.assertEqual([self.check(600.0) for _ in range(5)], [True, True, True, True, False])
+                self.assertIsInstance(get_counter_store(), SQLiteCounterStore)
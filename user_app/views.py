@@ -1,11 +1,16 @@
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from user_app.api.serializers import RegistrationSerializer
+from user_app.api.authentication import JWTClaimsAuthentication
+from user_app.api.revocation import get_revocation_list
+from user_app.api.serializers import ClaimsTokenObtainPairSerializer, RegistrationSerializer
 # from user_app import models
 
 
@@ -14,7 +19,32 @@ def logout_view(request):
     if not request.user.is_authenticated:
         return Response({"error": "User is not authenticated"}, status=status.HTTP_400_BAD_REQUEST)
 
-    request.user.auth_token.delete()
+    if isinstance(request.auth, Token):
+        request.auth.delete()
+    elif request.auth is not None and jwt_settings.JTI_CLAIM in request.auth:
+        # A bearer JWT has no Token row; revoke it as jwt_logout_view does.
+        get_revocation_list().revoke(request.auth[jwt_settings.JTI_CLAIM])
+    else:
+        Token.objects.filter(user=request.user).delete()
+    return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@authentication_classes([JWTClaimsAuthentication])
+@permission_classes([IsAuthenticated])
+def jwt_logout_view(request):
+    revocation_list = get_revocation_list()
+    refresh = request.data.get('refresh')
+    if refresh:
+        try:
+            refresh = RefreshToken(refresh)
+        except TokenError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.pk):
+            return Response({"error": "Refresh token belongs to another user"}, status=status.HTTP_400_BAD_REQUEST)
+        revocation_list.revoke(refresh[jwt_settings.JTI_CLAIM])
+
+    revocation_list.revoke(request.auth[jwt_settings.JTI_CLAIM])
     return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
 
 
@@ -30,7 +60,7 @@ def registration_view(request):
             data['email'] = user.email
             # token = Token.objects.get(user=user)
             # data['token'] = token.key
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsTokenObtainPairSerializer.get_token(user)
             data['token'] = {
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
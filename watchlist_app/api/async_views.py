@@ -0,0 +1,166 @@
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from watchlist_app import caching, changefeed
+from watchlist_app.api.optimizers import optimize_queryset, ordering_columns
+from watchlist_app.api.serializers import (ReviewSerializer, StreamPlatformSerializer, WatchlistSerializer,
+                                          field_selection)
+from watchlist_app.api.streaming import EventStreamRenderer, NDJSONRenderer, astream_queryset
+from watchlist_app.api.views import ReviewList, StreamPlatformVS, WatchDetailAV, WatchListAv
+from watchlist_app.models import Review, StreamPlatform, Watchlist
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, for read endpoints served under ASGI.
+
+    Authentication, permission and throttle checks are the regular DRF ones;
+    they run together in one ``sync_to_async`` call because authenticators and
+    throttle stores may do blocking I/O. Handlers then use the async ORM, so a
+    request waiting on the database does not hold a worker thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncWatchListAv(AsyncAPIView):
+    permission_classes = WatchListAv.permission_classes
+    renderer_classes = WatchListAv.renderer_classes
+    filterset_fields = WatchListAv.filterset_fields
+    pagination_class = WatchListAv.pagination_class
+    chunk_size = WatchListAv.chunk_size
+
+    async def get(self, request):
+        context = {'request': request}
+        movies = optimize_queryset(Watchlist.objects.order_by('id'), WatchlistSerializer(context=context))
+        # Validating a foreign key filter looks the related row up, so the filterset runs in a thread.
+        movies = await sync_to_async(DjangoFilterBackend().filter_queryset)(request, movies, self)
+
+        if request.query_params.get(self.pagination_class.page_query_param):
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_queryset(movies, request, view=self)
+            return paginator.get_paginated_response(WatchlistSerializer(page, many=True, context=context).data)
+
+        ndjson = isinstance(request.accepted_renderer, NDJSONRenderer)
+        return astream_queryset(movies, WatchlistSerializer, chunk_size=self.chunk_size, ndjson=ndjson,
+                                context=context)
+
+
+class AsyncWatchDetailAV(AsyncAPIView):
+    permission_classes = WatchDetailAV.permission_classes
+
+    async def get(self, request, pk):
+        async def build():
+            serializer = WatchlistSerializer(context={'request': request})
+            try:
+                serializer.instance = await optimize_queryset(Watchlist.objects.all(), serializer,
+                                                              ['updated']).aget(pk=pk)
+            except Watchlist.DoesNotExist:
+                return None
+            return serializer.data, serializer.instance.updated
+
+        entry = await caching.aget_detail('watchlist', pk, build, field_selection(request))
+        if entry is None:
+            return Response({'message': 'Movie not found'}, status=status.HTTP_400_BAD_REQUEST)
+        return caching.detail_response(request, entry)
+
+
+class AsyncReviewList(AsyncAPIView):
+    permission_classes = ReviewList.permission_classes
+    throttle_classes = ReviewList.throttle_classes
+    pagination_class = ReviewList.pagination_class
+    filterset_fields = ReviewList.filterset_fields
+
+    def permission_denied(self, request, message=None, code=None):
+        raise PermissionDenied(detail="You do not have permission to modify the review list.")
+
+    async def get(self, request, pk):
+        context = {'request': request}
+        reviews = optimize_queryset(Review.objects.filter(watchlist=pk), ReviewSerializer(context=context),
+                                    ordering_columns(self.pagination_class.ordering))
+        reviews = await sync_to_async(DjangoFilterBackend().filter_queryset)(request, reviews, self)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(reviews, request, view=self)
+        return paginator.get_paginated_response(ReviewSerializer(page, many=True, context=context).data)
+
+
+class AsyncStreamPlatformList(AsyncAPIView):
+    permission_classes = StreamPlatformVS.permission_classes
+
+    async def get(self, request):
+        context = {'request': request}
+        platforms = optimize_queryset(StreamPlatform.objects.all(), StreamPlatformSerializer(context=context))
+        return Response(StreamPlatformSerializer([platform async for platform in platforms], many=True,
+                                                 context=context).data)
+
+
+class AsyncStreamPlatformDetail(AsyncAPIView):
+    permission_classes = StreamPlatformVS.permission_classes
+
+    async def get(self, request, pk):
+        async def build():
+            serializer = StreamPlatformSerializer(context={'request': request})
+            try:
+                serializer.instance = await optimize_queryset(StreamPlatform.objects.all(), serializer).aget(pk=pk)
+            except StreamPlatform.DoesNotExist:
+                return None
+            # StreamPlatform has no updated column, so the payload's build time stands in for it.
+            return serializer.data, timezone.now()
+
+        entry = await caching.aget_detail('platform', pk, build, field_selection(request))
+        if entry is None:
+            return Response({'detail': 'No StreamPlatform matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        return caching.detail_response(request, entry)
+
+
+class ChangeFeed(AsyncAPIView):
+    """
+    Server-sent events of watchlist and review changes (see watchlist_app.changefeed)
+    after ``?since=`` or the Last-Event-ID of a reconnecting EventSource; without
+    either, from now on. ``?watchlist=`` follows one watchlist and its reviews.
+    """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer]
+
+    async def get(self, request):
+        try:
+            since = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+            since = int(since) if since else None
+            watchlist = request.query_params.get('watchlist')
+            watchlist = int(watchlist) if watchlist else None
+        except ValueError:
+            return Response({'message': 'since, Last-Event-ID and watchlist must be integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if since is None:
+            since = await changefeed.ahead()
+        response = StreamingHttpResponse(changefeed.stream(since, watchlist),
+                                         content_type=EventStreamRenderer.media_type)
+        response['Cache-Control'] = 'no-cache'
+        # Keeps proxies such as nginx from buffering the events.
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,137 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+def optimize_queryset(queryset, serializer, extra_fields=(), cached=()):
+    """
+    Apply select_related/prefetch_related to ``queryset`` so that rendering it
+    with ``serializer`` (a class or an instance) runs a constant number of queries.
+
+    When the serializer leaves fields out (see DynamicFieldsMixin), only the
+    columns it renders and ``extra_fields`` are loaded, and relations it does
+    not render are not joined or prefetched. Relations in ``cached`` are
+    already set on every row (e.g. by a related manager) and are not joined.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select, prefetch, columns = [], [], []
+    complete = _collect(serializer, queryset.model, '', select, prefetch, columns, skip=cached)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if complete and getattr(serializer, 'selects_fields', False):
+        queryset = queryset.only(*columns, *extra_fields)
+    return queryset
+
+
+def ordering_columns(ordering):
+    """Columns a paginator reads off its rows for cursors, to keep out of defer()."""
+    if isinstance(ordering, str):
+        ordering = [ordering]
+    return [field.lstrip('-') for field in ordering]
+
+
+def _collect(serializer, model, prefix, select, prefetch, columns, skip=()):
+    """
+    Gather the relations ``serializer`` follows and the columns it reads.
+    Returns False when some field reads something other than model fields,
+    in which case ``columns`` is incomplete and every column must be loaded.
+    """
+    complete = True
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            complete = False
+            continue
+        if field.source_attrs[0] in skip:
+            # The parent is cached on the row, but its key still has to be loaded.
+            columns.append(prefix + field.source_attrs[0])
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            relation = model._meta.get_field(field.source)
+            child_queryset = relation.related_model._default_manager.all()
+            child_select, child_prefetch, child_columns = [], [], []
+            # The reverse prefetch already caches the parent on every child row.
+            child_complete = _collect(field.child, relation.related_model, '', child_select, child_prefetch,
+                                      child_columns, skip=(relation.field.name,))
+            if child_select:
+                child_queryset = child_queryset.select_related(*child_select)
+            if child_prefetch:
+                child_queryset = child_queryset.prefetch_related(*child_prefetch)
+            if child_complete and getattr(field.child, 'selects_fields', False):
+                child_queryset = child_queryset.only(*child_columns, relation.field.name)
+            prefetch.append(Prefetch(prefix + field.source, queryset=child_queryset))
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            relation = model._meta.get_field(field.source)
+            select.append(prefix + field.source)
+            columns.append(prefix + field.source)
+            nested = prefix + field.source + '__'
+            nested_columns = []
+            if _collect(field, relation.related_model, nested, select, prefetch, nested_columns):
+                columns.extend(nested_columns)
+            else:
+                columns.extend(nested + column.name for column in relation.related_model._meta.concrete_fields)
+            continue
+
+        attrs = list(field.source_attrs)
+        needs_object = (
+            isinstance(field, ManyRelatedField)
+            or (isinstance(field, RelatedField) and not field.use_pk_only_optimization())
+        )
+        complete = _read(model, attrs, needs_object, prefix, columns) and complete
+        if not needs_object:
+            attrs = attrs[:-1]
+        _follow(model, attrs, prefix, select, prefetch)
+    return complete
+
+
+def _read(model, attrs, needs_object, prefix, columns):
+    """Add the columns read by a field with source ``attrs``; False if it is not a model field."""
+    path = []
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+        if field.many_to_many or field.one_to_many:
+            # Prefetched separately, as whole objects.
+            return True
+        if not field.concrete:
+            return False
+        path.append(attr)
+        columns.append(prefix + '__'.join(path))
+        if not field.is_relation:
+            return True
+        model = field.related_model
+    if needs_object:
+        # Related fields render the object itself (e.g. its __str__), which may read any column.
+        columns.extend(prefix + '__'.join(path + [column.name]) for column in model._meta.concrete_fields)
+    return True
+
+
+def _follow(model, attrs, prefix, select, prefetch):
+    path = []
+    for attr in attrs:
+        try:
+            relation = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not relation.is_relation:
+            break
+        path.append(attr)
+        if relation.many_to_many or relation.one_to_many:
+            prefetch.append(prefix + '__'.join(path))
+            return
+        model = relation.related_model
+    if path:
+        select.append(prefix + '__'.join(path))
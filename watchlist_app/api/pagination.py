@@ -1,7 +1,39 @@
-from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination, CursorPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, PageNumberPagination, LimitOffsetPagination,
+                                       CursorPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-class WatchListPagination(PageNumberPagination):
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """PageNumberPagination that can also paginate from async views with the async ORM."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Prime the cached count so Paginator.page() only builds a lazy slice.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class WatchListPagination(AsyncPageNumberPagination):
     page_size = 3
     # page_query_param = 'p'
     page_size_query_param = 'size'
@@ -19,4 +51,106 @@ class LOPagination(LimitOffsetPagination):
 class WatchListCPagination(CursorPagination):
     page_size = 3
     ordering = 'title'
-    cursor_query_param = 'orderBy'
\ No newline at end of file
+    cursor_query_param = 'orderBy'
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full ``ordering`` tuple, so every page
+    costs the same index range scan no matter how deep the client has paged.
+    """
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = 'size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created', '-id')
+    total_query_param = 'total'
+    # Counting stops here, so ?total=1 never turns into a COUNT(*) over a huge table.
+    max_total_count = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page, total = self._page_querysets(queryset, request)
+        self.total = total.count() if total is not None else None
+        return self._set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page, total = self._page_querysets(queryset, request)
+        self.total = await total.acount() if total is not None else None
+        return self._set_page([obj async for obj in page])
+
+    def _page_querysets(self, queryset, request):
+        """The (unevaluated) page query, one row longer to detect a next page, and the ?total= query."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        total = None
+        if request.query_params.get(self.total_query_param):
+            total = queryset.order_by()[:self.max_total_count + 1]
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+        return queryset[:self.page_size + 1], total
+
+    def _set_page(self, results):
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def seek_filter(self, position):
+        # (a, b) < (x, y) is spelled a <= x AND (a < x OR (a = x AND b < y)); the
+        # leading range term lets the database seek on the index instead of scanning.
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def encode_cursor(self, instance):
+        position = [instance._meta.get_field(field.lstrip('-')).value_to_string(instance)
+                    for field in self.ordering]
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(token.encode()).decode())
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return [model._meta.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        token = self.encode_cursor(self.page[-1])
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link()}
+        if self.total is not None:
+            response['total'] = min(self.total, self.max_total_count)
+            response['total_is_estimate'] = self.total > self.max_total_count
+        response['results'] = data
+        return Response(response)
+
+
+class ReviewKeysetPagination(KeysetPagination):
+    page_size = 10
+    max_page_size = 50
@@ -12,4 +12,4 @@ class IsReviewUserOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.review_user == request.user or request.user.is_staff
+        return obj.review_user_id == request.user.pk or request.user.is_staff
@@ -1,5 +1,31 @@
 from rest_framework import serializers
-from watchlist_app.models import Watchlist, StreamPlatform, Review
+from rest_framework.permissions import SAFE_METHODS
+from watchlist_app import caching
+from watchlist_app.models import Watchlist, StreamPlatform, Review, ReviewerProfile, CACHE_KINDS
+
+SELECTION_PARAMS = ('fields', 'omit', 'expand')
+
+
+def parse_field_paths(value):
+    """'id,watchlist.title' -> {'id': {}, 'watchlist': {'title': {}}}; lists and parsed trees are accepted too."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        value = ','.join(value)
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def field_selection(request):
+    """The request's ?fields=/?omit=/?expand= as a string usable in cache keys; '' when it has none."""
+    if request.method not in SAFE_METHODS:
+        return ''
+    return '&'.join(f'{name}={request.query_params[name]}' for name in SELECTION_PARAMS
+                    if name in request.query_params)
 
 
 def name_length(value):
@@ -8,13 +34,80 @@ def name_length(value):
     return value
 
 
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for a serializer: ``fields`` keeps only the named fields,
+    ``omit`` drops fields and ``expand`` renders the relations listed in
+    Meta.expandable_fields as nested objects. Names are comma-separated, and
+    ``a.b`` passes ``b`` on to the nested serializer of field ``a``. They are
+    keyword arguments or, for a serializer built with a GET request in its
+    context, the ?fields=, ?omit= and ?expand= query parameters.
+
+    optimize_queryset() reads the selection back to load only what is rendered.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = (self._context or {}).get('request')
+        if fields is None and omit is None and expand is None and request is not None \
+                and request.method in SAFE_METHODS:
+            fields, omit, expand = (request.query_params.get(name) for name in SELECTION_PARAMS)
+        self.selected = None if fields is None else parse_field_paths(fields)
+        self.omitted = parse_field_paths(omit or '')
+        self.expanded = parse_field_paths(expand or '')
+
+    @property
+    def selects_fields(self):
+        """Whether some of the serializer's fields are left out."""
+        return self.selected is not None or any(not nested for nested in self.omitted.values())
+
+    def narrow(self, fields=None, omit=None, expand=None):
+        """Apply a parent serializer's selection on top of this one's own."""
+        if fields:
+            self.selected = fields
+        self.omitted = {**self.omitted, **(omit or {})}
+        self.expanded = {**self.expanded, **(expand or {})}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in self.expanded:
+            if name in expandable:
+                serializer_class, options = expandable[name]
+                if isinstance(serializer_class, str):
+                    serializer_class = globals()[serializer_class]
+                fields[name] = serializer_class(read_only=True, **options)
+        if self.selected is not None:
+            fields = {name: field for name, field in fields.items() if name in self.selected}
+        fields = {name: field for name, field in fields.items() if self.omitted.get(name, True)}
+
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.narrow((self.selected or {}).get(name), self.omitted.get(name), self.expanded.get(name))
+        return fields
+
+
+class CacheTagMixin:
+    """
+    Tags the response being built with every object rendered (see caching.tag()).
+    A watchlist's platform name is covered by the watchlist's own version.
+    """
+
+    def to_representation(self, instance):
+        caching.tag(CACHE_KINDS[self.Meta.model], instance.pk)
+        return super().to_representation(instance)
+
+
 # Review Serializer
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     review_user = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = Review
         fields = '__all__'
+        # Serializer class (or its name in this module) and options of each relation ?expand= can nest.
+        expandable_fields = {'watchlist': ('WatchlistSerializer', {})}
 
     def validate(self, data):
         user = self.context['request'].user  # Get the logged-in user
@@ -22,21 +115,40 @@ class ReviewSerializer(serializers.ModelSerializer):
 
         # Check if the request is for update
         if self.instance is None:  # Only enforce for new reviews
-            if Review.objects.filter(review_user=user, watchlist=watchlist).exists():
+            if Review.objects.filter(review_user_id=user.pk, watchlist=watchlist).exists():
                 raise serializers.ValidationError("You have already reviewed this watchlist.")
 
         return data
 
 
+# Bulk review item: the watchlist is a plain id so that existence and
+# duplicate checks can be done once for the whole batch.
+class ReviewBulkItemSerializer(serializers.ModelSerializer):
+    watchlist = serializers.IntegerField()
+
+    class Meta:
+        model = Review
+        fields = ['watchlist', 'rating', 'description', 'active']
+
+
+class ReviewerProfileSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = ReviewerProfile
+        fields = ['username', 'review_count', 'avg_rating', 'last_activity']
+
+
 # Watchlist Serializer
-class WatchlistSerializer(serializers.ModelSerializer):
+class WatchlistSerializer(CacheTagMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     title = serializers.CharField(validators=[name_length])
     # reviews = ReviewSerializer(many=True, read_only=True)
     platform = serializers.CharField(source='platform.name')
 
     class Meta:
         model = Watchlist
-        fields = '__all__'
+        exclude = ['rating_sum']
+        expandable_fields = {'platform': ('StreamPlatformSerializer', {'omit': 'watchlist'})}
 
     def validate(self, data):
         if data['title'] == data['description']:
@@ -45,7 +157,7 @@ class WatchlistSerializer(serializers.ModelSerializer):
 
 
 # StreamPlatform Serializer
-class StreamPlatformSerializer(serializers.ModelSerializer):
+class StreamPlatformSerializer(CacheTagMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     watchlist = WatchlistSerializer(many=True, read_only=True)
 
     class Meta:
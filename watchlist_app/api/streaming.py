@@ -0,0 +1,94 @@
+from django.http import StreamingHttpResponse
+
+from watchmate.renderers import FastJSONRenderer
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(super().render(row) + b'\n' for row in rows)
+
+
+class EventStreamRenderer(FastJSONRenderer):
+    """Negotiated by EventSource clients; responses other than the stream itself become one error event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b'event: error\ndata: ' + super().render(data) + b'\n\n'
+
+
+class _ChunkEncoder:
+    """
+    Serializes rows and frames every ``chunk_size`` of them as one chunk of a
+    JSON array or NDJSON body; the sync and async streams share it.
+    """
+
+    def __init__(self, serializer_class, chunk_size, ndjson, context):
+        self.serializer_class = serializer_class
+        self.chunk_size = chunk_size
+        self.ndjson = ndjson
+        self.context = context
+        self.renderer = FastJSONRenderer()
+        self.rows = []
+        self.separator = b''
+        self.opening, self.closing = (b'', b'') if ndjson else (b'[', b']')
+        self.content_type = NDJSONRenderer.media_type if ndjson else FastJSONRenderer.media_type
+
+    def add(self, obj):
+        """The next chunk once ``obj`` fills one, else None."""
+        self.rows.append(self.renderer.render(self.serializer_class(obj, context=self.context).data))
+        if len(self.rows) >= self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if not rows:
+            return b''
+        if self.ndjson:
+            return b'\n'.join(rows) + b'\n'
+        chunk = self.separator + b','.join(rows)
+        self.separator = b','
+        return chunk
+
+    def finish(self):
+        return self.flush() + self.closing
+
+
+def stream_queryset(queryset, serializer_class, chunk_size=500, ndjson=False, context=None):
+    """
+    Serialize ``queryset`` row by row into a StreamingHttpResponse, so memory
+    stays bounded by ``chunk_size`` rows regardless of the table size.
+    """
+    encoder = _ChunkEncoder(serializer_class, chunk_size, ndjson, context)
+
+    def body():
+        if encoder.opening:
+            yield encoder.opening
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk = encoder.add(obj)
+            if chunk:
+                yield chunk
+        yield encoder.finish()
+
+    return StreamingHttpResponse(body(), content_type=encoder.content_type)
+
+
+def astream_queryset(queryset, serializer_class, chunk_size=500, ndjson=False, context=None):
+    """stream_queryset() for async views: rows are fetched with ``aiterator()``."""
+    encoder = _ChunkEncoder(serializer_class, chunk_size, ndjson, context)
+
+    async def body():
+        if encoder.opening:
+            yield encoder.opening
+        async for obj in queryset.aiterator(chunk_size=chunk_size):
+            chunk = encoder.add(obj)
+            if chunk:
+                yield chunk
+        yield encoder.finish()
+
+    return StreamingHttpResponse(body(), content_type=encoder.content_type)
@@ -2,8 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from user_app.api.urls import app_name
-from watchlist_app.api.views import (WatchListAv, WatchDetailAV, ReviewList, ReviewDetail, ReviewCreate,
-                                     StreamPlatformVS, UserReview, WatchListGV)
+from watchlist_app.api.async_views import (AsyncWatchListAv, AsyncWatchDetailAV, AsyncReviewList,
+                                           AsyncStreamPlatformList, AsyncStreamPlatformDetail, ChangeFeed)
+from watchlist_app.api.views import (WatchListAv, WatchDetailAV, WatchBatchAV, ReviewList, ReviewDetail,
+                                     ReviewCreate, ReviewBulkCreate, StreamPlatformVS, UserReview, WatchListGV,
+                                     WatchlistSearch, Leaderboard, ReviewerProfileDetail)
 
 router = DefaultRouter()
 router.register('stream', StreamPlatformVS, basename='streamplatform')
@@ -12,6 +15,9 @@ urlpatterns = [
     path('list/', WatchListAv.as_view(), name='movie-list'),
     path('<int:pk>/', WatchDetailAV.as_view(), name='movie-detail'),
     path('list2/', WatchListGV.as_view(), name='movie-new'),
+    path('batch/', WatchBatchAV.as_view(), name='movie-batch'),
+    path('search/', WatchlistSearch.as_view(), name='movie-search'),
+    path('leaderboard/', Leaderboard.as_view(), name='movie-leaderboard'),
 
     # path('stream/', StreamPlatformAv.as_view(), name='stream-list'),
     # path('stream/<int:pk>/', StreamPlatformDetailAV.as_view(), name='stream-detail'),
@@ -23,4 +29,14 @@ urlpatterns = [
     path('<int:pk>/reviews/', ReviewList.as_view(), name='review-list'),
     path('review/<int:pk>/', ReviewDetail.as_view(), name='review-detail'),
     path('reviews/', UserReview.as_view(), name='user-review-detail'),
+    path('reviews/bulk/', ReviewBulkCreate.as_view(), name='review-bulk-create'),
+    path('reviewers/<str:username>/', ReviewerProfileDetail.as_view(), name='reviewer-profile'),
+    # Async read endpoints, for deployments served by an ASGI server
+    path('async/list/', AsyncWatchListAv.as_view(), name='async-movie-list'),
+    path('async/<int:pk>/', AsyncWatchDetailAV.as_view(), name='async-movie-detail'),
+    path('async/<int:pk>/reviews/', AsyncReviewList.as_view(), name='async-review-list'),
+    path('async/stream/', AsyncStreamPlatformList.as_view(), name='async-streamplatform-list'),
+    path('async/stream/<int:pk>/', AsyncStreamPlatformDetail.as_view(), name='async-streamplatform-detail'),
+    # Server-sent change feed; holds the connection open, so serve it over ASGI
+    path('changes/', ChangeFeed.as_view(), name='change-feed'),
 ]
@@ -2,22 +2,41 @@ import logging
 from venv import logger
 import logging
 
-from django.db.models import Avg
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status, generics, viewsets, filters
 from rest_framework.decorators import api_view
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle, ScopedRateThrottle
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from user_app.api.throtlling import ReviewListThrottle, ReviewCreateThrottle
-from watchlist_app.api.pagination import WatchListPagination, LOPagination, WatchListCPagination
+from user_app.api.throtlling import (ReviewListThrottle, ReviewCreateThrottle, SlidingWindowAnonRateThrottle,
+                                    SlidingWindowScopedRateThrottle)
+from watchlist_app.api.fastpath import FastSerializer, UnsupportedField
+from watchlist_app.api.optimizers import optimize_queryset, ordering_columns
+from watchlist_app.api.pagination import (WatchListPagination, LOPagination, WatchListCPagination,
+                                         ReviewKeysetPagination)
 from watchlist_app.api.permissions import IsAdminOrReadOnly, IsReviewUserOrReadOnly
-from watchlist_app.api.serializers import (WatchlistSerializer, StreamPlatformSerializer, ReviewSerializer)
-from watchlist_app.models import (Watchlist, StreamPlatform, Review)
+from watchlist_app.api.streaming import NDJSONRenderer, stream_queryset
+from watchlist_app.api.serializers import (WatchlistSerializer, StreamPlatformSerializer, ReviewSerializer,
+                                          ReviewBulkItemSerializer, ReviewerProfileSerializer, field_selection)
+from watchlist_app import caching, changefeed, leaderboards, profiles
+from watchlist_app.models import (Watchlist, StreamPlatform, Review, ReviewerProfile)
+from watchlist_app.ratings import apply_rating_deltas, apply_review_change, review_contribution
+from watchlist_app.search import SearchResults
+
+
+def fast_serializer(view):
+    """The values()-based serializer for a list view, honouring the request's field selection."""
+    if field_selection(view.request):
+        return FastSerializer(view.get_serializer())
+    return FastSerializer.for_serializer(view.get_serializer_class())
 
 
 # ////function base view
@@ -66,6 +85,7 @@ from watchlist_app.models import (Watchlist, StreamPlatform, Review)
 
 class UserReview(generics.ListAPIView):
     serializer_class = ReviewSerializer
+    pagination_class = ReviewKeysetPagination
 
     # def get_queryset(self):
     #     username = self.kwargs.get('username')
@@ -73,10 +93,22 @@ class UserReview(generics.ListAPIView):
 
     def get_queryset(self):
         username = self.request.GET.get('username')
-        if not username:
+        try:
+            user = User.objects.only('username').get(username=username) if username else None
+        except User.DoesNotExist:
+            user = None
+        if user is None:
             return Review.objects.none()
-        else:
-            return Review.objects.filter(review_user__username=username)
+        # Rows from the related manager carry ``user`` already, so review_user needs no join.
+        return optimize_queryset(user.review_set.all(), self.get_serializer(),
+                                 ordering_columns(self.pagination_class.ordering), cached=['review_user'])
+
+
+class ReviewerProfileDetail(generics.RetrieveAPIView):
+    queryset = ReviewerProfile.objects.select_related('user')
+    serializer_class = ReviewerProfileSerializer
+    lookup_field = 'user__username'
+    lookup_url_kwarg = 'username'
 
 
 # Concreate view
@@ -84,42 +116,59 @@ class UserReview(generics.ListAPIView):
 class ReviewList(generics.ListAPIView):
     # queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewKeysetPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
-    throttle_classes = [ReviewListThrottle, AnonRateThrottle]
+    throttle_classes = [ReviewListThrottle, SlidingWindowAnonRateThrottle]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['review_user__username', 'active']
 
     def get_queryset(self):
         pk = self.kwargs['pk']
-        return Review.objects.filter(watchlist=pk)
+        return optimize_queryset(Review.objects.filter(watchlist=pk), self.get_serializer(),
+                                 ordering_columns(self.pagination_class.ordering))
 
     def permission_denied(self, request, message=None, code=None):
         raise PermissionDenied(detail="You do not have permission to modify the review list.")
 
 
 class ReviewDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Review.objects.all()
     permission_classes = [IsReviewUserOrReadOnly]
     serializer_class = ReviewSerializer
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SlidingWindowScopedRateThrottle]
     throttle_scope = 'review-detail'
 
+    def get_queryset(self):
+        return optimize_queryset(Review.objects.all(), self.get_serializer())
+
     def permission_denied(self, request, message=None, code=None):
         raise PermissionDenied(detail="You do not have permission to modify the review.")
 
+    def perform_update(self, serializer):
+        before = review_contribution(serializer.instance)
+        with transaction.atomic():
+            review = serializer.save()
+            apply_review_change(before, review_contribution(review))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            apply_review_change(before=review_contribution(instance))
+            instance.delete()
+
 
 class ReviewCreate(generics.CreateAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ReviewCreateThrottle, AnonRateThrottle]
+    throttle_classes = [ReviewCreateThrottle, SlidingWindowAnonRateThrottle]
 
     def perform_create(self, serializer):
         pk = self.kwargs.get('pk')
         watchlist = get_object_or_404(Watchlist, pk=pk)
-        review_user = self.request.user
+        # By id, so stateless JWT users (TokenUser) work without loading the User row.
+        review_user_id = self.request.user.pk
 
         # Check if the user has already reviewed this watchlist
-        existing_review = Review.objects.filter(watchlist=watchlist, review_user=review_user, active=True).first()
+        existing_review = Review.objects.filter(watchlist=watchlist, review_user_id=review_user_id,
+                                                active=True).first()
 
         new_rating = serializer.validated_data['rating']
         if new_rating > 5 or new_rating < 0:
@@ -127,30 +176,90 @@ class ReviewCreate(generics.CreateAPIView):
 
         if existing_review:
             # If the review exists, update it instead of creating a new one
+            before = review_contribution(existing_review)
             existing_review.rating = new_rating
             existing_review.description = serializer.validated_data.get('description', existing_review.description)
-            existing_review.save()
-
-            # Recalculate the average rating
-            all_reviews = Review.objects.filter(watchlist=watchlist, active=True)
-            watchlist.avg_rating = all_reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-            watchlist.save()
+            with transaction.atomic():
+                existing_review.save()
+                apply_review_change(before, review_contribution(existing_review))
 
             raise ValidationError(
                 {"message": "Your review has been updated."})
 
         else:
+            with transaction.atomic():
+                review = serializer.save(watchlist=watchlist, review_user_id=review_user_id)
+                apply_review_change(after=review_contribution(review))
 
-            if watchlist.number_rating == 0:
-                watchlist.avg_rating = new_rating
-            else:
-                total_rating_sum = watchlist.avg_rating * watchlist.number_rating
-                watchlist.avg_rating = (total_rating_sum + new_rating) / (watchlist.number_rating + 1)
 
-            watchlist.number_rating += 1
-            watchlist.save()
+class ReviewBulkCreate(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [SlidingWindowScopedRateThrottle]
+    throttle_scope = 'review-bulk'
+    batch_size = 500
+    max_items = 5000
 
-            serializer.save(watchlist=watchlist, review_user=review_user)
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'message': 'Expected a list of reviews.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({'message': f'At most {self.max_items} reviews per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = ReviewBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        # One query for the watchlists and one for the user's existing reviews.
+        watchlist_ids = {data['watchlist'] for _, data in valid}
+        platforms = dict(Watchlist.objects.filter(pk__in=watchlist_ids).values_list('pk', 'platform_id'))
+        reviewed = set(Review.objects.filter(review_user_id=request.user.pk, watchlist__in=watchlist_ids)
+                       .values_list('watchlist_id', flat=True))
+
+        pending = []
+        for index, data in valid:
+            watchlist_id = data['watchlist']
+            if watchlist_id not in platforms:
+                results[index] = {'index': index, 'status': 'error',
+                                  'errors': {'watchlist': ['Watchlist not found.']}}
+            elif watchlist_id in reviewed:
+                results[index] = {'index': index, 'status': 'error',
+                                  'errors': {'non_field_errors': ['You have already reviewed this watchlist.']}}
+            else:
+                reviewed.add(watchlist_id)
+                pending.append((index, Review(review_user_id=request.user.pk, watchlist_id=watchlist_id,
+                                              rating=data['rating'], description=data.get('description'),
+                                              active=data.get('active', True))))
+
+        created = {review.watchlist_id for _, review in pending}
+        deltas = {}
+        for _, review in pending:
+            _, rating, count = review_contribution(review)
+            total, number = deltas.get(review.watchlist_id, (0, 0))
+            deltas[review.watchlist_id] = (total + rating, number + count)
+
+        with transaction.atomic():
+            Review.objects.bulk_create([review for _, review in pending], batch_size=self.batch_size)
+            apply_rating_deltas(deltas)
+            leaderboards.record_reviews(review for _, review in pending)
+            profiles.record_reviews(review for _, review in pending)
+            changefeed.record_reviews(review for _, review in pending)
+
+        # bulk_create skips post_save, so drop the cached payloads here.
+        caching.invalidate('watchlist', *created)
+        caching.invalidate('platform', *{platforms[watchlist_id] for watchlist_id in created})
+
+        for index, review in pending:
+            results[index] = {'index': index, 'status': 'created', 'id': review.id}
+        failed = any(result['status'] == 'error' for result in results)
+        return Response({'results': results},
+                        status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED)
 
 
 # Generic View
@@ -179,23 +288,96 @@ class ReviewCreate(generics.CreateAPIView):
 #         return self.create(request, *args, **kwargs)
 
 class WatchListGV(generics.ListAPIView):
-    queryset = Watchlist.objects.all()
     serializer_class = WatchlistSerializer
     pagination_class = WatchListCPagination
     filter_backends = [filters.OrderingFilter]
     filterset_fields = ['avg_rating']
 
+    def get_queryset(self):
+        ordering = self.request.query_params.get(api_settings.ORDERING_PARAM, '').split(',')
+        if any(ordering):
+            # Ordered by columns any write can change, e.g. avg_rating.
+            caching.tag('watchlist', 'any')
+        return optimize_queryset(Watchlist.objects.all(), self.get_serializer(),
+                                 ordering_columns([self.pagination_class.ordering, *filter(None, ordering)]))
+
+    def list(self, request, *args, **kwargs):
+        if not settings.WATCHMATE_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        try:
+            fast = fast_serializer(self)
+        except UnsupportedField:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(fast.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(fast.serialize_rows(page))
+
+
+class WatchlistSearch(generics.ListAPIView):
+    serializer_class = WatchlistSerializer
+    pagination_class = WatchListPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '')
+        # Typeahead by default: the last word matches as a prefix unless ?prefix=0.
+        prefix = self.request.query_params.get('prefix', '1') not in ('0', 'false')
+        return SearchResults(query, optimize_queryset(Watchlist.objects.all(), self.get_serializer()), prefix=prefix)
+
+
+class Leaderboard(APIView):
+    """Top ``n`` watchlists by Bayesian rating (``?kind=top``) or trending score, overall or per ``?platform=``."""
+
+    def get(self, request):
+        kind = request.query_params.get('kind', 'top')
+        if kind not in ('top', 'trending'):
+            return Response({'message': 'kind must be "top" or "trending".'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            size = int(request.query_params.get('n', 10))
+            platform = request.query_params.get('platform')
+            platform = int(platform) if platform else None
+        except ValueError:
+            return Response({'message': 'n and platform must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        return Response([
+            {
+                'rank': rank,
+                'id': score.watchlist_id,
+                'title': score.watchlist.title,
+                'platform': score.platform_id,
+                'avg_rating': score.watchlist.avg_rating,
+                'number_rating': score.watchlist.number_rating,
+                'score': (leaderboards.decayed_count(score.trending, now) if kind == 'trending'
+                          else score.bayesian),
+            }
+            for rank, score in enumerate(leaderboards.leaderboard(kind, platform, size), start=1)
+        ])
+
 
 # ////class base view
 
 
 class WatchListAv(APIView):
     permission_classes = [IsAdminOrReadOnly]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+    filterset_fields = ['platform', 'active']
+    pagination_class = WatchListPagination
+    chunk_size = 500
 
     def get(self, request):
-        movies = Watchlist.objects.all()
-        serializer = WatchlistSerializer(movies, many=True)
-        return Response(serializer.data)
+        context = {'request': request}
+        movies = optimize_queryset(Watchlist.objects.order_by('id'), WatchlistSerializer(context=context))
+        movies = DjangoFilterBackend().filter_queryset(request, movies, self)
+
+        # Paginate only when the client asks for a page, otherwise stream every row.
+        if request.query_params.get(self.pagination_class.page_query_param):
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(movies, request, view=self)
+            serializer = WatchlistSerializer(page, many=True, context=context)
+            return paginator.get_paginated_response(serializer.data)
+
+        ndjson = isinstance(request.accepted_renderer, NDJSONRenderer)
+        return stream_queryset(movies, WatchlistSerializer, chunk_size=self.chunk_size, ndjson=ndjson,
+                               context=context)
 
     def post(self, request):
         serializer = WatchlistSerializer(data=request.data)
@@ -210,16 +392,22 @@ class WatchDetailAV(APIView):
     permission_classes = [IsAdminOrReadOnly]
 
     def get(self, request, pk):
-        try:
-            movie = Watchlist.objects.get(pk=pk)
-        except Watchlist.DoesNotExist:
+        def build():
+            serializer = WatchlistSerializer(context={'request': request})
+            try:
+                serializer.instance = optimize_queryset(Watchlist.objects.all(), serializer, ['updated']).get(pk=pk)
+            except Watchlist.DoesNotExist:
+                return None
+            return serializer.data, serializer.instance.updated
+
+        entry = caching.get_detail('watchlist', pk, build, field_selection(request))
+        if entry is None:
             return Response({'message': 'Movie not found'}, status=status.HTTP_400_BAD_REQUEST)
-        serializer = WatchlistSerializer(movie)
-        return Response(serializer.data)
+        return caching.detail_response(request, entry)
 
     def put(self, request, pk):
         try:
-            movie = Watchlist.objects.get(pk=pk)
+            movie = optimize_queryset(Watchlist.objects.all(), WatchlistSerializer).get(pk=pk)
         except Watchlist.DoesNotExist:
             return Response({'message': 'Movie not found'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = WatchlistSerializer(instance=movie, data=request.data)
@@ -238,12 +426,68 @@ class WatchDetailAV(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class WatchBatchAV(APIView):
+    """
+    Several watchlists by id (``?ids=3,1,2``) in the requested order, served
+    from the detail cache; the misses are loaded with one query.
+    """
+    permission_classes = [IsAdminOrReadOnly]
+    max_ids = 100
+
+    def get(self, request):
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            return Response({'message': 'ids must be a comma-separated list of integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'message': 'ids is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.max_ids:
+            return Response({'message': f'At most {self.max_ids} ids per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request}
+
+        def build_many(pks):
+            serializer = WatchlistSerializer(context=context)
+            movies = list(optimize_queryset(Watchlist.objects.all(), serializer, ['updated'])
+                          .in_bulk(pks).values())
+            data = WatchlistSerializer(movies, many=True, context=context).data
+            return {movie.pk: (item, movie.updated) for movie, item in zip(movies, data)}
+
+        entries = caching.get_details('watchlist', ids, build_many, field_selection(request))
+        return Response({
+            'results': [entries[pk]['data'] for pk in ids if pk in entries],
+            'missing': [pk for pk in ids if pk not in entries],
+        })
+
+
 # Model Viewset
 class StreamPlatformVS(viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
-    queryset = StreamPlatform.objects.all()
     serializer_class = StreamPlatformSerializer
 
+    def get_queryset(self):
+        return optimize_queryset(StreamPlatform.objects.all(), self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        if not settings.WATCHMATE_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        try:
+            fast = fast_serializer(self)
+        except UnsupportedField:
+            return super().list(request, *args, **kwargs)
+        return Response(fast.serialize(self.filter_queryset(self.get_queryset())))
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            # StreamPlatform has no updated column, so the payload's build time stands in for it.
+            return self.get_serializer(self.get_object()).data, timezone.now()
+
+        entry = caching.get_detail('platform', kwargs['pk'], build, field_selection(request))
+        return caching.detail_response(request, entry)
+
 # viewSet and Router
 # class StreamPlatformVS(viewsets.ViewSet):
 #     def list(self, request):
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WatchlistAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'watchlist_app'
+
+    def ready(self):
+        # Connects the search index, leaderboard, reviewer profile, change feed and task queue signal receivers.
+        from watchlist_app import changefeed, leaderboards, profiles, search, tasks  # noqa: F401
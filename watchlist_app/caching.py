@@ -0,0 +1,181 @@
+import hashlib
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from watchlist_app.singleflight import SingleFlight
+from watchmate.renderers import FastJSONRenderer
+
+
+def get_cache():
+    return caches[getattr(settings, 'WATCHMATE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(kind, pk):
+    return f'watchmate:{kind}:{pk}:version'
+
+
+def get_version(kind, pk):
+    cache = get_cache()
+    key = _version_key(kind, pk)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version key evicted from the cache can never
+        # resurrect an older payload stored under a small counter value.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(kind, pk):
+    cache = get_cache()
+    key = _version_key(kind, pk)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def invalidate(kind, *pks):
+    """
+    Bump the version of each object, and of the ``(kind, 'any')`` tag that
+    responses showing too many objects to tag one by one carry instead.
+    ``pk`` 'list' stands for the membership and order of the kind's lists.
+    """
+    cache = get_cache()
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+    for pk in pks + ['any']:
+        try:
+            cache.incr(_version_key(kind, pk))
+        except ValueError:
+            # No version yet, so nothing has been cached for this object.
+            pass
+
+
+# Objects shown by the response being built, collected for ResponseCacheMiddleware.
+_tags = ContextVar('watchmate_response_tags', default=None)
+
+
+def tag(kind, *pks):
+    """Record that the response being built depends on these objects (see invalidate())."""
+    tags = _tags.get()
+    if tags is not None:
+        tags.update((kind, pk) for pk in pks if pk is not None)
+
+
+def get_versions(tags):
+    """Current versions of ``(kind, pk)`` tags, seeding missing ones like get_version()."""
+    cache = get_cache()
+    keys = {_version_key(kind, pk): (kind, pk) for kind, pk in tags}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {key: found[key] for key in keys}
+
+
+def versions_match(versions):
+    """Whether every version key still holds the value in ``versions``."""
+    return get_cache().get_many(versions) == versions
+
+
+detail_flight = SingleFlight('detail')
+
+
+def _detail_key(kind, pk, version, variant):
+    if variant:
+        # One entry per field selection (?fields=...), invalidated with the object.
+        return f'watchmate:{kind}:{pk}:v{version}:{hashlib.sha1(variant.encode()).hexdigest()}'
+    return f'watchmate:{kind}:{pk}:v{version}'
+
+
+def get_detail(kind, pk, build, variant=''):
+    """
+    Return the cached entry for one object, calling ``build()`` on a miss.
+
+    ``build`` returns ``(data, last_modified)`` or None when the object does not
+    exist; the entry's Last-Modified is the later of that and the build time. Entries are keyed by the object's current version, so invalidating
+    only needs to bump the version counter. ``variant`` tells apart payloads of
+    the same object rendered differently.
+    """
+    cache = get_cache()
+    key = _detail_key(kind, pk, get_version(kind, pk), variant)
+    entry = cache.get(key)
+    if entry is None:
+        # Concurrent misses for the same payload, in any process, share one build().
+        entry = detail_flight.do(key, lambda: _build_entry(cache, key, build), peek=lambda: cache.get(key))
+    return entry
+
+
+def get_details(kind, pks, build_many, variant=''):
+    """
+    get_detail() for many objects in two cache round trips and one
+    ``build_many(pks)`` call for the misses, which returns
+    ``{pk: (data, last_modified)}`` for the objects that exist. Returns
+    ``{pk: entry}`` for the objects found.
+    """
+    cache = get_cache()
+    versions = get_versions([(kind, pk) for pk in pks])
+    keys = {pk: _detail_key(kind, pk, versions[_version_key(kind, pk)], variant) for pk in pks}
+    found = cache.get_many(keys.values())
+    entries = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [pk for pk in pks if pk not in entries]
+    if missing:
+        built = {pk: _make_entry(*value) for pk, value in build_many(missing).items()}
+        cache.set_many({keys[pk]: entry for pk, entry in built.items()},
+                       getattr(settings, 'WATCHMATE_CACHE_TIMEOUT', 300))
+        entries.update(built)
+    return entries
+
+
+def _build_entry(cache, key, build):
+    built = build()
+    if built is None:
+        return None
+    entry = _make_entry(*built)
+    cache.set(key, entry, getattr(settings, 'WATCHMATE_CACHE_TIMEOUT', 300))
+    return entry
+
+
+async def aget_detail(kind, pk, build, variant=''):
+    """Async get_detail(); ``build`` is a coroutine function."""
+    cache = get_cache()
+    key = _detail_key(kind, pk, await aget_version(kind, pk), variant)
+    entry = await cache.aget(key)
+    if entry is None:
+        built = await build()
+        if built is None:
+            return None
+        entry = _make_entry(*built)
+        await cache.aset(key, entry, getattr(settings, 'WATCHMATE_CACHE_TIMEOUT', 300))
+    return entry
+
+
+def _make_entry(data, last_modified):
+    # Payloads embed related rows, such as the platform name, whose changes
+    # invalidate the entry without touching ``last_modified``; dating the entry
+    # no earlier than its build keeps If-Modified-Since from matching a stale copy.
+    last_modified = max(last_modified, timezone.now())
+    return {
+        'data': data,
+        'etag': '"%s"' % hashlib.sha1(FastJSONRenderer().render(data)).hexdigest(),
+        'last_modified': int(last_modified.timestamp()),
+    }
+
+
+def detail_response(request, entry):
+    """Build a Response for ``entry``, or a 304 when the client's copy is still current."""
+    response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return get_conditional_response(request._request, etag=entry['etag'],
+                                    last_modified=entry['last_modified'], response=response)
@@ -0,0 +1,195 @@
+"""
+Change feed: every review and watchlist write appends a ChangeEvent in the
+writer's transaction, and clients follow the log over server-sent events
+instead of polling the list endpoints.
+
+An event carries the object's state after the change. Compaction drops events
+superseded by a later event of the same object, so a client resuming from any
+sequence number still ends up with the latest state of everything that
+changed. Retention deletes whole stretches of old events and appends a
+'truncated' marker; a client that resumes from before the marker is sent a
+``reset`` event and has to reload its data.
+
+Readers resume with ``id > since``, which is only safe if events become
+visible in id order. SQLite has one writer at a time; on PostgreSQL appenders
+hold an advisory lock until they commit, since sequence values are handed out
+at INSERT and a later id could otherwise commit first.
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from watchlist_app import caching
+from watchlist_app.models import ChangeEvent, Review, Watchlist, deleted_with_watchlist
+from watchmate.renderers import FastJSONRenderer
+
+WATCHLIST_FIELDS = ['title', 'platform_id', 'active', 'avg_rating', 'number_rating']
+REVIEW_FIELDS = ['review_user_id', 'rating', 'active', 'description']
+# pg_advisory_xact_lock() key serializing appends on PostgreSQL.
+APPEND_LOCK = 0x77617463
+
+
+def get_config():
+    config = {'COMPACT_AFTER': timedelta(hours=1), 'RETENTION': timedelta(days=7), 'POLL_INTERVAL': 0.5,
+              'HEARTBEAT': 15, 'MAX_DURATION': 300, 'RETRY': 2, 'BATCH_SIZE': 500}
+    config.update(getattr(settings, 'WATCHMATE_CHANGE_FEED', {}))
+    return config
+
+
+def _state(instance, fields):
+    return {field.removesuffix('_id'): getattr(instance, field) for field in fields}
+
+
+def notify():
+    """Tell open streams, through the shared cache, that the log has grown."""
+    caching.invalidate('changefeed', 'head')
+
+
+def append(events):
+    """Add ``events`` to the log in the current transaction; streams see them once it commits."""
+    if not events:
+        return
+    using = router.db_for_write(ChangeEvent)
+    with transaction.atomic(using=using):
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            # Held until commit, so the ids of concurrent appends commit in order.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [APPEND_LOCK])
+        ChangeEvent.objects.using(using).bulk_create(events)
+    transaction.on_commit(notify, using=using)
+
+
+def watchlist_event(watchlist, action):
+    data = _state(watchlist, WATCHLIST_FIELDS) if action != 'deleted' else {}
+    return ChangeEvent(kind='watchlist', action=action, object_id=watchlist.pk, watchlist_id=watchlist.pk, data=data)
+
+
+def review_event(review, action):
+    data = _state(review, REVIEW_FIELDS) if action != 'deleted' else {}
+    return ChangeEvent(kind='review', action=action, object_id=review.pk, watchlist_id=review.watchlist_id, data=data)
+
+
+def record_reviews(reviews):
+    """Log reviews created without post_save, e.g. by bulk_create()."""
+    append([review_event(review, 'created') for review in reviews])
+
+
+def record_ratings(*watchlist_ids):
+    """Log the aggregates of watchlists updated with QuerySet.update(), which sends no signal."""
+    watchlists = Watchlist.objects.filter(pk__in=watchlist_ids)
+    append([watchlist_event(watchlist, 'updated') for watchlist in watchlists])
+
+
+@receiver(post_save, sender=Watchlist)
+def log_saved_watchlist(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        append([watchlist_event(instance, 'created' if created else 'updated')])
+
+
+@receiver(post_save, sender=Review)
+def log_saved_review(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        append([review_event(instance, 'created' if created else 'updated')])
+
+
+@receiver(pre_delete, sender=Watchlist)
+def remember_watchlist_reviews(sender, instance, **kwargs):
+    instance._review_ids = list(Review.objects.filter(watchlist=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Watchlist)
+def log_deleted_watchlist(sender, instance, **kwargs):
+    # The reviews deleted with it, in one INSERT instead of one per review.
+    reviews = [ChangeEvent(kind='review', action='deleted', object_id=pk, watchlist_id=instance.pk)
+               for pk in getattr(instance, '_review_ids', [])]
+    append(reviews + [watchlist_event(instance, 'deleted')])
+
+
+@receiver(post_delete, sender=Review)
+def log_deleted_review(sender, instance, origin=None, **kwargs):
+    if not deleted_with_watchlist(origin):
+        append([review_event(instance, 'deleted')])
+
+
+def compact(before=None):
+    """Delete events older than ``before`` that a later event of the same object supersedes."""
+    if before is None:
+        before = timezone.now() - get_config()['COMPACT_AFTER']
+    latest = (ChangeEvent.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'))
+              .order_by('-id').values('id')[:1])
+    deleted, _ = ChangeEvent.objects.filter(created__lt=before).exclude(id=Subquery(latest)).delete()
+    return deleted
+
+
+def expire(before=None):
+    """
+    Delete every event older than ``before``, then append a marker recording
+    the last sequence number deleted.
+    """
+    if before is None:
+        before = timezone.now() - get_config()['RETENTION']
+    with transaction.atomic():
+        through = ChangeEvent.objects.filter(created__lt=before).aggregate(through=Max('id'))['through']
+        if through is None:
+            return 0
+        deleted, _ = ChangeEvent.objects.filter(id__lte=through).delete()
+        append([ChangeEvent(kind='feed', action='truncated', object_id=0, data={'through': through})])
+    return deleted
+
+
+async def ahead():
+    """The sequence number of the newest event, 0 for an empty log."""
+    return (await ChangeEvent.objects.aaggregate(head=Max('id')))['head'] or 0
+
+
+def _message(event_id, name, data):
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (event_id, name.encode(), FastJSONRenderer().render(data))
+
+
+async def stream(since, watchlist_id=None):
+    """
+    Server-sent events for the log after sequence number ``since``, optionally
+    only one watchlist's, until MAX_DURATION has passed; EventSource clients
+    then reconnect with Last-Event-ID. Open streams check the shared cache for
+    new events every POLL_INTERVAL and the database at least every HEARTBEAT.
+    """
+    config = get_config()
+    events = ChangeEvent.objects.order_by('id')
+    if watchlist_id is not None:
+        events = events.filter(Q(watchlist_id=watchlist_id) | Q(kind='feed'))
+    start = time.monotonic()
+    checked = sent = start
+    version = None
+    yield b'retry: %d\n\n' % (config['RETRY'] * 1000)
+    while True:
+        current = await caching.aget_version('changefeed', 'head')
+        if current != version or time.monotonic() - checked >= config['HEARTBEAT']:
+            version, checked = current, time.monotonic()
+            while True:
+                batch = [event async for event in events.filter(id__gt=since)[:config['BATCH_SIZE']]]
+                for event in batch:
+                    if event.kind != 'feed':
+                        yield _message(event.id, event.kind, {'action': event.action, 'id': event.object_id,
+                                                              'watchlist': event.watchlist_id, **event.data})
+                    elif since < event.data['through']:
+                        # Events this client has not seen were deleted.
+                        yield _message(event.id, 'reset', event.data)
+                    since = event.id
+                    sent = time.monotonic()
+                if len(batch) < config['BATCH_SIZE']:
+                    break
+        if time.monotonic() - start >= config['MAX_DURATION']:
+            return
+        if time.monotonic() - sent >= config['HEARTBEAT']:
+            # A comment line, which also finds clients that have gone away.
+            yield b': keepalive\n\n'
+            sent = time.monotonic()
+        await asyncio.sleep(config['POLL_INTERVAL'])
@@ -0,0 +1,182 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone as django_timezone
+
+from watchlist_app.caching import get_cache
+from watchlist_app.models import Review, Watchlist, WatchlistScore, deleted_with_watchlist
+
+# Trending scores are stored as logarithms relative to a fixed epoch, so a stored
+# score never has to be decayed again: later reviews simply carry larger terms.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PRIOR_MEAN_KEY = 'watchmate:leaderboard:prior-mean'
+
+
+def get_config():
+    config = {'PRIOR_WEIGHT': 10, 'TRENDING_HALF_LIFE': timedelta(days=7), 'MAX_SIZE': 100}
+    config.update(getattr(settings, 'WATCHMATE_LEADERBOARD', {}))
+    return config
+
+
+def decay_rate():
+    return math.log(2) / get_config()['TRENDING_HALF_LIFE'].total_seconds()
+
+
+def trending_term(created):
+    """log of one review's weight: it halves every TRENDING_HALF_LIFE after ``created``."""
+    return decay_rate() * (created - EPOCH).total_seconds()
+
+
+def log_sum_exp(values):
+    values = list(values)
+    if not values:
+        return None
+    top = max(values)
+    return top + math.log(sum(math.exp(value - top) for value in values))
+
+
+def decayed_count(trending, now=None):
+    """Number of reviews a stored trending score is worth at ``now``."""
+    if trending is None:
+        return 0.0
+    return math.exp(trending - trending_term(now or django_timezone.now()))
+
+
+def prior_mean(refresh=False):
+    """Mean rating over every active review, the value a title with few reviews is pulled towards."""
+    cache = get_cache()
+    mean = None if refresh else cache.get(PRIOR_MEAN_KEY)
+    if mean is None:
+        totals = Watchlist.objects.aggregate(total=Sum('rating_sum'), number=Sum('number_rating'))
+        mean = totals['total'] / totals['number'] if totals['number'] else 0.0
+        cache.set(PRIOR_MEAN_KEY, mean, None)
+    return mean
+
+
+def bayesian_score(rating_sum, number_rating, mean, weight):
+    return (weight * mean + rating_sum) / (weight + number_rating)
+
+
+def update_bayesian(watchlist_id):
+    """
+    Rescore one watchlist from its stored rating aggregates; called whenever
+    they change. Watchlists without a score row yet (bulk imports) get a full
+    one. The other updaters only touch existing rows, so they never recreate
+    the score of a watchlist that is being deleted.
+    """
+    weight = get_config()['PRIOR_WEIGHT']
+    watchlist = Watchlist.objects.filter(pk=OuterRef('pk'))
+    # A single UPDATE reading the aggregates through subqueries, without a round trip.
+    score = (Value(weight * prior_mean()) + F('rating_sum')) / (Value(float(weight)) + F('number_rating'))
+    updated = WatchlistScore.objects.filter(pk=watchlist_id).update(
+        bayesian=Subquery(watchlist.annotate(bayesian=ExpressionWrapper(score, FloatField())).values('bayesian')),
+        platform_id=Subquery(watchlist.values('platform_id')),
+    )
+    if not updated and Watchlist.objects.filter(pk=watchlist_id).exists():
+        refresh_scores(Watchlist.objects.filter(pk=watchlist_id))
+
+
+def record_reviews(reviews):
+    """Fold newly created reviews into the trending scores without rereading older reviews."""
+    terms = defaultdict(list)
+    for review in reviews:
+        if review.active:
+            terms[review.watchlist_id].append(trending_term(review.created))
+    for watchlist_id, values in sorted(terms.items()):
+        added = Value(log_sum_exp(values))
+        # trending = log(exp(trending) + exp(added)), written to stay finite for large exponents.
+        WatchlistScore.objects.filter(pk=watchlist_id).update(trending=Case(
+            When(trending__isnull=True, then=added),
+            default=Greatest(F('trending'), added) + Ln(Value(1.0) + Exp(-Abs(F('trending') - added))),
+            output_field=FloatField(),
+        ))
+
+
+def refresh_trending(watchlist_id):
+    """Recompute one watchlist's trending score from its active reviews."""
+    created = Review.objects.filter(watchlist_id=watchlist_id, active=True).values_list('created', flat=True)
+    trending = log_sum_exp(trending_term(value) for value in created.iterator())
+    WatchlistScore.objects.filter(pk=watchlist_id).update(trending=trending)
+
+
+def refresh_scores(queryset=None, batch_size=1000):
+    """
+    Recompute the scores of ``queryset`` (every watchlist by default) from
+    scratch, including the prior mean. This is the periodic job; writes keep
+    the scores current in between.
+    """
+    if queryset is None:
+        queryset = Watchlist.objects.all()
+        mean = prior_mean(refresh=True)
+    else:
+        mean = prior_mean()
+    weight = get_config()['PRIOR_WEIGHT']
+
+    terms = defaultdict(list)
+    reviews = Review.objects.filter(active=True, watchlist__in=queryset).values_list('watchlist_id', 'created')
+    for watchlist_id, created in reviews.iterator(chunk_size=5000):
+        terms[watchlist_id].append(trending_term(created))
+
+    scores = [
+        WatchlistScore(watchlist_id=pk, platform_id=platform_id, trending=log_sum_exp(terms.get(pk, ())),
+                       bayesian=bayesian_score(rating_sum, number_rating, mean, weight))
+        for pk, platform_id, rating_sum, number_rating
+        in queryset.values_list('pk', 'platform_id', 'rating_sum', 'number_rating').iterator(chunk_size=5000)
+    ]
+    with transaction.atomic():
+        WatchlistScore.objects.bulk_create(scores, batch_size=batch_size, update_conflicts=True,
+                                           unique_fields=['watchlist'],
+                                           update_fields=['platform', 'bayesian', 'trending'])
+    return len(scores)
+
+
+def leaderboard(kind='top', platform_id=None, size=10):
+    """The best ``size`` scores, read straight off the matching index."""
+    size = max(1, min(size, get_config()['MAX_SIZE']))
+    scores = WatchlistScore.objects.select_related('watchlist')
+    if platform_id is not None:
+        scores = scores.filter(platform_id=platform_id)
+    if kind == 'trending':
+        scores = scores.filter(trending__isnull=False).order_by('-trending')
+    else:
+        scores = scores.order_by('-bayesian')
+    return scores[:size]
+
+
+@receiver(post_save, sender=Watchlist)
+def sync_watchlist_score(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bayesian = bayesian_score(instance.rating_sum, instance.number_rating, prior_mean(),
+                                  get_config()['PRIOR_WEIGHT'])
+        WatchlistScore.objects.create(watchlist=instance, platform_id=instance.platform_id, bayesian=bayesian)
+    else:
+        WatchlistScore.objects.filter(pk=instance.pk).exclude(platform_id=instance.platform_id).update(
+            platform_id=instance.platform_id)
+
+
+@receiver(post_save, sender=Review)
+def score_saved_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_reviews([instance])
+    else:
+        # The review may have been (de)activated; older terms cannot be subtracted exactly.
+        refresh_trending(instance.watchlist_id)
+
+
+@receiver(post_delete, sender=Review)
+def score_deleted_review(sender, instance, origin=None, **kwargs):
+    if deleted_with_watchlist(origin):
+        # The score row goes with the watchlist.
+        return
+    refresh_trending(instance.watchlist_id)
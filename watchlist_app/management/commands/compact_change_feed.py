@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from watchlist_app.changefeed import compact, expire, get_config
+
+
+class Command(BaseCommand):
+    help = ('Compact the change feed (drop superseded events older than COMPACT_AFTER) and delete '
+            'events older than RETENTION, as set in WATCHMATE_CHANGE_FEED.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact-after', type=float, help='Override COMPACT_AFTER, in seconds.')
+        parser.add_argument('--retention', type=float, help='Override RETENTION, in seconds.')
+
+    def handle(self, *args, **options):
+        config = get_config()
+        now = timezone.now()
+        compact_after = config['COMPACT_AFTER']
+        if options['compact_after'] is not None:
+            compact_after = timedelta(seconds=options['compact_after'])
+        retention = config['RETENTION']
+        if options['retention'] is not None:
+            retention = timedelta(seconds=options['retention'])
+
+        expired = expire(now - retention)
+        compacted = compact(now - compact_after)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {expired} expired and {compacted} superseded event(s).'))
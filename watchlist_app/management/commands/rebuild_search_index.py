@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import router
+
+from watchlist_app.models import Watchlist
+from watchlist_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the watchlist full-text search index, e.g. after bulk imports that bypass model signals.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(router.db_for_write(Watchlist))
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index ({type(backend).__name__}).'))
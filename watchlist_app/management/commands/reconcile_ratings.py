@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from watchlist_app.models import Watchlist
+from watchlist_app.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating_sum, number_rating and avg_rating of watchlists from their active reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Watchlist ids to reconcile (default: all).')
+
+    def handle(self, *args, **options):
+        queryset = Watchlist.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        updated = reconcile_ratings(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} watchlist(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from watchlist_app.leaderboards import refresh_scores
+from watchlist_app.models import Watchlist
+
+
+class Command(BaseCommand):
+    help = 'Recompute the leaderboard scores (Bayesian rating and trending) and the site-wide prior mean.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Watchlist ids to rescore (default: all).')
+
+    def handle(self, *args, **options):
+        queryset = Watchlist.objects.filter(pk__in=options['ids']) if options['ids'] else None
+        updated = refresh_scores(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Rescored {updated} watchlist(s).'))
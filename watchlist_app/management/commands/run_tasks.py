@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from watchlist_app.models import OutboxTask
+from watchlist_app.tasks import get_config, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run the deferred tasks waiting in the outbox (the worker for WATCHMATE_TASKS["MODE"] = "outbox").'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also run tasks whose delay has not passed yet.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox every POLL_INTERVAL.')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Give tasks that ran out of attempts another round first.')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            reset = OutboxTask.objects.filter(failed=True).update(failed=False, attempts=0)
+            self.stdout.write(f'Retrying {reset} failed task(s).')
+        if not options['loop']:
+            runs = run_pending(due_only=not options['all'])
+            self.stdout.write(self.style.SUCCESS(f'Ran {runs} task(s).'))
+            return
+        while True:
+            if not run_pending(due_only=True):
+                time.sleep(get_config()['POLL_INTERVAL'])
+            close_old_connections()
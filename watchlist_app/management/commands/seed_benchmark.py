@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from watchlist_app.seeding import rebuild_derived, seed
+
+PRESETS = {
+    'small': {'users': 100, 'platforms': 5, 'watchlists': 100, 'reviews': 1_000},
+    'medium': {'users': 1_000, 'platforms': 10, 'watchlists': 1_000, 'reviews': 100_000},
+    'large': {'users': 10_000, 'platforms': 20, 'watchlists': 10_000, 'reviews': 10_000_000},
+}
+
+
+class Command(BaseCommand):
+    help = ('Bulk-insert a synthetic catalog of users, platforms, watchlists and reviews for benchmarking, '
+            'then recompute ratings, leaderboard scores and the search index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                            help='Volumes to start from: small (1k reviews), medium (100k) or large (10M).')
+        for name in ('users', 'platforms', 'watchlists', 'reviews'):
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name}, overriding the preset.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--username-prefix', default='user')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Leave rating aggregates, leaderboards and the search index as they are.')
+
+    def handle(self, *args, **options):
+        volumes = dict(PRESETS[options['preset']])
+        volumes.update({name: options[name] for name in volumes if options[name] is not None})
+        prefix = options['username_prefix']
+        if User.objects.filter(username=f'{prefix}0').exists():
+            raise CommandError(f'User "{prefix}0" already exists; seed an empty database or pass --username-prefix.')
+
+        start = time.perf_counter()
+        try:
+            seed(batch_size=options['batch_size'], username_prefix=prefix, **volumes)
+        except ValueError as exc:
+            raise CommandError(exc)
+        if not options['skip_derived']:
+            rebuild_derived()
+        summary = ', '.join(f'{count} {name}' for name, count in volumes.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {time.perf_counter() - start:.1f}s.'))
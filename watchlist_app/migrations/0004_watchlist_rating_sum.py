@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Watchlist = apps.get_model('watchlist_app', 'Watchlist')
+    active = Q(reviews__active=True)
+    watchlists = Watchlist.objects.annotate(total=Sum('reviews__rating', filter=active),
+                                            number=Count('reviews', filter=active))
+    for watchlist in watchlists.iterator():
+        watchlist.rating_sum = watchlist.total or 0
+        watchlist.number_rating = watchlist.number
+        watchlist.avg_rating = watchlist.rating_sum / watchlist.number if watchlist.number else 0
+        watchlist.save(update_fields=['rating_sum', 'number_rating', 'avg_rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist_app', '0003_alter_review_description_alter_review_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlist',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
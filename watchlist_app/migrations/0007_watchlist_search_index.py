@@ -0,0 +1,34 @@
+from django.db import migrations
+
+FTS_TABLE = 'watchlist_app_watchlist_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            # watchlist_app.search falls back to its in-process index.
+            return
+        cursor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                       f"title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+                       f'SELECT id, title, description FROM watchlist_app_watchlist')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist_app', '0005_review_and_watchlist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
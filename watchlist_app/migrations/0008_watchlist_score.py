@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist_app', '0007_watchlist_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchlistScore',
+            fields=[
+                ('watchlist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='watchlist_app.watchlist')),
+                ('bayesian', models.FloatField(default=0)),
+                ('trending', models.FloatField(null=True)),
+                ('platform', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='watchlist_app.streamplatform')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bayesian'], name='score_bayesian_idx'), models.Index(fields=['platform', '-bayesian'], name='score_platform_bayesian_idx'), models.Index(fields=['-trending'], name='score_trending_idx'), models.Index(fields=['platform', '-trending'], name='score_platform_trending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def populate_profiles(apps, schema_editor):
+    Review = apps.get_model('watchlist_app', 'Review')
+    ReviewerProfile = apps.get_model('watchlist_app', 'ReviewerProfile')
+    active = Q(active=True)
+    rows = (Review.objects.order_by().values('review_user')
+            .annotate(number=Count('pk', filter=active), total=Sum('rating', filter=active), last=Max('updated')))
+    ReviewerProfile.objects.bulk_create(
+        (ReviewerProfile(user_id=row['review_user'], review_count=row['number'], rating_sum=row['total'] or 0,
+                         avg_rating=(row['total'] or 0) / row['number'] if row['number'] else 0,
+                         last_activity=row['last'])
+         for row in rows.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('watchlist_app', '0009_outbox_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewerProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reviewer_profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(populate_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watchlist_app', '0010_reviewer_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('watchlist', 'Watchlist'), ('review', 'Review'), ('feed', 'Feed')], max_length=10)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted'), ('truncated', 'Truncated')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('watchlist_id', models.BigIntegerField(null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='change_object_idx'), models.Index(fields=['watchlist_id', 'id'], name='change_watchlist_idx'), models.Index(fields=['created'], name='change_created_idx')],
+            },
+        ),
+    ]
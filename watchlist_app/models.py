@@ -1,7 +1,11 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from watchlist_app import caching
+
 
 class StreamPlatform(models.Model):
     name = models.CharField(max_length=50)
@@ -19,9 +23,16 @@ class Watchlist(models.Model):
     active = models.BooleanField(default=True)
     avg_rating = models.FloatField(default=0)
     number_rating = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['title'], name='watchlist_title_idx'),
+            models.Index(fields=['-avg_rating'], name='watchlist_avg_rating_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -37,6 +48,169 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('review_user', 'watchlist')
+        indexes = [
+            # Ascending created columns: scanned backwards they yield (-created, -id) order with the rowid.
+            models.Index(fields=['watchlist', 'created'], name='review_watchlist_created_idx'),
+            models.Index(fields=['watchlist', 'active', 'created'], name='review_watchlist_active_idx'),
+            models.Index(fields=['review_user', 'created'], name='review_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.rating} - {self.watchlist.title} | {self.review_user}"
+
+
+# Precomputed leaderboard scores, maintained by watchlist_app.leaderboards.
+class WatchlistScore(models.Model):
+    watchlist = models.OneToOneField(Watchlist, on_delete=models.CASCADE, primary_key=True, related_name='score')
+    # Copy of watchlist.platform so per-platform boards are a single index range scan.
+    platform = models.ForeignKey(StreamPlatform, on_delete=models.CASCADE, null=True, related_name='+')
+    bayesian = models.FloatField(default=0)
+    # log(sum of exp(decay * (review.created - epoch))) over active reviews; null without reviews.
+    trending = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bayesian'], name='score_bayesian_idx'),
+            models.Index(fields=['platform', '-bayesian'], name='score_platform_bayesian_idx'),
+            models.Index(fields=['-trending'], name='score_trending_idx'),
+            models.Index(fields=['platform', '-trending'], name='score_platform_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.watchlist_id}: {self.bayesian:.2f}"
+
+
+# Per-user review aggregates over active reviews, maintained by watchlist_app.profiles.
+class ReviewerProfile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='reviewer_profile')
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+    # Time of the user's last review write, including edits and deletions.
+    last_activity = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.review_count} reviews"
+
+
+# Deferred work waiting to run, written in the caller's transaction; see watchlist_app.tasks.
+class OutboxTask(models.Model):
+    # Requests with the same key coalesce into one pending run.
+    key = models.CharField(max_length=200, unique=True)
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    # Changes on every request, so a run only retires the requests it has seen.
+    generation = models.CharField(max_length=32)
+    run_after = models.DateTimeField()
+    # Lease of the worker running the task; an expired lease is claimed again.
+    claimed_until = models.DateTimeField(null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['failed', 'run_after'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key}: {self.name}"
+
+
+# Append-only log of watchlist and review changes, streamed by watchlist_app.changefeed.
+class ChangeEvent(models.Model):
+    KIND_CHOICES = [('watchlist', 'Watchlist'), ('review', 'Review'), ('feed', 'Feed')]
+    ACTION_CHOICES = [('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted'),
+                      ('truncated', 'Truncated')]
+
+    # The sequence number clients resume from.
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    # The watchlist itself, or the one a review is about.
+    watchlist_id = models.BigIntegerField(null=True)
+    # The object's state after the change, so compaction can keep only the latest event.
+    data = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'object_id', 'id'], name='change_object_idx'),
+            models.Index(fields=['watchlist_id', 'id'], name='change_watchlist_idx'),
+            models.Index(fields=['created'], name='change_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.kind} {self.object_id} {self.action}"
+
+
+# Version kinds (see watchlist_app.caching) of the models that API responses show.
+CACHE_KINDS = {Watchlist: 'watchlist', StreamPlatform: 'platform'}
+
+
+def deleted_with_watchlist(origin):
+    """
+    Whether a delete signal comes from deleting a watchlist or platform. Review
+    receivers then leave the cascaded reviews to the Watchlist handlers, which
+    deal with all of a watchlist's reviews at once.
+    """
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model in (Watchlist, StreamPlatform)
+
+
+def _listing(watchlist):
+    # The columns that decide where a watchlist appears in lists.
+    return watchlist.platform_id, watchlist.title, watchlist.active
+
+
+@receiver(pre_save, sender=Watchlist)
+def remember_watchlist_platform(sender, instance, **kwargs):
+    # A watchlist moved to another platform must also drop the old platform's payload.
+    instance._previous_platform_id = None
+    instance._previous_listing = None
+    if instance.pk:
+        instance._previous_listing = (Watchlist.objects.filter(pk=instance.pk)
+                                      .values_list('platform_id', 'title', 'active').first())
+        if instance._previous_listing:
+            instance._previous_platform_id = instance._previous_listing[0]
+
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def invalidate_watchlist(sender, instance, signal, **kwargs):
+    caching.invalidate('watchlist', instance.pk)
+    caching.invalidate('platform', instance.platform_id, getattr(instance, '_previous_platform_id', None))
+    if signal is post_delete or getattr(instance, '_previous_listing', None) != _listing(instance):
+        caching.invalidate('watchlist', 'list')
+
+
+@receiver(post_save, sender=StreamPlatform)
+def invalidate_platform(sender, instance, created, **kwargs):
+    caching.invalidate('platform', instance.pk)
+    if created:
+        caching.invalidate('platform', 'list')
+    else:
+        # Watchlist payloads embed the platform name.
+        caching.invalidate('watchlist', *instance.watchlist.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=StreamPlatform)
+def invalidate_deleted_platform(sender, instance, **kwargs):
+    caching.invalidate('platform', instance.pk, 'list')
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_watchlist(sender, instance, origin=None, **kwargs):
+    if deleted_with_watchlist(origin):
+        # invalidate_watchlist() covers it.
+        return
+    if Review.watchlist.is_cached(instance):
+        platform_id = instance.watchlist.platform_id
+    else:
+        platform_id = (Watchlist.objects.filter(pk=instance.watchlist_id)
+                       .values_list('platform_id', flat=True).first())
+    caching.invalidate('watchlist', instance.watchlist_id)
+    caching.invalidate('platform', platform_id)
@@ -0,0 +1,134 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from watchlist_app.models import Review, ReviewerProfile, Watchlist, deleted_with_watchlist
+
+
+def _contribution(rating, active):
+    """(review_count, rating_sum) that one review adds to its author's profile."""
+    return (1, rating) if active else (0, 0)
+
+
+def apply_profile_delta(user_id, count_delta, sum_delta):
+    """
+    Shift one reviewer's counters and stamp their last activity in a single
+    UPDATE. A reviewer without a profile row yet gets one built from scratch.
+    """
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('review_count') + count_delta
+    updated = ReviewerProfile.objects.filter(pk=user_id).update(
+        review_count=new_count,
+        rating_sum=new_sum,
+        avg_rating=Case(
+            When(review_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        last_activity=Now(),
+    )
+    if not updated:
+        refresh_profiles(User.objects.filter(pk=user_id))
+
+
+def record_reviews(reviews):
+    """Fold newly created reviews into their authors' profiles, one UPDATE per author."""
+    deltas = {}
+    for review in reviews:
+        count, total = deltas.get(review.review_user_id, (0, 0))
+        added_count, added_sum = _contribution(review.rating, review.active)
+        deltas[review.review_user_id] = (count + added_count, total + added_sum)
+    with transaction.atomic():
+        for user_id, (count, total) in sorted(deltas.items()):
+            apply_profile_delta(user_id, count, total)
+
+
+def refresh_profiles(users=None, batch_size=1000):
+    """
+    Rebuild the profiles of ``users`` (everyone by default) from their reviews.
+    Users without any review get no profile.
+    """
+    reviews = Review.objects.all()
+    if users is not None:
+        reviews = reviews.filter(review_user__in=users)
+    active = Q(active=True)
+    rows = (reviews.order_by().values('review_user')
+            .annotate(number=Count('pk', filter=active), total=Sum('rating', filter=active), last=Max('updated')))
+    profiles = [
+        ReviewerProfile(user_id=row['review_user'], review_count=row['number'], rating_sum=row['total'] or 0,
+                        avg_rating=(row['total'] or 0) / row['number'] if row['number'] else 0.0,
+                        last_activity=row['last'])
+        for row in rows.iterator(chunk_size=5000)
+    ]
+    with transaction.atomic():
+        ReviewerProfile.objects.bulk_create(profiles, batch_size=batch_size, update_conflicts=True,
+                                            unique_fields=['user'],
+                                            update_fields=['review_count', 'rating_sum', 'avg_rating',
+                                                           'last_activity'])
+    return len(profiles)
+
+
+def recount_profiles(user_ids, batch_size=1000):
+    """Recount the profiles of ``user_ids`` from their active reviews, two UPDATEs per batch of users."""
+    active = Review.objects.filter(review_user=OuterRef('pk'), active=True).order_by().values('review_user')
+    with transaction.atomic():
+        for start in range(0, len(user_ids), batch_size):
+            profiles = ReviewerProfile.objects.filter(pk__in=user_ids[start:start + batch_size])
+            profiles.update(
+                review_count=Coalesce(Subquery(active.annotate(number=Count('pk')).values('number')), 0),
+                rating_sum=Coalesce(Subquery(active.annotate(total=Sum('rating')).values('total')), 0),
+            )
+            profiles.update(avg_rating=Case(
+                When(review_count__gt=0, then=Cast(F('rating_sum'), FloatField()) / F('review_count')),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ))
+
+
+@receiver(pre_save, sender=Review)
+def remember_review(sender, instance, raw=False, **kwargs):
+    # The stored row, since the instance being saved already carries the new values.
+    instance._previous_review = None
+    if instance.pk and not raw:
+        instance._previous_review = (Review.objects.filter(pk=instance.pk)
+                                     .values_list('review_user_id', 'rating', 'active').first())
+
+
+@receiver(post_save, sender=Review)
+def profile_saved_review(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_previous_review', None)
+    if previous:
+        user_id, rating, active = previous
+        count, total = _contribution(rating, active)
+        deltas[user_id] = (-count, -total)
+    count, total = _contribution(instance.rating, instance.active)
+    previous_count, previous_total = deltas.get(instance.review_user_id, (0, 0))
+    deltas[instance.review_user_id] = (previous_count + count, previous_total + total)
+    for user_id, (count, total) in sorted(deltas.items()):
+        apply_profile_delta(user_id, count, total)
+
+
+@receiver(post_delete, sender=Review)
+def profile_deleted_review(sender, instance, origin=None, **kwargs):
+    if deleted_with_watchlist(origin):
+        return
+    count, total = _contribution(instance.rating, instance.active)
+    apply_profile_delta(instance.review_user_id, -count, -total)
+
+
+@receiver(pre_delete, sender=Watchlist)
+def remember_watchlist_reviewers(sender, instance, **kwargs):
+    instance._reviewer_ids = list(Review.objects.filter(watchlist=instance, active=True)
+                                  .values_list('review_user_id', flat=True))
+
+
+@receiver(post_delete, sender=Watchlist)
+def profile_deleted_watchlist(sender, instance, **kwargs):
+    # Its reviews are gone by now; losing them is not the reviewers' own activity.
+    recount_profiles(getattr(instance, '_reviewer_ids', []))
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
+
+from watchlist_app import caching, changefeed, leaderboards, tasks
+from watchlist_app.models import Review, Watchlist
+
+
+def review_contribution(review):
+    """(watchlist_id, rating_sum, rating_count) that ``review`` adds to its watchlist."""
+    if not review.active:
+        return review.watchlist_id, 0, 0
+    return review.watchlist_id, review.rating, 1
+
+
+def apply_rating_delta(watchlist_id, sum_delta, count_delta):
+    """
+    Shift the stored aggregates of one watchlist and refresh avg_rating in a
+    single UPDATE, so concurrent writers never lose each other's changes.
+    """
+    if not sum_delta and not count_delta:
+        return
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('number_rating') + count_delta
+    Watchlist.objects.filter(pk=watchlist_id).update(
+        rating_sum=new_sum,
+        number_rating=new_count,
+        avg_rating=Case(
+            When(number_rating__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        updated=Now(),
+    )
+
+
+def apply_rating_deltas(deltas):
+    """
+    Apply ``{watchlist_id: (sum_delta, count_delta)}`` in watchlist order, then
+    schedule the recompute of the changed watchlists' scores.
+    """
+    changed = []
+    with transaction.atomic():
+        for watchlist_id, (sum_delta, count_delta) in sorted(deltas.items()):
+            if sum_delta or count_delta:
+                apply_rating_delta(watchlist_id, sum_delta, count_delta)
+                changed.append(watchlist_id)
+        schedule_recompute(*changed)
+
+
+def apply_review_change(before=None, after=None):
+    """
+    Move the aggregates from one review contribution to another. ``before`` is
+    None for new reviews and ``after`` is None for deleted ones.
+    """
+    deltas = {}
+    if before:
+        watchlist_id, rating, count = before
+        total, number = deltas.get(watchlist_id, (0, 0))
+        deltas[watchlist_id] = (total - rating, number - count)
+    if after:
+        watchlist_id, rating, count = after
+        total, number = deltas.get(watchlist_id, (0, 0))
+        deltas[watchlist_id] = (total + rating, number + count)
+    apply_rating_deltas(deltas)
+
+
+def reconcile_ratings(queryset=None):
+    """
+    Recompute the aggregates of ``queryset`` (all watchlists by default) from
+    active reviews, repairing any drift of the incremental updates.
+    """
+    if queryset is None:
+        queryset = Watchlist.objects.all()
+    active = Review.objects.filter(watchlist=OuterRef('pk'), active=True).order_by().values('watchlist')
+    with transaction.atomic():
+        updated = queryset.update(
+            rating_sum=Coalesce(Subquery(active.annotate(total=Sum('rating')).values('total')), 0),
+            number_rating=Coalesce(Subquery(active.annotate(number=Count('pk')).values('number')), 0),
+        )
+        queryset.update(avg_rating=Case(
+            When(number_rating__gt=0, then=Cast(F('rating_sum'), FloatField()) / F('number_rating')),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+    return updated
+
+
+def recompute_rating(watchlist_id):
+    """
+    Carry a change of one watchlist's stored aggregates over to its Bayesian
+    score, the change feed and the cached payloads; run by schedule_recompute().
+    """
+    watchlists = Watchlist.objects.filter(pk=watchlist_id)
+    with transaction.atomic():
+        leaderboards.update_bayesian(watchlist_id)
+        changefeed.record_ratings(watchlist_id)
+    # Payloads cached between the review write and its commit still show the old aggregates.
+    caching.invalidate('watchlist', watchlist_id)
+    caching.invalidate('platform', watchlists.values_list('platform_id', flat=True).first())
+
+
+def schedule_recompute(*watchlist_ids):
+    """
+    Run recompute_rating() for ``watchlist_ids`` off the request path, once
+    WATCHMATE_TASKS['RATING_DELAY'] has passed; a burst of reviews of one
+    watchlist in that window shares a single recompute.
+    """
+    tasks.defer_each(recompute_rating, [((pk,), f'rating:{pk}') for pk in sorted(set(watchlist_ids))],
+                     delay=tasks.get_config()['RATING_DELAY'])
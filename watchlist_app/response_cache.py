@@ -0,0 +1,244 @@
+"""
+Full-response cache for anonymous reads of the list endpoints.
+
+Each response records the watchlists and platforms it shows (see
+caching.tag()), and its entry stores their versions, so a write purges exactly
+the pages showing the written object, plus every page of the kind's lists when
+membership or order changed. Entries stay fresh for TIMEOUT seconds and are
+then served STALE for up to STALE more seconds while one request refreshes
+them; a single-flight lock keeps a miss from sending every concurrent request
+to the database.
+"""
+import asyncio
+import hashlib
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import resolve, reverse
+
+from watchlist_app import caching
+from watchmate.metrics import registry
+
+RESPONSES = registry.counter('watchmate_response_cache_total', 'Cacheable requests, by outcome.')
+
+CACHEABLE_TYPES = ('application/json', 'application/x-ndjson')
+# Versions read at the start of every render, see ResponseCacheMiddleware.render().
+LIST_TAGS = [('watchlist', 'list'), ('platform', 'list')]
+ANY_TAGS = [('watchlist', 'any'), ('platform', 'any')]
+
+
+def get_config():
+    config = {'ENABLED': True, 'ROUTES': [], 'TIMEOUT': 60, 'STALE': 300, 'LOCK_TIMEOUT': 30, 'WAIT': 5,
+              'MAX_SIZE': 8 * 1024 * 1024, 'MAX_TAGS': 500}
+    config.update(getattr(settings, 'WATCHMATE_RESPONSE_CACHE', {}))
+    return config
+
+
+@lru_cache
+def route_paths(routes):
+    return frozenset(reverse(name) for name in routes)
+
+
+def surrogate_key(tags):
+    return ' '.join(sorted(f'{kind}-{pk}' for kind, pk in tags))
+
+
+class ResponseCacheMiddleware:
+    """
+    Serves GET and HEAD requests to ROUTES without credentials or a session
+    cookie from the cache. Hits skip authentication, throttling and the view.
+    On an async chain the cache is read with its async API and versions are
+    checked in sync_to_async, so the event loop never blocks on the cache.
+    """
+    sync_capable = async_capable = True
+    poll_interval = 0.05
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        if not self.cacheable(request, config):
+            return self.get_response(request)
+
+        cache = caching.get_cache()
+        key = self.cache_key(request)
+        lock = f'{key}:lock'
+        deadline = time.monotonic() + config['WAIT']
+        while True:
+            entry = cache.get(key)
+            valid = entry is not None and caching.versions_match(entry['versions'])
+            if valid and time.time() < entry['fresh_until']:
+                return self.respond(request, entry, 'HIT')
+            if cache.add(lock, 1, config['LOCK_TIMEOUT']):
+                return self.render(request, config, key, lock)
+            if valid:
+                # Someone else is refreshing it.
+                return self.respond(request, entry, 'STALE')
+            if time.monotonic() >= deadline:
+                RESPONSES.inc(outcome='timeout')
+                return self.get_response(request)
+            time.sleep(self.poll_interval)
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not self.cacheable(request, config):
+            return await self.get_response(request)
+
+        cache = caching.get_cache()
+        key = self.cache_key(request)
+        lock = f'{key}:lock'
+        deadline = time.monotonic() + config['WAIT']
+        while True:
+            entry = await cache.aget(key)
+            valid = entry is not None and await sync_to_async(caching.versions_match)(entry['versions'])
+            if valid and time.time() < entry['fresh_until']:
+                return self.respond(request, entry, 'HIT')
+            if await cache.aadd(lock, 1, config['LOCK_TIMEOUT']):
+                return await self.arender(request, config, key, lock)
+            if valid:
+                return self.respond(request, entry, 'STALE')
+            if time.monotonic() >= deadline:
+                RESPONSES.inc(outcome='timeout')
+                return await self.get_response(request)
+            await asyncio.sleep(self.poll_interval)
+
+    def cacheable(self, request, config):
+        return (config['ENABLED'] and request.method in ('GET', 'HEAD')
+                and 'HTTP_AUTHORIZATION' not in request.META
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and request.path_info in route_paths(tuple(config['ROUTES'])))
+
+    @staticmethod
+    def cache_key(request):
+        # Content negotiation picks the renderer from Accept, so it is part of the key.
+        variant = f'{request.path_info}?{request.META.get("QUERY_STRING", "")}#{request.META.get("HTTP_ACCEPT", "")}'
+        return f'watchmate:response:{hashlib.sha1(variant.encode()).hexdigest()}'
+
+    def respond(self, request, entry, outcome):
+        RESPONSES.inc(outcome=outcome.lower())
+        # Label the hit with its route in the request metrics.
+        request.resolver_match = resolve(request.path_info)
+        response = HttpResponse(entry['body'], status=entry['status'])
+        for header, value in entry['headers']:
+            response[header] = value
+        response['X-Cache'] = outcome
+        return response
+
+    def render(self, request, config, key, lock):
+        """Run the view while holding ``lock``, storing its response unless a write raced it."""
+        RESPONSES.inc(outcome='miss')
+        # A write to any object between the view's reads and the version reads
+        # below bumps the 'any' versions, which makes the response unsafe to store.
+        before = caching.get_versions(LIST_TAGS + ANY_TAGS)
+        tags = set()
+        token = caching._tags.set(tags)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            caching.get_cache().delete(lock)
+            raise
+        finally:
+            caching._tags.reset(token)
+
+        response['X-Cache'] = 'MISS'
+        if not self.storable(request, response):
+            caching.get_cache().delete(lock)
+            return response
+        if response.streaming:
+            response.streaming_content = self._stream(response, response.streaming_content, config, key, lock,
+                                                      before, tags)
+            return response
+        try:
+            self.store(response, response.content, config, key, before, tags)
+        finally:
+            caching.get_cache().delete(lock)
+        return response
+
+    async def arender(self, request, config, key, lock):
+        """render() for an async chain."""
+        RESPONSES.inc(outcome='miss')
+        cache = caching.get_cache()
+        before = await sync_to_async(caching.get_versions)(LIST_TAGS + ANY_TAGS)
+        tags = set()
+        token = caching._tags.set(tags)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await cache.adelete(lock)
+            raise
+        finally:
+            caching._tags.reset(token)
+
+        response['X-Cache'] = 'MISS'
+        if not self.storable(request, response):
+            await cache.adelete(lock)
+            return response
+        if response.streaming:
+            response.streaming_content = self._stream(response, response.streaming_content, config, key, lock,
+                                                      before, tags)
+            return response
+        try:
+            await sync_to_async(self.store)(response, response.content, config, key, before, tags)
+        finally:
+            await cache.adelete(lock)
+        return response
+
+    @staticmethod
+    def storable(request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        return (request.method == 'GET' and response.status_code == 200 and not response.cookies
+                and content_type in CACHEABLE_TYPES and not getattr(response, 'is_async', False))
+
+    def store(self, response, body, config, key, before, tags):
+        if len(body) > config['MAX_SIZE']:
+            return
+        if len(tags) > config['MAX_TAGS']:
+            tags = {(kind, 'any') for kind, _ in tags}
+        versions = caching.get_versions([*LIST_TAGS, *tags])
+        current = caching.get_versions(ANY_TAGS)
+        if any(before[version_key] != current[version_key] for version_key in current):
+            RESPONSES.inc(outcome='raced')
+            return
+        response['Surrogate-Key'] = surrogate_key(tags)
+        headers = [(header, value) for header, value in response.items() if header != 'X-Cache']
+        entry = {'status': response.status_code, 'headers': headers, 'body': body, 'versions': versions,
+                 'fresh_until': time.time() + config['TIMEOUT']}
+        caching.get_cache().set(key, entry, config['TIMEOUT'] + config['STALE'])
+
+    def _stream(self, response, chunks, config, key, lock, before, tags):
+        """Pass the body through, collecting its tags and bytes, then store it."""
+        chunks = iter(chunks)
+        body, size, complete = [], 0, False
+        try:
+            while True:
+                token = caching._tags.set(tags)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    caching._tags.reset(token)
+                if chunk is None:
+                    complete = True
+                    break
+                size += len(chunk)
+                if body is not None and size <= config['MAX_SIZE']:
+                    body.append(chunk)
+                else:
+                    body = None
+                yield chunk
+        finally:
+            try:
+                # The headers are already sent, so only later hits get the Surrogate-Key.
+                if complete and body is not None:
+                    self.store(response, b''.join(body), config, key, before, tags)
+            finally:
+                caching.get_cache().delete(lock)
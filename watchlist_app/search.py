@@ -0,0 +1,298 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from watchlist_app import caching
+from watchlist_app.models import Watchlist
+
+FTS_TABLE = 'watchlist_app_watchlist_fts'
+# Column weights used for ranking: a title hit counts ten times a description hit.
+FIELD_WEIGHTS = {'title': 10.0, 'description': 1.0}
+# unicode61 splits on underscores as well as on punctuation and whitespace.
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Lower-cased, accent-stripped words; matches FTS5's ``unicode61 remove_diacritics 2`` tokenizer."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_RE.findall(text.lower())
+
+
+# Alias -> whether its database has the FTS5 table; the table only comes and goes with migrations.
+_fts5_tables = {}
+
+
+def fts5_available(using):
+    available = _fts5_tables.get(using)
+    if available is None:
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            available = _fts5_tables[using] = cursor.fetchone() is not None
+    return available
+
+
+@receiver(post_migrate)
+def forget_fts5_probe(using, **kwargs):
+    _fts5_tables.pop(using, None)
+
+
+class FTS5SearchBackend:
+    """Watchlist search backed by an SQLite FTS5 table, ranked with its built-in bm25()."""
+
+    def __init__(self, using):
+        self.using = using
+
+    def _execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def match_expression(terms, prefix):
+        phrases = [f'"{term}"' for term in terms]
+        if prefix:
+            phrases[-1] += '*'
+        return ' '.join(phrases)
+
+    def index(self, watchlist):
+        self.remove(watchlist.pk)
+        self._execute(f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+                      [watchlist.pk, watchlist.title, watchlist.description])
+
+    def remove(self, pk):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def rebuild(self):
+        self._execute(f'DELETE FROM {FTS_TABLE}')
+        self._execute(f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+                      f'SELECT id, title, description FROM {Watchlist._meta.db_table}')
+
+    def count(self, terms, prefix=True):
+        return self._execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                             [self.match_expression(terms, prefix)])[0][0]
+
+    def search(self, terms, offset, limit, prefix=True):
+        weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS.values())
+        rows = self._execute(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                             f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                             [self.match_expression(terms, prefix), limit, offset])
+        return [row[0] for row in rows]
+
+
+class PythonSearchBackend:
+    """
+    In-process inverted index for databases without FTS5, with the same
+    tokenization, prefix matching and BM25 ranking as the FTS5 backend.
+    It is built from the table on first use and then kept current by the
+    model signals.
+
+    Every process holds its own copy, so changes also bump a shared 'search'
+    version (watchlist_app.caching) and an index rebuilds once that version
+    has moved. Writes that skip the signals, such as QuerySet.update() and
+    bulk_create(), show up after WATCHMATE_SEARCH_INDEX_TTL seconds at most.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.version = None  # shared version the index was built at
+        self.expires = 0  # time.monotonic() after which it is rebuilt anyway
+        self.ranked = None  # (terms, prefix, pks) of the last query; count() and search() share it
+
+    def _reset(self):
+        self.ranked = None
+        self.postings = defaultdict(dict)  # term -> {pk: {field: term frequency}}
+        self.lengths = {}  # pk -> token count over all fields
+        self.document_terms = {}  # pk -> terms, so a document can be removed without a vocabulary scan
+        self.total_length = 0
+        self.terms = []  # sorted vocabulary, for prefix lookups
+
+    def _ensure_built(self):
+        if (not self.built or time.monotonic() >= self.expires
+                or caching.get_version('search', 'index') != self.version):
+            self._build()
+
+    def _publish(self):
+        """Make the other processes rebuild, keeping this index if it was current."""
+        current = self.built and caching.get_version('search', 'index') == self.version
+        caching.invalidate('search', 'index')
+        if current:
+            self.version = caching.get_version('search', 'index')
+
+    def _add(self, pk, fields, keep_sorted=True):
+        self.ranked = None
+        self.lengths[pk] = 0
+        self.document_terms[pk] = set()
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            self.lengths[pk] += len(tokens)
+            self.total_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                if keep_sorted and term not in self.postings:
+                    insort(self.terms, term)
+                self.postings[term].setdefault(pk, {})[field] = frequency
+                self.document_terms[pk].add(term)
+
+    def _discard(self, pk):
+        self.ranked = None
+        length = self.lengths.pop(pk, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.document_terms.pop(pk):
+            del self.postings[term][pk]
+            if not self.postings[term]:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def index(self, watchlist):
+        with self.lock:
+            if self.built:
+                self._discard(watchlist.pk)
+                self._add(watchlist.pk, {'title': watchlist.title, 'description': watchlist.description})
+            self._publish()
+
+    def remove(self, pk):
+        with self.lock:
+            if self.built:
+                self._discard(pk)
+            self._publish()
+
+    def rebuild(self):
+        with self.lock:
+            caching.invalidate('search', 'index')
+            self._build()
+
+    def _build(self):
+        with self.lock:
+            self._reset()
+            # Read before the rows, so a change committed meanwhile triggers another rebuild.
+            self.version = caching.get_version('search', 'index')
+            self.expires = time.monotonic() + getattr(settings, 'WATCHMATE_SEARCH_INDEX_TTL', 300)
+            for pk, title, description in Watchlist.objects.values_list('pk', 'title', 'description').iterator():
+                self._add(pk, {'title': title, 'description': description}, keep_sorted=False)
+            self.terms = sorted(self.postings)
+            self.built = True
+
+    def _expand(self, term):
+        start = bisect_left(self.terms, term)
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(term):
+            end += 1
+        return self.terms[start:end]
+
+    def rank(self, terms, prefix=True):
+        """Matching primary keys, best match first."""
+        with self.lock:
+            self._ensure_built()
+            if self.ranked and self.ranked[:2] == (terms, prefix):
+                return self.ranked[2]
+            documents = len(self.lengths)
+            if not documents:
+                return []
+            average_length = max(self.total_length / documents, 1)
+            scores = None
+            # Scored the way FTS5's bm25() does it: each query term is a phrase whose
+            # frequency is the column-weighted sum of its hits (over every expansion
+            # of a prefix term), normalised by the length of the whole row.
+            for position, term in enumerate(terms):
+                expansions = self._expand(term) if prefix and position == len(terms) - 1 else [term]
+                frequencies = defaultdict(float)
+                for expansion in expansions:
+                    for pk, fields in self.postings.get(expansion, {}).items():
+                        frequencies[pk] += sum(FIELD_WEIGHTS[field] * count for field, count in fields.items())
+                matches = len(frequencies)
+                idf = max(1e-6, math.log((documents - matches + 0.5) / (matches + 0.5)))
+                term_scores = {
+                    pk: idf * frequency * (self.k1 + 1)
+                    / (frequency + self.k1 * (1 - self.b + self.b * self.lengths[pk] / average_length))
+                    for pk, frequency in frequencies.items()
+                }
+                # Every term has to match, like FTS5's implicit AND.
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+            pks = sorted(scores, key=lambda pk: (-scores[pk], pk))
+            self.ranked = (terms, prefix, pks)
+            return pks
+
+    def count(self, terms, prefix=True):
+        return len(self.rank(terms, prefix))
+
+    def search(self, terms, offset, limit, prefix=True):
+        return self.rank(terms, prefix)[offset:offset + limit]
+
+
+_python_backend = PythonSearchBackend()
+
+
+def get_search_backend(using=None):
+    """
+    The configured backend: 'fts5', 'python', or 'auto' (FTS5 when the table
+    exists). Queries use the read database unless ``using`` names another.
+    """
+    using = using or router.db_for_read(Watchlist)
+    choice = getattr(settings, 'WATCHMATE_SEARCH_BACKEND', 'auto')
+    if choice == 'fts5' or (choice == 'auto' and fts5_available(using)):
+        return FTS5SearchBackend(using)
+    return _python_backend
+
+
+@receiver(post_save, sender=Watchlist)
+def index_watchlist(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        get_search_backend(using).index(instance)
+
+
+@receiver(post_delete, sender=Watchlist)
+def unindex_watchlist(sender, instance, using=None, **kwargs):
+    get_search_backend(using).remove(instance.pk)
+
+
+class SearchResults:
+    """
+    Lazily ranked watchlists for ``query``, sliceable like a queryset so the
+    regular paginators only ask the backend for the page they show.
+    """
+
+    def __init__(self, query, queryset=None, prefix=True, backend=None):
+        self.terms = tokenize(query)
+        self.queryset = queryset if queryset is not None else Watchlist.objects.all()
+        self.prefix = prefix
+        self.backend = backend or get_search_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.prefix) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+        pks = self.backend.search(self.terms, start, stop - start, self.prefix)
+        watchlists = self.queryset.in_bulk(pks)
+        return [watchlists[pk] for pk in pks if pk in watchlists]
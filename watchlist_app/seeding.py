@@ -0,0 +1,62 @@
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from watchlist_app.leaderboards import refresh_scores
+from watchlist_app.models import Review, StreamPlatform, Watchlist
+from watchlist_app.profiles import refresh_profiles
+from watchlist_app.ratings import reconcile_ratings
+from watchlist_app.search import get_search_backend
+
+
+def _bulk_create(model, objects, batch_size):
+    """
+    bulk_create() from a generator in slices, so memory stays flat however many
+    rows are made. Returns the primary keys of the new rows in insertion order.
+    """
+    start = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    objects = iter(objects)
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch)
+    return model.objects.filter(pk__gt=start).order_by('pk').values_list('pk', flat=True)
+
+
+def seed(users=100, platforms=5, watchlists=100, reviews=1000, batch_size=5000, username_prefix='user'):
+    """
+    Bulk-insert a synthetic catalog. Review ``i`` belongs to user ``i % users``
+    and watchlist ``i // users``, which keeps (review_user, watchlist) unique.
+
+    Rows go in with bulk_create(), which skips the signals that maintain rating
+    aggregates, leaderboard scores and the search index; see rebuild_derived().
+    """
+    if reviews > users * watchlists:
+        raise ValueError('reviews cannot exceed users * watchlists')
+    with transaction.atomic():
+        user_ids = list(_bulk_create(User, (User(username=f'{username_prefix}{i}') for i in range(users)), batch_size))
+        platform_ids = list(_bulk_create(
+            StreamPlatform,
+            (StreamPlatform(name=f'Platform {i}', about='Streaming platform', website='https://example.com')
+             for i in range(platforms)), batch_size))
+        watchlist_ids = list(_bulk_create(
+            Watchlist,
+            (Watchlist(title=f'Title {i}', description=f'Description of title {i}',
+                       platform_id=platform_ids[i % platforms]) for i in range(watchlists)),
+            batch_size))
+        now = timezone.now()
+        _bulk_create(
+            Review,
+            (Review(review_user_id=user_ids[i % users], watchlist_id=watchlist_ids[i // users],
+                    rating=i % 5 + 1, description='Synthetic review', created=now, updated=now)
+             for i in range(reviews)),
+            batch_size)
+
+
+def rebuild_derived():
+    """Recompute everything the model signals would have kept current during seed()."""
+    reconcile_ratings()
+    refresh_scores()
+    refresh_profiles()
+    get_search_backend(router.db_for_write(Watchlist)).rebuild()
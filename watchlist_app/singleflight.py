@@ -0,0 +1,107 @@
+"""
+Single-flight: concurrent calls for the same key share one computation.
+
+Threads of a process wait for the first caller and receive its result or
+exception. Given a ``peek`` function, the first caller also takes a lock in the
+shared cache, so callers in other processes poll ``peek()`` for the result it
+publishes instead of computing it again.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from watchlist_app import caching
+from watchmate.metrics import COUNT_BUCKETS, registry
+
+CALLS = registry.counter('watchmate_singleflight_calls_total',
+                         'Single-flight calls, by flight and how they were served.')
+CALLERS = registry.histogram('watchmate_singleflight_callers',
+                             'Callers in this process served by one computation.', COUNT_BUCKETS)
+
+
+def get_config():
+    config = {'ENABLED': True, 'LOCK_TIMEOUT': 10, 'WAIT': 5, 'POLL_INTERVAL': 0.01}
+    config.update(getattr(settings, 'WATCHMATE_SINGLE_FLIGHT', {}))
+    return config
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'callers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.callers = 1
+
+
+class SingleFlight:
+    """
+    A group of keyed calls. ``calls_total`` is labelled by outcome: 'leader'
+    (computed it), 'thread' (waited for a thread of this process), 'process'
+    (took another process's result) or 'timeout' (gave up waiting on another
+    process after WAIT seconds and computed it too).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func, peek=None):
+        config = get_config()
+        if not config['ENABLED']:
+            return func()
+
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                call.callers += 1
+
+        if not leader:
+            call.done.wait()
+            CALLS.inc(flight=self.name, outcome='thread')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        outcome = 'leader'
+        try:
+            call.result, outcome = self._run(key, func, peek, config)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+            CALLS.inc(flight=self.name, outcome=outcome)
+            CALLERS.observe(call.callers, flight=self.name)
+
+    @staticmethod
+    def _run(key, func, peek, config):
+        if peek is None:
+            return func(), 'leader'
+        cache = caching.get_cache()
+        lock = f'{key}:flight'
+        deadline = time.monotonic() + config['WAIT']
+        while not cache.add(lock, 1, config['LOCK_TIMEOUT']):
+            result = peek()
+            if result is not None:
+                return result, 'process'
+            if time.monotonic() >= deadline:
+                return func(), 'timeout'
+            time.sleep(config['POLL_INTERVAL'])
+        try:
+            # The previous holder may have published it just before releasing the lock.
+            result = peek()
+            if result is not None:
+                return result, 'process'
+            return func(), 'leader'
+        finally:
+            cache.delete(lock)
@@ -0,0 +1,221 @@
+"""
+Write-behind task queue. ``defer()`` stores a call in the OutboxTask table inside
+the caller's transaction, so it is committed or rolled back with the write that
+asked for it and survives restarts. Outbox rows are then run by an in-process
+thread pool ('thread' mode) or by ``manage.py run_tasks`` ('outbox' mode);
+'sync' mode stores nothing and runs calls inline, before the caller commits.
+
+Calls deferred with the same ``key`` while one is pending coalesce into a single
+run. A request made while that run is in progress schedules one more run, so
+every request is followed by a complete run after it.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, router, transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from watchlist_app.models import OutboxTask
+from watchmate.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TASKS = registry.counter('watchmate_tasks_total', 'Deferred tasks run, by task and outcome.')
+TASK_DURATION = registry.histogram('watchmate_task_duration_seconds', 'Deferred task run time.')
+
+
+def get_config():
+    config = {'MODE': 'thread', 'WORKERS': 2, 'POLL_INTERVAL': 0.5, 'BATCH_SIZE': 100, 'LEASE': 300,
+              'MAX_ATTEMPTS': 5, 'RETRY_DELAY': 5, 'RATING_DELAY': 1.0}
+    config.update(getattr(settings, 'WATCHMATE_TASKS', {}))
+    return config
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def defer(func, *args, key=None, delay=0):
+    """
+    Run ``func(*args)`` after the current transaction commits and at least
+    ``delay`` seconds from now. ``func`` must be importable by name and its
+    arguments JSON-serializable. In 'sync' mode the call runs right away,
+    inside the caller's transaction, and ``delay`` is ignored.
+    """
+    defer_each(func, [(args, key)], delay)
+
+
+def defer_each(func, calls, delay=0):
+    """Defer one ``func`` call per ``(args, key)`` in ``calls`` with a single INSERT, or run them in 'sync' mode."""
+    config = get_config()
+    if config['MODE'] == 'sync':
+        for args, _ in calls:
+            func(*args)
+        return
+
+    run_after = timezone.now() + timedelta(seconds=delay)
+    tasks = [OutboxTask(key=key or uuid.uuid4().hex, name=task_name(func), args=list(args),
+                        generation=uuid.uuid4().hex, run_after=run_after) for args, key in calls]
+    if not tasks:
+        return
+    using = router.db_for_write(OutboxTask)
+    # A pending task with the same key keeps its run_after, which bounds the delay
+    # of a steady stream of requests; a failed one is given a fresh start.
+    OutboxTask.objects.using(using).bulk_create(tasks, update_conflicts=True, unique_fields=['key'],
+                                                update_fields=['args', 'generation', 'attempts', 'failed'])
+    if config['MODE'] == 'thread':
+        transaction.on_commit(get_queue().wake, using=using)
+
+
+def claim_due(limit, due_only=True):
+    """Lease up to ``limit`` runnable tasks to the caller, oldest first."""
+    config = get_config()
+    using = router.db_for_write(OutboxTask)
+    now = timezone.now()
+    unclaimed = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    candidates = OutboxTask.objects.using(using).filter(unclaimed, failed=False)
+    if due_only:
+        candidates = candidates.filter(run_after__lte=now)
+    claimed = []
+    for task in candidates.order_by('run_after', 'pk')[:limit]:
+        # Another worker may have claimed it since the SELECT.
+        if OutboxTask.objects.using(using).filter(unclaimed, pk=task.pk).update(
+                claimed_until=now + timedelta(seconds=config['LEASE'])):
+            claimed.append(task)
+    return claimed
+
+
+def run_task(task):
+    """Run one claimed task, then retire it, release it for another run, or schedule a retry."""
+    config = get_config()
+    queryset = OutboxTask.objects.using(router.db_for_write(OutboxTask)).filter(pk=task.pk)
+    start = time.perf_counter()
+    try:
+        import_string(task.name)(*task.args)
+    except Exception as exc:
+        logger.exception('Deferred task %s (%s) failed', task.name, task.key)
+        attempts = task.attempts + 1
+        failed = attempts >= config['MAX_ATTEMPTS']
+        queryset.update(attempts=attempts, failed=failed, last_error=repr(exc), claimed_until=None,
+                        run_after=timezone.now() + timedelta(seconds=config['RETRY_DELAY'] * 2 ** (attempts - 1)))
+        outcome = 'failed' if failed else 'retry'
+    else:
+        # Requested again while running: keep the row so the new request gets its own run.
+        deleted, _ = queryset.filter(generation=task.generation).delete()
+        if not deleted:
+            queryset.update(claimed_until=None)
+        outcome = 'done'
+    TASKS.inc(task=task.name, outcome=outcome)
+    TASK_DURATION.observe(time.perf_counter() - start, task=task.name)
+    return outcome
+
+
+def run_pending(due_only=False, limit=None):
+    """
+    Run outbox tasks in this thread until none is left, including ones whose
+    delay has not passed unless ``due_only``. Returns the number of runs.
+    """
+    batch_size = get_config()['BATCH_SIZE']
+    runs = 0
+    while limit is None or runs < limit:
+        tasks = claim_due(batch_size if limit is None else min(batch_size, limit - runs), due_only)
+        if not tasks:
+            break
+        for task in tasks:
+            run_task(task)
+        runs += len(tasks)
+    return runs
+
+
+class TaskQueue:
+    """
+    A dispatcher thread that claims due outbox tasks, on a wake-up after a
+    commit or every POLL_INTERVAL, and runs them on a pool of worker threads.
+    """
+
+    def __init__(self, workers, poll_interval):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='watchmate-task')
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='watchmate-task-dispatcher', daemon=True)
+                self.thread.start()
+
+    def wake(self):
+        self.start()
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            tasks = []
+            try:
+                tasks = claim_due(self.workers)
+                wait([self.executor.submit(self._execute, task) for task in tasks])
+            except Exception:
+                logger.exception('Task dispatcher failed')
+            finally:
+                close_old_connections()
+            if not tasks:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+
+    @staticmethod
+    def _execute(task):
+        try:
+            run_task(task)
+        finally:
+            close_old_connections()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                config = get_config()
+                _queue = TaskQueue(config['WORKERS'], config['POLL_INTERVAL'])
+    return _queue
+
+
+def stop_queue():
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.stop()
+
+
+@receiver(request_started)
+def start_queue(**kwargs):
+    # Started by the first request, so tasks left in the outbox by a previous process run too.
+    if get_config()['MODE'] == 'thread':
+        get_queue().start()
@@ -1,9 +1,43 @@
-from rest_framework.test import APITestCase
+import json
+import threading
+import time
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, RequestFactory, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
-from watchlist_app.models import Watchlist, StreamPlatform, Review
+from watchlist_app import caching, leaderboards, tasks
+from watchmate.database import ReadReplicaRouter, database_profile, unpin
+from watchmate.instrumentation import InstrumentationMiddleware, ProfilingMiddleware
+from watchmate.metrics import registry
+from watchlist_app.api.pagination import ReviewKeysetPagination
+from watchlist_app.api.serializers import StreamPlatformSerializer, WatchlistSerializer
+from watchlist_app.models import (Watchlist, StreamPlatform, Review, WatchlistScore, OutboxTask, ReviewerProfile,
+                                  ChangeEvent)
+from watchlist_app.ratings import apply_review_change, reconcile_ratings, review_contribution
+from watchlist_app.profiles import refresh_profiles
+from watchlist_app.response_cache import ResponseCacheMiddleware
+from watchlist_app.search import PythonSearchBackend, SearchResults, fts5_available
+from watchlist_app.singleflight import CALLS, SingleFlight
+from watchlist_app.tasks import run_pending
+from watchmate.renderers import FastJSONRenderer
 
 
 class StreamPlatformTestCase(APITestCase):
@@ -83,6 +117,25 @@ class WatchlistTestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_watchlist_list_streaming(self):
+        Watchlist.objects.create(platform=self.stream, title='Second Watchlist',
+                                 description='Test Description', active=False)
+        response = self.client.get(reverse('watchlist_app:movie-list'))
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data, WatchlistSerializer(Watchlist.objects.order_by('id'), many=True).data)
+
+        response = self.client.get(reverse('watchlist_app:movie-list'), {'active': 'false'},
+                                   HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Second Watchlist'])
+
+    def test_watchlist_list_paginated(self):
+        response = self.client.get(reverse('watchlist_app:movie-list'), {'page': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
     def test_watchlist_ind(self):
         url = reverse('watchlist_app:movie-detail', args=[self.watchlist.id])
         response = self.client.get(url)
@@ -142,3 +195,1240 @@ class ReviewTestCase(APITestCase):
     def test_review_user(self):
         response = self.client.get('/watch/reviews/?username=' + str(self.user.username))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class QueryCountTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        for i in range(3):
+            stream = StreamPlatform.objects.create(name=f'Platform {i}', about='Streaming Platform',
+                                                   website='https://www.example.com')
+            for j in range(3):
+                watchlist = Watchlist.objects.create(platform=stream, title=f'Title {i}-{j}',
+                                                     description='Test Description', active=True)
+                Review.objects.create(review_user=self.user, rating=4, watchlist=watchlist)
+        self.watchlist = watchlist
+        self.stream = stream
+
+    def test_streamplatform_list_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('watchlist_app:streamplatform-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['watchlist'][0]['platform'], 'Platform 0')
+
+    def test_streamplatform_detail_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('watchlist_app:streamplatform-detail', args=[self.stream.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_watchlist_queries(self):
+        with self.assertNumQueries(1):
+            b''.join(self.client.get(reverse('watchlist_app:movie-list')).streaming_content)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('watchlist_app:movie-detail', args=[self.watchlist.id]))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('watchlist_app:movie-new'))
+
+    def test_review_queries(self):
+        review = self.watchlist.reviews.get()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('watchlist_app:review-detail', args=[review.id]))
+        # The username is resolved once, then the reviews are read by user id without a join.
+        with self.assertNumQueries(2):
+            self.client.get('/watch/reviews/?username=testuser')
+
+
+class RatingAggregateTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description', active=True)
+
+    def assertRatings(self, rating_sum, number_rating, avg_rating):
+        self.watchlist.refresh_from_db()
+        self.assertEqual(self.watchlist.rating_sum, rating_sum)
+        self.assertEqual(self.watchlist.number_rating, number_rating)
+        self.assertAlmostEqual(self.watchlist.avg_rating, avg_rating)
+
+    def test_create_update_delete(self):
+        other = User.objects.create_user(username='other', password='testpass')
+        Review.objects.create(review_user=other, rating=5, watchlist=self.watchlist)
+        reconcile_ratings()
+        self.assertRatings(5, 1, 5)
+
+        url = reverse('watchlist_app:review-create', args=[self.watchlist.id])
+        self.client.post(url, {'rating': 2, 'watchlist': self.watchlist.id}, format='json')
+        self.assertRatings(7, 2, 3.5)
+
+        review = Review.objects.get(review_user=self.user)
+        url = reverse('watchlist_app:review-detail', args=[review.id])
+        self.client.put(url, {'rating': 4, 'watchlist': self.watchlist.id, 'active': False}, format='json')
+        self.assertRatings(5, 1, 5)
+
+        self.client.delete(url)
+        self.assertRatings(5, 1, 5)
+        Review.objects.filter(review_user=other).delete()
+        self.assertRatings(5, 1, 5)
+
+    def test_reconcile_command(self):
+        Review.objects.create(review_user=self.user, rating=3, watchlist=self.watchlist)
+        Watchlist.objects.update(rating_sum=100, number_rating=7, avg_rating=1)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertRatings(3, 1, 3)
+
+
+class RatingConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_updates_are_not_lost(self):
+        watchlist = Watchlist.objects.create(title='Test Watchlist', description='Test Description')
+        threads, per_thread = 4, 10
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    apply_review_change(after=(watchlist.id, 3, 1))
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+        watchlist.refresh_from_db()
+        self.assertEqual(watchlist.number_rating, threads * per_thread)
+        self.assertEqual(watchlist.rating_sum, 3 * threads * per_thread)
+        self.assertEqual(watchlist.avg_rating, 3)
+
+
+class DetailCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description', active=True)
+        self.url = reverse('watchlist_app:movie-detail', args=[self.watchlist.id])
+
+    def test_watchlist_detail_is_cached(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.data, response.data)
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        review = Review.objects.create(review_user=self.user, rating=4, watchlist=self.watchlist)
+        apply_review_change(after=review_contribution(review))
+        modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    def test_platform_rename_is_a_modification(self):
+        response = self.client.get(self.url)
+        self.stream.name = 'Hulu'
+        self.stream.save()
+        # Last-Modified has one-second resolution.
+        later = timezone.now() + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertEqual(modified.data['platform'], 'Hulu')
+
+    def test_invalidation(self):
+        platform_url = reverse('watchlist_app:streamplatform-detail', args=[self.stream.id])
+        self.client.get(self.url)
+        self.client.get(platform_url)
+
+        self.watchlist.title = 'Renamed'
+        self.watchlist.save()
+        self.assertEqual(self.client.get(self.url).data['title'], 'Renamed')
+        self.assertEqual(self.client.get(platform_url).data['watchlist'][0]['title'], 'Renamed')
+
+        self.stream.name = 'Hulu'
+        self.stream.save()
+        self.assertEqual(self.client.get(self.url).data['platform'], 'Hulu')
+        self.assertEqual(self.client.get(platform_url).data['name'], 'Hulu')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTestCase(APITestCase):
+    """Plans of the SQL the views actually run, captured from requests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=self.stream, title=f'Title {i}',
+                                                    description='Test Description') for i in range(5)]
+        for i, user in enumerate([self.user] + [User.objects.create(username=f'user{i}') for i in range(4)]):
+            Review.objects.create(review_user=user, rating=i + 1, watchlist=self.watchlists[0])
+            Review.objects.create(review_user=user, rating=i + 1, watchlist=self.watchlists[1 + i % 4],
+                                  active=i % 2 == 0)
+
+    def assertNoTableScan(self, url, params=None):
+        """GET ``url``, then its next page, and check every filtered or sorted SELECT uses an index."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            next_page = isinstance(response.data, dict) and response.data.get('next')
+            if next_page:
+                self.client.get(next_page)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            # Reading a whole table is expected when nothing narrows it down.
+            selective = ' WHERE ' in sql or ' ORDER BY ' in sql
+            for step in plan:
+                table_scan = (selective and step.startswith('SCAN') and 'INDEX' not in step
+                              and 'subquery' not in step)
+                self.assertFalse(table_scan or 'TEMP B-TREE' in step, f'{step!r} in plan for: {sql}')
+
+    def test_review_list(self):
+        url = reverse('watchlist_app:review-list', args=[self.watchlists[0].pk])
+        self.assertNoTableScan(url, {'size': 2, 'total': 1})
+        self.assertNoTableScan(url, {'size': 2, 'active': True})
+        self.assertNoTableScan(url, {'size': 2, 'review_user__username': 'testuser'})
+
+    def test_user_reviews(self):
+        self.assertNoTableScan(reverse('watchlist_app:user-review-detail'), {'username': 'testuser', 'size': 1})
+
+    def test_watchlist_ordering(self):
+        url = reverse('watchlist_app:movie-new')
+        self.assertNoTableScan(url)
+        self.assertNoTableScan(url, {'ordering': '-avg_rating'})
+
+    def test_platform_prefetch(self):
+        self.assertNoTableScan(reverse('watchlist_app:streamplatform-list'))
+
+    def test_leaderboards(self):
+        url = reverse('watchlist_app:movie-leaderboard')
+        for kind in ('top', 'trending'):
+            self.assertNoTableScan(url, {'kind': kind})
+            self.assertNoTableScan(url, {'kind': kind, 'platform': self.stream.pk})
+
+
+class ReviewPaginationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description', active=True)
+        created = timezone.now()
+        for i in range(7):
+            user = User.objects.create_user(username=f'user{i}', password='testpass')
+            review = Review.objects.create(review_user=user, rating=3, watchlist=self.watchlist)
+            # Pairs of reviews share a timestamp so the id tiebreaker is exercised.
+            Review.objects.filter(pk=review.pk).update(created=created - timedelta(minutes=i // 2))
+
+    def test_keyset_pages(self):
+        url = reverse('watchlist_app:review-list', args=[self.watchlist.id])
+        expected = list(Review.objects.order_by('-created', '-id').values_list('id', flat=True))
+        seen = []
+        response = self.client.get(url, {'size': 3, 'total': 1})
+        self.assertEqual(response.data['total'], 7)
+        self.assertFalse(response.data['total_is_estimate'])
+        while True:
+            seen += [review['id'] for review in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_page_size_cap_and_invalid_cursor(self):
+        url = reverse('watchlist_app:review-list', args=[self.watchlist.id])
+        with mock.patch.object(ReviewKeysetPagination, 'max_page_size', 2):
+            response = self.client.get(url, {'size': 1000})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReviewBulkCreateTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=self.stream, title=f'Title {i}',
+                                                    description='Test Description') for i in range(3)]
+        self.url = reverse('watchlist_app:review-bulk-create')
+
+    def test_bulk_create(self):
+        first, second, third = self.watchlists
+        Review.objects.create(review_user=self.user, rating=1, watchlist=third)
+        data = [
+            {'watchlist': first.id, 'rating': 4, 'description': 'Great'},
+            {'watchlist': first.id, 'rating': 2},
+            {'watchlist': second.id, 'rating': 5},
+            {'watchlist': second.id + 100, 'rating': 5},
+            {'watchlist': third.id, 'rating': 3},
+            {'watchlist': second.id, 'rating': 9},
+        ]
+        with CaptureQueriesContext(connection) as queries, self.settings(WATCHMATE_TASKS={'MODE': 'outbox'}):
+            response = self.client.post(self.url, data, format='json')
+        statements = [query['sql'].split()[0] for query in queries]
+        # Token lookup, watchlist lookup and duplicate lookup; a single INSERT for the batch, one for the
+        # deferred rating recomputes and one for the change feed.
+        self.assertEqual((statements.count('SELECT'), statements.count('INSERT')), (3, 3))
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'error', 'created', 'error', 'error', 'error'])
+        self.assertIn('rating', response.data['results'][5]['errors'])
+        self.assertEqual(Review.objects.count(), 3)
+
+        self.assertEqual(run_pending(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.number_rating, first.avg_rating), (1, 4))
+        self.assertEqual((second.number_rating, second.avg_rating), (1, 5))
+
+    def test_bulk_create_requires_list(self):
+        response = self.client.post(self.url, {'watchlist': self.watchlists[0].id, 'rating': 4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastSerializerParityTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpass')
+        for i in range(3):
+            stream = StreamPlatform.objects.create(name=f'Platform {i}', about='Streaming Platform',
+                                                   website='https://www.example.com')
+            for j in range(i + 1):
+                watchlist = Watchlist.objects.create(platform=stream, title=f'Title {i}-{j}',
+                                                     description=f'Description {j}', active=j % 2 == 0)
+                review = Review.objects.create(review_user=user, rating=j + 2, watchlist=watchlist)
+                apply_review_change(after=review_contribution(review))
+        StreamPlatform.objects.create(name='Empty', about='No titles', website='https://www.example.com')
+
+    def assertSameBytes(self, url, params=None):
+        with self.settings(WATCHMATE_FAST_SERIALIZERS=False):
+            expected = self.client.get(url, params)
+        with self.settings(WATCHMATE_FAST_SERIALIZERS=True):
+            actual = self.client.get(url, params)
+        self.assertEqual(actual.status_code, status.HTTP_200_OK)
+        self.assertEqual(actual.content, expected.content)
+
+    def test_watchlist_list(self):
+        url = reverse('watchlist_app:movie-new')
+        self.assertSameBytes(url)
+        self.assertSameBytes(url, {'ordering': '-avg_rating'})
+        next_page = self.client.get(url).data['next']
+        self.assertSameBytes(next_page)
+
+    def test_streamplatform_list(self):
+        self.assertSameBytes(reverse('watchlist_app:streamplatform-list'))
+        with self.settings(WATCHMATE_FAST_SERIALIZERS=True), self.assertNumQueries(2):
+            self.client.get(reverse('watchlist_app:streamplatform-list'))
+
+
+class FastJSONRendererTestCase(APITestCase):
+    def test_matches_drf_renderer(self):
+        stream = StreamPlatform.objects.create(name='Netflix \u2028', about='Streaming Platform',
+                                               website='https://www.netflix.com')
+        Watchlist.objects.create(platform=stream, title='Test Watchlist', description='\u00dcn\u00efcode', active=True)
+        data = StreamPlatformSerializer(StreamPlatform.objects.all(), many=True).data
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_native_datetimes_and_fallbacks(self):
+        created = timezone.now().replace(microsecond=123456)
+        rendered = json.loads(FastJSONRenderer().render({'created': created, 1: Decimal('1.5')}))
+        self.assertEqual(rendered, {'created': created.isoformat().replace('+00:00', 'Z'), '1': 1.5})
+        indented = FastJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(indented, JSONRenderer().render({'a': 1}, 'application/json; indent=4'))
+
+
+class WatchlistSearchTestCase(APITestCase):
+    def setUp(self):
+        stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                               website='https://www.netflix.com')
+        self.knight = Watchlist.objects.create(platform=stream, title='The Dark Knight',
+                                               description='Batman faces the Joker')
+        self.city = Watchlist.objects.create(platform=stream, title='Dark City',
+                                             description='A man wakes up with no memory')
+        self.night = Watchlist.objects.create(platform=stream, title='Night Shift',
+                                              description='A dark comedy set in a morgue')
+        self.url = reverse('watchlist_app:movie-search')
+
+    def search(self, query, backend=None, prefix=True):
+        return [watchlist.pk for watchlist in SearchResults(query, prefix=prefix, backend=backend)[:10]]
+
+    def test_ranks_title_matches_first(self):
+        results = self.search('dark')
+        self.assertEqual(set(results[:2]), {self.knight.pk, self.city.pk})
+        self.assertEqual(results[2], self.night.pk)
+
+    def test_prefix_and_accents(self):
+        self.assertEqual(self.search('kni'), [self.knight.pk])
+        self.assertEqual(self.search('kni', prefix=False), [])
+        self.assertEqual(self.search('DARK KNÏGHT'), [self.knight.pk])
+
+    def test_signals_keep_index_current(self):
+        self.city.title = 'Metropolis'
+        self.city.save()
+        self.assertEqual(self.search('metro'), [self.city.pk])
+        self.knight.delete()
+        self.assertEqual(self.search('dark'), [self.night.pk])
+
+    def test_fts5_probe_is_cached(self):
+        available = fts5_available('default')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(fts5_available('default'), available)
+            self.city.save()
+        self.assertFalse([query for query in queries if 'sqlite_master' in query['sql']])
+
+    def test_python_backend_matches_fts5(self):
+        for i in range(6):
+            Watchlist.objects.create(title=f'Filler {i}', description='An unrelated title')
+        backend = PythonSearchBackend()
+        for query in ('dark', 'dark k', 'a', 'man', 'fill', 'nothing'):
+            self.assertEqual(self.search(query, backend), self.search(query), query)
+
+    def test_python_index_follows_other_writers(self):
+        worker = PythonSearchBackend()  # the index of another process
+        self.assertEqual(self.search('metro', worker), [])
+        with self.settings(WATCHMATE_SEARCH_BACKEND='python'):
+            self.city.title = 'Metropolis'
+            self.city.save()
+        self.assertEqual(self.search('metro', worker), [self.city.pk])
+
+        # QuerySet.update() skips the signals, so only the TTL rebuild picks it up.
+        Watchlist.objects.filter(pk=self.night.pk).update(title='Night Metro')
+        self.assertEqual(self.search('metro', worker), [self.city.pk])
+        later = time.monotonic() + settings.WATCHMATE_SEARCH_INDEX_TTL
+        with mock.patch('watchlist_app.search.time.monotonic', return_value=later):
+            self.assertEqual(set(self.search('metro', worker)), {self.city.pk, self.night.pk})
+
+    def test_endpoint(self):
+        response = self.client.get(self.url, {'q': 'dark', 'size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+
+
+class LeaderboardTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.netflix = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                     website='https://www.netflix.com')
+        self.prime = StreamPlatform.objects.create(name='Prime', about='Streaming Platform',
+                                                   website='https://www.primevideo.com')
+        self.single = Watchlist.objects.create(platform=self.netflix, title='One Hit', description='Description')
+        self.steady = Watchlist.objects.create(platform=self.netflix, title='Steady', description='Description')
+        self.other = Watchlist.objects.create(platform=self.prime, title='Other', description='Description')
+        self.users = [User.objects.create(username=f'user{i}') for i in range(20)]
+        self.url = reverse('watchlist_app:movie-leaderboard')
+
+    def review(self, watchlist, user, rating, days_ago=0):
+        review = Review.objects.create(review_user=user, rating=rating, watchlist=watchlist)
+        apply_review_change(after=review_contribution(review))
+        if days_ago:
+            Review.objects.filter(pk=review.pk).update(created=review.created - timedelta(days=days_ago))
+            leaderboards.refresh_trending(watchlist.pk)
+
+    def test_bayesian_outranks_single_review(self):
+        self.review(self.single, self.users[0], 5)
+        for user in self.users[1:]:
+            self.review(self.steady, user, 4)
+        for user in self.users[:10]:
+            self.review(self.other, user, 2)
+        call_command('refresh_leaderboards', stdout=StringIO())
+        response = self.client.get(self.url, {'platform': self.netflix.pk})
+        self.assertEqual([row['id'] for row in response.data], [self.steady.pk, self.single.pk])
+        self.single.refresh_from_db()
+        self.assertEqual(self.single.avg_rating, 5)
+
+    def test_trending_prefers_recent_reviews(self):
+        for user in self.users[:6]:
+            self.review(self.steady, user, 4, days_ago=60)
+        for user in self.users[:2]:
+            self.review(self.other, user, 3)
+        response = self.client.get(self.url, {'kind': 'trending'})
+        self.assertEqual([row['id'] for row in response.data], [self.other.pk, self.steady.pk])
+        self.assertAlmostEqual(response.data[0]['score'], 2, places=2)
+
+    def test_incremental_matches_refresh(self):
+        for days_ago, user in enumerate(self.users[:5]):
+            self.review(self.steady, user, days_ago % 5 + 1, days_ago=days_ago)
+        Review.objects.filter(review_user=self.users[1]).delete()
+        self.review(self.steady, self.users[10], 5)
+        incremental = WatchlistScore.objects.get(pk=self.steady.pk)
+        # Between refreshes the Bayesian score uses the prior mean cached by the last job.
+        self.steady.refresh_from_db()
+        self.assertAlmostEqual(incremental.bayesian, leaderboards.bayesian_score(
+            self.steady.rating_sum, self.steady.number_rating, leaderboards.prior_mean(), 10))
+        leaderboards.refresh_scores()
+        self.assertAlmostEqual(incremental.trending, WatchlistScore.objects.get(pk=self.steady.pk).trending)
+
+    def test_serves_top_n_in_one_query(self):
+        for user in self.users[:3]:
+            self.review(self.other, user, 4)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'n': 2})
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['id'], self.other.pk)
+        self.assertEqual(self.client.get(self.url, {'kind': 'best'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncViewsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='testuser')
+        stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                               website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=stream, title=f'Movie {i}', description='Description')
+                           for i in range(4)]
+        for watchlist in self.watchlists[:2]:
+            Review.objects.create(review_user=user, rating=4, watchlist=watchlist, description='Good')
+        self.stream = stream
+
+    def get(self, name, args=(), params=None):
+        response = self.client.get(reverse(f'watchlist_app:{name}', args=args), params)
+        with warnings.catch_warnings():
+            # The test client consumes the async views' streams synchronously.
+            warnings.simplefilter('ignore')
+            content = b''.join(response) if response.streaming else response.content
+        # Pagination links point back at the view that served the page.
+        return response.status_code, content.replace(b'/async/', b'/')
+
+    def test_matches_sync_views(self):
+        watchlist = self.watchlists[0].pk
+        for name, args, params in (('movie-list', (), None), ('movie-list', (), {'page': 2, 'size': 3}),
+                                   ('movie-list', (), {'platform': self.stream.pk, 'format': 'ndjson'}),
+                                   ('movie-detail', (watchlist,), None), ('movie-detail', (999,), None),
+                                   ('review-list', (watchlist,), {'size': 1}),
+                                   ('streamplatform-list', (), None),
+                                   ('streamplatform-detail', (self.stream.pk,), None)):
+            cache.clear()
+            expected = self.get(name, args, params)
+            cache.clear()
+            self.assertEqual(self.get(f'async-{name}', args, params), expected, name)
+
+    def test_checks_throttles_and_methods(self):
+        url = reverse('watchlist_app:async-review-list', args=[self.watchlists[0].pk])
+        statuses = [self.client.get(url).status_code for _ in range(6)]
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 5 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        response = self.client.post(reverse('watchlist_app:async-movie-list'), {})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_asgi_request(self):
+        response = await AsyncClient().get(reverse('watchlist_app:async-movie-list'))
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([movie['title'] for movie in json.loads(content)], [f'Movie {i}' for i in range(4)])
+
+
+class InstrumentationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.token = Token.objects.create(user=self.staff)
+        stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                               website='https://www.netflix.com')
+        for i in range(3):
+            Watchlist.objects.create(platform=stream, title=f'Movie {i}', description='Description')
+
+    def sample(self, line_prefix):
+        with self.settings(WATCHMATE_METRICS={'TOKEN': 'scrape'}):
+            body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        return [line for line in body.splitlines() if line.startswith(line_prefix)]
+
+    def test_records_route_queries_and_size(self):
+        response = self.client.get(reverse('watchlist_app:movie-list'), {'page': 1})
+        size = len(response.content)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('watchlist_app:movie-list'), {'page': 1})
+            query_count = len(queries)
+
+        labels = '{method="GET",route="watchlist_app:movie-list"}'
+        self.assertEqual(self.sample(f'watchmate_request_sql_queries_count{labels}'),
+                         [f'watchmate_request_sql_queries_count{labels} 2'])
+        self.assertEqual(self.sample(f'watchmate_request_sql_queries_sum{labels}'),
+                         [f'watchmate_request_sql_queries_sum{labels} {query_count * 2}'])
+        self.assertEqual(self.sample(f'watchmate_response_size_bytes_sum{labels}'),
+                         [f'watchmate_response_size_bytes_sum{labels} {size * 2}'])
+        self.assertEqual(self.sample('watchmate_requests_total{method="GET",route="watchlist_app:movie-list"'),
+                         ['watchmate_requests_total{method="GET",route="watchlist_app:movie-list",status="200"} 2'])
+        serializer_time = self.sample(f'watchmate_request_serializer_duration_seconds_sum{labels}')[0]
+        self.assertGreater(float(serializer_time.split()[-1]), 0)
+
+    def test_streamed_responses_are_measured_when_sent(self):
+        response = self.client.get(reverse('watchlist_app:movie-list'))
+        self.assertEqual(self.sample('watchmate_requests_total'), [])
+        size = len(b''.join(response.streaming_content))
+        labels = '{method="GET",route="watchlist_app:movie-list"}'
+        self.assertEqual(self.sample(f'watchmate_response_size_bytes_sum{labels}'),
+                         [f'watchmate_response_size_bytes_sum{labels} {size}'])
+        self.assertEqual(self.sample(f'watchmate_request_sql_queries_sum{labels}'),
+                         [f'watchmate_request_sql_queries_sum{labels} 1'])
+
+    def test_metrics_endpoint_is_restricted(self):
+        url = reverse('metrics')
+        # Loopback is not trusted by default: a local reverse proxy would make every client look local.
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        with self.settings(WATCHMATE_METRICS={'TOKEN': 'scrape'}):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code,
+                             status.HTTP_403_FORBIDDEN)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.client.logout()
+        with self.settings(WATCHMATE_METRICS={'ALLOWED_IPS': ['203.0.113.0/24']}):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='203.0.113.5').status_code, status.HTTP_200_OK)
+
+    async def test_async_requests(self):
+        async def get_response(request):
+            pass
+
+        for middleware_class in (InstrumentationMiddleware, ProfilingMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware_class(get_response)))
+            self.assertFalse(iscoroutinefunction(middleware_class(lambda request: None)))
+
+        watchlist = await Watchlist.objects.afirst()
+        url = reverse('watchlist_app:async-movie-detail', args=[watchlist.pk])
+        response = await AsyncClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('watchmate_requests_total{method="GET",route="watchlist_app:async-movie-detail",status="200"} 1',
+                      registry.render())
+
+        response = await AsyncClient().get(url, headers={'Authorization': f'Token {self.token.key}',
+                                                         'X-Profile': 'cprofile'})
+        self.assertEqual(response['X-Profile-Status'], '200')
+        self.assertIn('function calls', response.content.decode())
+
+    def test_profiling_header(self):
+        url = reverse('watchlist_app:movie-list')
+        response = self.client.get(url, {'page': 1}, HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.get(url, {'page': 1}, HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response['X-Profile-Status'], '200')
+        self.assertIn('function calls', response.content.decode())
+        self.assertIn('cumulative', response.content.decode())
+
+        response = self.client.get(url, HTTP_X_PROFILE='sample')
+        self.assertEqual(response['X-Profile-Status'], '200')
+        self.assertIn('samples every 1 ms', response.content.decode())
+
+
+class SeedBenchmarkCommandTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seeds_volumes_and_derived_data(self):
+        call_command('seed_benchmark', '--users', '4', '--platforms', '2', '--watchlists', '5', '--reviews', '18',
+                     '--batch-size', '3', stdout=StringIO())
+        self.assertEqual((User.objects.count(), StreamPlatform.objects.count(), Watchlist.objects.count(),
+                          Review.objects.count()), (4, 2, 5, 18))
+        # Watchlist i holds reviews 4i..4i+3, rated i % 5 + 1.
+        first = Watchlist.objects.order_by('pk').first()
+        self.assertEqual((first.number_rating, first.rating_sum, first.avg_rating), (4, 10, 2.5))
+        self.assertEqual(WatchlistScore.objects.count(), 5)
+        response = self.client.get(reverse('watchlist_app:movie-search'), {'q': 'title 3'})
+        self.assertEqual(response.data['results'][0]['title'], 'Title 3')
+
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', '--users', '1', '--watchlists', '1', '--reviews', '0',
+                         stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', '--username-prefix', 'other', '--users', '1', '--watchlists', '1',
+                         '--reviews', '2', stdout=StringIO())
+
+
+class DatabaseProfileTestCase(APITestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite PRAGMAs')
+    def test_sqlite_pragmas(self):
+        with connection.cursor() as cursor:
+            values = [cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                      for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')]
+        self.assertEqual(values, ['wal', 1, 20000, 256 * 1024 * 1024])
+
+    def test_postgresql_profile(self):
+        databases = database_profile('postgresql', environ={
+            'WATCHMATE_DB_HOST': 'primary', 'WATCHMATE_DB_POOL': '1', 'WATCHMATE_DB_POOL_MAX_SIZE': '20',
+            'WATCHMATE_DB_REPLICA_HOST': 'replica'})
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(databases['default']['OPTIONS']['pool']['max_size'], 20)
+        self.assertEqual(databases['replica']['HOST'], 'replica')
+        self.assertEqual(databases['replica']['TEST'], {'MIRROR': 'default'})
+
+        databases = database_profile('postgresql', environ={'WATCHMATE_DB_CONN_MAX_AGE': '60'})
+        self.assertEqual(list(databases), ['default'])
+        self.assertEqual((databases['default']['CONN_MAX_AGE'], databases['default']['CONN_HEALTH_CHECKS']),
+                         (60, True))
+
+    def test_read_replica_router(self):
+        router = ReadReplicaRouter()
+        unpin()
+        self.assertEqual(router.db_for_read(Watchlist), 'default')
+
+        # Test cases run inside a transaction, which keeps reads on the primary.
+        with mock.patch.dict(settings.DATABASES, {'replica': {}}), \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Watchlist), 'replica')
+            self.assertFalse(router.allow_migrate('replica', 'watchlist_app'))
+            # Read-your-writes: after a write the rest of the request stays on the primary.
+            self.assertEqual(router.db_for_write(Watchlist), 'default')
+            self.assertEqual(router.db_for_read(Watchlist), 'default')
+            unpin()
+            self.assertEqual(router.db_for_read(Watchlist), 'replica')
+        self.assertEqual(router.db_for_read(Watchlist), 'default')
+
+
+def failing_task(message):
+    raise RuntimeError(message)
+
+
+@mock.patch.dict(settings.WATCHMATE_TASKS, {'MODE': 'outbox', 'RATING_DELAY': 60})
+class WriteBehindTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description')
+        self.url = reverse('watchlist_app:review-create', args=[self.watchlist.id])
+
+    def review(self, username, rating):
+        user = User.objects.create(username=username)
+        self.client.force_authenticate(user)
+        return self.client.post(self.url, {'rating': rating, 'watchlist': self.watchlist.id}, format='json')
+
+    def test_burst_coalesces_into_one_recompute(self):
+        for i in range(5):
+            self.assertEqual(self.review(f'user{i}', i + 1).status_code, status.HTTP_201_CREATED)
+        # The aggregates move with each review; only the score waits for the recompute.
+        self.watchlist.refresh_from_db()
+        self.assertEqual((self.watchlist.number_rating, self.watchlist.avg_rating), (5, 3))
+        bayesian = leaderboards.bayesian_score(15, 5, leaderboards.prior_mean(),
+                                               leaderboards.get_config()['PRIOR_WEIGHT'])
+        self.assertNotAlmostEqual(self.watchlist.score.bayesian, bayesian)
+        self.assertEqual(OutboxTask.objects.get().key, f'rating:{self.watchlist.id}')
+
+        # The delay has not passed yet.
+        self.assertEqual(run_pending(due_only=True), 0)
+        self.assertEqual(run_pending(), 1)
+        self.watchlist.score.refresh_from_db()
+        self.assertAlmostEqual(self.watchlist.score.bayesian, bayesian)
+        self.assertFalse(OutboxTask.objects.exists())
+
+    def test_request_during_run_schedules_another(self):
+        self.review('first', 4)
+        task, = tasks.claim_due(10, due_only=False)
+        self.review('second', 2)
+        self.assertEqual(tasks.run_task(task), 'done')
+        self.assertTrue(OutboxTask.objects.filter(claimed_until__isnull=True).exists())
+        self.assertEqual(run_pending(), 1)
+        self.watchlist.refresh_from_db()
+        self.assertEqual((self.watchlist.number_rating, self.watchlist.rating_sum), (2, 6))
+
+    def test_expired_lease_is_claimed_again(self):
+        self.review('first', 4)
+        self.assertEqual(len(tasks.claim_due(10, due_only=False)), 1)
+        self.assertEqual(tasks.claim_due(10, due_only=False), [])
+        OutboxTask.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(tasks.claim_due(10, due_only=False)), 1)
+
+    def test_failures_are_retried_then_kept(self):
+        with mock.patch.dict(settings.WATCHMATE_TASKS, {'MAX_ATTEMPTS': 2}):
+            tasks.defer(failing_task, 'boom', key='failing')
+            with self.assertLogs('watchlist_app.tasks', 'ERROR'):
+                self.assertEqual(run_pending(), 2)
+        task = OutboxTask.objects.get()
+        self.assertEqual((task.attempts, task.failed, task.last_error), (2, True, "RuntimeError('boom')"))
+        self.assertEqual(run_pending(), 0)
+
+        with self.assertLogs('watchlist_app.tasks', 'ERROR'):
+            call_command('run_tasks', '--retry-failed', '--all', stdout=StringIO())
+        # Another full round of MAX_ATTEMPTS.
+        task = OutboxTask.objects.get()
+        self.assertEqual((task.attempts, task.failed), (settings.WATCHMATE_TASKS['MAX_ATTEMPTS'], True))
+
+    def test_rolled_back_write_leaves_no_task(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            tasks.defer(failing_task, 'never')
+            raise RuntimeError
+        self.assertFalse(OutboxTask.objects.exists())
+
+
+class TaskQueueTestCase(TransactionTestCase):
+    def test_thread_pool_runs_recompute_after_commit(self):
+        watchlist = Watchlist.objects.create(title='Test Watchlist', description='Test Description')
+        user = User.objects.create(username='testuser')
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.dict(settings.WATCHMATE_TASKS, {'MODE': 'thread', 'RATING_DELAY': 0.1,
+                                                        'POLL_INTERVAL': 0.05}):
+            try:
+                client.post(reverse('watchlist_app:review-create', args=[watchlist.id]),
+                            {'rating': 4, 'watchlist': watchlist.id}, format='json')
+                deadline = time.monotonic() + 10
+                while OutboxTask.objects.exists() and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                tasks.stop_queue()
+        watchlist.refresh_from_db()
+        self.assertEqual((watchlist.number_rating, watchlist.avg_rating), (1, 4))
+
+
+class DynamicFieldsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description')
+        self.review = Review.objects.create(review_user=self.user, rating=4, watchlist=self.watchlist)
+
+    def test_fields_are_pushed_into_the_query(self):
+        url = reverse('watchlist_app:streamplatform-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,name'})
+        self.assertEqual(response.data, [{'id': self.stream.id, 'name': 'Netflix'}])
+        # No prefetch of the omitted watchlists, and no unrequested columns.
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('about', queries[0]['sql'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'name,watchlist.title'})
+        self.assertEqual(response.data, [{'name': 'Netflix', 'watchlist': [{'title': 'Test Watchlist'}]}])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description', queries[1]['sql'])
+
+        with self.settings(WATCHMATE_FAST_SERIALIZERS=True):
+            self.assertEqual(self.client.get(url, {'fields': 'name,watchlist.title'}).data, response.data)
+
+    def test_omit(self):
+        url = reverse('watchlist_app:streamplatform-detail', args=[self.stream.id])
+        full = self.client.get(url)
+        omitted = self.client.get(url, {'omit': 'watchlist,about'})
+        self.assertEqual(set(omitted.data), {'id', 'name', 'website'})
+        # Each selection is cached separately.
+        self.assertNotEqual(full['ETag'], omitted['ETag'])
+        self.assertIn('watchlist', self.client.get(url).data)
+
+        response = self.client.get(url, {'omit': 'watchlist.description'})
+        self.assertNotIn('description', response.data['watchlist'][0])
+        self.assertIn('title', response.data['watchlist'][0])
+
+    def test_expand(self):
+        response = self.client.get(reverse('watchlist_app:movie-detail', args=[self.watchlist.id]),
+                                   {'expand': 'platform'})
+        self.assertEqual(response.data['platform'], {'id': self.stream.id, 'name': 'Netflix',
+                                                     'about': 'Streaming Platform',
+                                                     'website': 'https://www.netflix.com'})
+
+        url = reverse('watchlist_app:review-list', args=[self.watchlist.id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'id,watchlist.title,watchlist.platform',
+                                             'expand': 'watchlist'})
+        self.assertEqual(response.data['results'], [
+            {'id': self.review.id, 'watchlist': {'title': 'Test Watchlist', 'platform': 'Netflix'}}])
+        self.assertEqual(self.client.get(url).data['results'][0]['watchlist'], self.watchlist.id)
+
+    def test_writes_ignore_selection(self):
+        other = Watchlist.objects.create(platform=self.stream, title='Other Watchlist', description='Other')
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('watchlist_app:review-create', args=[other.id]) + '?fields=id',
+                                    {'rating': 5, 'watchlist': other.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rating'], 5)
+
+
+class ReviewerProfileTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(self.user)
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=self.stream, title=f'Title {i}',
+                                                    description='Test Description') for i in range(4)]
+
+    def assertProfile(self, review_count, avg_rating):
+        profile = ReviewerProfile.objects.get(user=self.user)
+        self.assertEqual((profile.review_count, profile.avg_rating), (review_count, avg_rating))
+        # The incremental counters match a rebuild from the reviews.
+        refresh_profiles()
+        profile.refresh_from_db()
+        self.assertEqual((profile.review_count, profile.avg_rating), (review_count, avg_rating))
+        return profile
+
+    def test_maintained_from_review_writes(self):
+        first, second, third, fourth = self.watchlists
+        self.client.post(reverse('watchlist_app:review-create', args=[first.id]),
+                         {'rating': 5, 'watchlist': first.id}, format='json')
+        self.client.post(reverse('watchlist_app:review-create', args=[second.id]),
+                         {'rating': 3, 'watchlist': second.id}, format='json')
+        self.assertProfile(2, 4)
+
+        review = Review.objects.get(watchlist=second)
+        url = reverse('watchlist_app:review-detail', args=[review.id])
+        self.client.put(url, {'rating': 1, 'watchlist': second.id, 'active': False}, format='json')
+        self.assertProfile(1, 5)
+        self.client.delete(url)
+        self.assertProfile(1, 5)
+
+        self.client.post(reverse('watchlist_app:review-bulk-create'),
+                         [{'watchlist': third.id, 'rating': 2}, {'watchlist': fourth.id, 'rating': 2}], format='json')
+        profile = self.assertProfile(3, 3)
+        self.assertIsNotNone(profile.last_activity)
+
+        response = self.client.get(reverse('watchlist_app:reviewer-profile', args=['testuser']))
+        self.assertEqual(response.data['username'], 'testuser')
+        self.assertEqual((response.data['review_count'], response.data['avg_rating']), (3, 3))
+        response = self.client.get(reverse('watchlist_app:reviewer-profile', args=['nobody']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cascaded_reviews_are_handled_per_watchlist(self):
+        first, second = self.watchlists[:2]
+        others = [User.objects.create(username=f'user{i}') for i in range(4)]
+        for user in [self.user] + others:
+            Review.objects.create(review_user=user, rating=2, watchlist=first)
+        Review.objects.create(review_user=self.user, rating=4, watchlist=second)
+        Review.objects.create(review_user=others[0], rating=4, watchlist=second)
+        Review.objects.create(review_user=self.user, rating=5, watchlist=self.watchlists[2])
+        first_id, review_ids = first.pk, set(Review.objects.filter(watchlist=first).values_list('pk', flat=True))
+
+        queries = []
+        for watchlist in (second, first):
+            with CaptureQueriesContext(connection) as captured:
+                watchlist.delete()
+            queries.append(len(captured))
+        # Five reviews cost no more queries than two.
+        self.assertEqual(queries[0], queries[1])
+        self.assertProfile(1, 5)
+        self.assertEqual(ReviewerProfile.objects.get(user=others[0]).review_count, 0)
+        deleted = ChangeEvent.objects.filter(kind='review', action='deleted', watchlist_id=first_id)
+        self.assertEqual(set(deleted.values_list('object_id', flat=True)), review_ids)
+
+    def test_history_reads_without_user_join(self):
+        for watchlist in self.watchlists:
+            Review.objects.create(review_user=self.user, rating=4, watchlist=watchlist)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('watchlist_app:user-review-detail'), {'username': 'testuser'})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('JOIN', queries[1]['sql'])
+        self.assertEqual([review['review_user'] for review in response.data['results']], ['testuser'] * 4)
+        self.assertEqual(self.client.get(reverse('watchlist_app:user-review-detail'),
+                                         {'username': 'nobody'}).data['results'], [])
+
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.dict(settings.WATCHMATE_RESPONSE_CACHE, {'ENABLED': True})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=self.stream, title=f'Title {i}',
+                                                    description='Test Description') for i in range(6)]
+        self.url = reverse('watchlist_app:movie-new')
+
+    def test_anonymous_pages_are_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Surrogate-Key'].split(),
+                         sorted(f'watchlist-{watchlist.id}' for watchlist in self.watchlists[:3]))
+
+    async def test_async_chain(self):
+        # No middleware is adapted to sync, so async views keep the event loop.
+        handler = ASGIHandler()._middleware_chain
+        while handler is not None:
+            self.assertTrue(iscoroutinefunction(handler), handler)
+            handler = getattr(getattr(handler, '__wrapped__', None), 'get_response', None)
+
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        cached = await AsyncClient().get(self.url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        user = User.objects.create(username='testuser')
+        token = Token.objects.create(user=user)
+        self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertNotIn('X-Cache', response)
+
+    def test_write_purges_only_pages_showing_it(self):
+        first = self.client.get(self.url)
+        second_url = json.loads(first.content)['next']
+        self.client.get(second_url)
+
+        self.watchlists[5].description = 'Changed'
+        self.watchlists[5].save()
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        second = self.client.get(second_url)
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(json.loads(second.content)['results'][2]['description'], 'Changed')
+
+    def test_listing_changes_purge_every_page(self):
+        first = self.client.get(self.url)
+        second_url = json.loads(first.content)['next']
+        self.client.get(second_url)
+
+        Watchlist.objects.create(platform=self.stream, title='A new title', description='Test Description')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(second_url)['X-Cache'], 'MISS')
+
+    def test_stale_entry_is_served_while_another_request_refreshes_it(self):
+        with mock.patch.dict(settings.WATCHMATE_RESPONSE_CACHE, {'TIMEOUT': 0}):
+            self.client.get(self.url)
+            lock = f'{ResponseCacheMiddleware.cache_key(RequestFactory().get(self.url))}:lock'
+            cache.add(lock, 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(self.url)['X-Cache'], 'STALE')
+            cache.delete(lock)
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_streamed_list_is_cached(self):
+        url = reverse('watchlist_app:movie-list')
+        response = self.client.get(url)
+        body = b''.join(response.streaming_content)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, body)
+
+        self.watchlists[0].delete()
+        self.assertEqual(len(json.loads(b''.join(self.client.get(url).streaming_content))), 5)
+
+
+class SingleFlightTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def run_concurrently(self, func, callers):
+        results = []
+
+        def worker():
+            try:
+                results.append(func())
+            except Exception as exc:
+                results.append(exc)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(callers)]
+        for thread in pool:
+            thread.start()
+        return pool, results
+
+    def test_concurrent_calls_share_one_computation(self):
+        flight, release, calls = SingleFlight('test'), threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        pool, results = self.run_concurrently(lambda: flight.do('key', compute), 5)
+        while 'key' not in flight.calls or flight.calls['key'].callers < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in pool:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, ['result'] * 5))
+        self.assertEqual(CALLS.values[(('flight', 'test'), ('outcome', 'thread'))], 4)
+        self.assertEqual(flight.calls, {})
+
+    def test_error_reaches_every_caller(self):
+        flight, release = SingleFlight('test'), threading.Event()
+
+        def compute():
+            release.wait()
+            raise ValueError('boom')
+
+        pool, results = self.run_concurrently(lambda: flight.do('key', compute), 3)
+        while 'key' not in flight.calls or flight.calls['key'].callers < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in pool:
+            thread.join()
+        self.assertEqual([type(result) for result in results], [ValueError] * 3)
+
+    def test_waits_for_the_result_of_another_process(self):
+        # Stand in for another process holding the cache lock, then publishing its result.
+        cache.add('key:flight', 1)
+
+        def publish():
+            cache.set('key', 'published')
+            cache.delete('key:flight')
+
+        threading.Timer(0.05, publish).start()
+        compute = mock.Mock(return_value='computed')
+        self.assertEqual(SingleFlight('test').do('key', compute, peek=lambda: cache.get('key')), 'published')
+        compute.assert_not_called()
+
+    def test_concurrent_detail_misses_build_once(self):
+        stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                               website='https://www.netflix.com')
+        watchlist = Watchlist.objects.create(platform=stream, title='Test Watchlist', description='Test Description')
+        url = reverse('watchlist_app:movie-detail', args=[watchlist.id])
+        make_entry = caching._make_entry
+
+        def slow_make_entry(*args):
+            time.sleep(0.2)
+            return make_entry(*args)
+
+        with mock.patch('watchlist_app.caching._make_entry', side_effect=slow_make_entry) as built:
+            pool, results = self.run_concurrently(lambda: APIClient().get(url), 8)
+            for thread in pool:
+                thread.join()
+        self.assertEqual(built.call_count, 1)
+        self.assertEqual([response.data['title'] for response in results], ['Test Watchlist'] * 8)
+
+
+class BatchDetailTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlists = [Watchlist.objects.create(platform=self.stream, title=f'Title {i}',
+                                                    description='Test Description') for i in range(4)]
+        self.url = reverse('watchlist_app:movie-batch')
+
+    def ids(self, *watchlists):
+        return ','.join(str(watchlist.id) for watchlist in watchlists)
+
+    def test_requested_order_and_missing_ids(self):
+        first, second, third, _ = self.watchlists
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'ids': f'{self.ids(third, first)},999,{self.ids(second, third)}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in response.data['results']], ['Title 2', 'Title 0', 'Title 1'])
+        self.assertEqual(response.data['missing'], [999])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('JOIN', queries[0]['sql'])
+        detail = self.client.get(reverse('watchlist_app:movie-detail', args=[first.id]))
+        self.assertEqual(response.data['results'][1], detail.data)
+
+    def test_served_from_the_detail_cache(self):
+        first, second, third, fourth = self.watchlists
+        self.client.get(reverse('watchlist_app:movie-detail', args=[first.id]))
+        self.client.get(self.url, {'ids': self.ids(second)})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'ids': self.ids(first, second, third, fourth)})
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'IN ({third.id}, {fourth.id})', queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'ids': self.ids(*self.watchlists)})
+
+        second.title = 'Renamed'
+        second.save()
+        response = self.client.get(self.url, {'ids': self.ids(first, second)})
+        self.assertEqual(response.data['results'][1]['title'], 'Renamed')
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ','.join(str(pk) for pk in range(1, 102))
+        self.assertEqual(self.client.get(self.url, {'ids': too_many}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@mock.patch.dict(settings.WATCHMATE_CHANGE_FEED, {'MAX_DURATION': 0})
+class ChangeFeedTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.stream = StreamPlatform.objects.create(name='Netflix', about='Streaming Platform',
+                                                    website='https://www.netflix.com')
+        self.watchlist = Watchlist.objects.create(platform=self.stream, title='Test Watchlist',
+                                                  description='Test Description')
+        self.url = reverse('watchlist_app:change-feed')
+
+    def events(self, params=None, **headers):
+        response = self.client.get(self.url, params, **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        with warnings.catch_warnings():
+            # The test client consumes the async stream synchronously.
+            warnings.simplefilter('ignore')
+            content = b''.join(response).decode()
+        events = []
+        for block in content.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            if 'data' in fields:
+                events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+        return events
+
+    def test_writes_are_logged_and_streamed(self):
+        since = ChangeEvent.objects.latest('id').id
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('watchlist_app:review-create', args=[self.watchlist.id]),
+                         {'rating': 4, 'watchlist': self.watchlist.id}, format='json')
+        review_id = Review.objects.get().id
+        self.client.force_authenticate(None)
+        Review.objects.get().delete()
+
+        events = self.events({'since': since})
+        self.assertEqual([(name, data['action'], data['id']) for _, name, data in events], [
+            ('review', 'created', review_id),
+            ('watchlist', 'updated', self.watchlist.id),
+            ('review', 'deleted', review_id),
+        ])
+        self.assertEqual(events[0][2]['rating'], 4)
+        self.assertEqual((events[1][2]['avg_rating'], events[1][2]['number_rating']), (4, 1))
+        # A reconnecting EventSource resumes after the last event it received.
+        self.assertEqual(self.events(HTTP_LAST_EVENT_ID=str(events[1][0])), events[2:])
+        # Without a position the stream starts from now.
+        self.assertEqual(self.events(), [])
+
+    def test_follows_one_watchlist(self):
+        other = Watchlist.objects.create(platform=self.stream, title='Other', description='Test Description')
+        Review.objects.create(review_user=self.user, rating=3, watchlist=other)
+        Review.objects.create(review_user=self.user, rating=5, watchlist=self.watchlist)
+        events = self.events({'since': 0, 'watchlist': self.watchlist.id})
+        self.assertEqual([(name, data['watchlist']) for _, name, data in events],
+                         [('watchlist', self.watchlist.id), ('review', self.watchlist.id)])
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compaction_and_retention(self):
+        for title in ('First', 'Second', 'Third'):
+            self.watchlist.title = title
+            self.watchlist.save()
+        ChangeEvent.objects.update(created=timezone.now() - timedelta(days=2))
+        call_command('compact_change_feed', '--compact-after', '3600', stdout=StringIO())
+        # Only the latest state of the watchlist is left, which is all a resuming client needs.
+        self.assertEqual([data['title'] for _, _, data in self.events({'since': 0})], ['Third'])
+
+        call_command('compact_change_feed', '--retention', '86400', stdout=StringIO())
+        self.assertEqual(ChangeEvent.objects.get().action, 'truncated')
+        self.assertEqual([name for _, name, _ in self.events({'since': 0})], ['reset'])
+        self.assertEqual(self.events({'since': ChangeEvent.objects.get().id - 1}), [])
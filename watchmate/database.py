@@ -0,0 +1,115 @@
+import os
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA_ALIAS = 'replica'
+
+DEFAULT_SQLITE_PRAGMAS = {
+    # Readers no longer block the writer, nor the writer readers.
+    'journal_mode': 'WAL',
+    # With WAL, NORMAL only syncs at checkpoints; a power loss can drop the last
+    # transactions but never corrupts the database.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def database_profile(profile='sqlite', base_dir='.', environ=os.environ):
+    """
+    DATABASES for a deployment profile, 'sqlite' or 'postgresql', read from
+    WATCHMATE_DB_* environment variables. Setting WATCHMATE_DB_REPLICA_NAME
+    (SQLite) or WATCHMATE_DB_REPLICA_HOST (PostgreSQL) adds a 'replica' alias
+    that ReadReplicaRouter sends reads to.
+    """
+    def env(name, default=None):
+        return environ.get(f'WATCHMATE_DB_{name}', default)
+
+    conn_max_age = int(env('CONN_MAX_AGE', 600))
+    if profile == 'sqlite':
+        primary = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('NAME', os.path.join(base_dir, 'db.sqlite3')),
+            # Take the write lock at BEGIN so concurrent writers wait instead of failing with "database is locked".
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # A file-backed test database lets threaded tests open concurrent connections.
+            'TEST': {
+                'NAME': os.path.join(base_dir, 'test_db.sqlite3'),
+            },
+        }
+        replica_key, replica = 'NAME', env('REPLICA_NAME')
+    elif profile == 'postgresql':
+        primary = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('NAME', 'watchmate'),
+            'USER': env('USER', 'watchmate'),
+            'PASSWORD': env('PASSWORD', ''),
+            'HOST': env('HOST', 'localhost'),
+            'PORT': env('PORT', '5432'),
+            'OPTIONS': {},
+        }
+        if env('POOL'):
+            # psycopg's pool hands connections out per request; Django refuses CONN_MAX_AGE alongside it.
+            primary['OPTIONS']['pool'] = {'min_size': int(env('POOL_MIN_SIZE', 2)),
+                                          'max_size': int(env('POOL_MAX_SIZE', 10)), 'timeout': 10}
+            conn_max_age = 0
+        replica_key, replica = 'HOST', env('REPLICA_HOST')
+    else:
+        raise ValueError(f'Unknown database profile {profile!r}')
+
+    primary.update({'CONN_MAX_AGE': conn_max_age, 'CONN_HEALTH_CHECKS': True})
+    databases = {'default': primary}
+    if replica:
+        databases[REPLICA_ALIAS] = {**primary, replica_key: replica, 'TEST': {'MIRROR': 'default'}}
+    return databases
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'WATCHMATE_SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+# Set once this context has written, so its later reads see its own writes.
+_pinned = ContextVar('watchmate_pinned_to_primary', default=False)
+
+
+@receiver(request_started)
+def unpin(**kwargs):
+    _pinned.set(False)
+
+
+class ReadReplicaRouter:
+    """
+    Sends reads to the 'replica' alias when it is configured, except inside a
+    transaction or after a write in the same request, where replication lag
+    could hide the caller's own changes. Migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if REPLICA_ALIAS not in settings.DATABASES or _pinned.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,322 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.request import Request
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+from watchmate.metrics import COUNT_BUCKETS, SIZE_BUCKETS, registry
+
+REQUESTS = registry.counter('watchmate_requests_total', 'Requests served, by route, method and status.')
+DURATION = registry.histogram('watchmate_request_duration_seconds', 'Request latency, including streamed bodies.')
+SQL_QUERIES = registry.histogram('watchmate_request_sql_queries', 'SQL queries run per request.', COUNT_BUCKETS)
+SQL_DURATION = registry.histogram('watchmate_request_sql_duration_seconds', 'Time spent in SQL per request.')
+SERIALIZER_DURATION = registry.histogram('watchmate_request_serializer_duration_seconds',
+                                         'Time spent producing serializer .data per request.')
+RESPONSE_SIZE = registry.histogram('watchmate_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+
+_current = ContextVar('watchmate_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'queries', 'sql_time', 'serializer_time', 'serializing', 'size')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.size = 0
+
+    def record(self, request, response):
+        match = request.resolver_match
+        labels = {'route': match.view_name if match else '<unresolved>', 'method': request.method}
+        REQUESTS.inc(status=response.status_code, **labels)
+        DURATION.observe(time.perf_counter() - self.start, **labels)
+        SQL_QUERIES.observe(self.queries, **labels)
+        SQL_DURATION.observe(self.sql_time, **labels)
+        SERIALIZER_DURATION.observe(self.serializer_time, **labels)
+        RESPONSE_SIZE.observe(self.size, **labels)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - start
+
+
+def _timed_data(data):
+    def fget(serializer):
+        metrics = _current.get()
+        # Only the outermost .data is timed; nested serializers run inside it.
+        if metrics is None or metrics.serializing:
+            return data.fget(serializer)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializing = False
+            metrics.serializer_time += time.perf_counter() - start
+
+    fget.instrumented = True
+    return property(fget, doc=data.__doc__)
+
+
+def install():
+    """Time serializer output; Serializer.data and ListSerializer.data both go through BaseSerializer.data."""
+    if not getattr(BaseSerializer.data.fget, 'instrumented', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+class InstrumentationMiddleware:
+    """
+    Records the route, latency, SQL query count and time, serializer time and
+    response size of every request into the metrics registry. Streamed bodies
+    are measured as they are sent, so their queries and size are included.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    @staticmethod
+    def _start():
+        for connection in connections.all():
+            if record_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(record_query)
+        return RequestMetrics()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = self._start()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self._start()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        if not response.streaming:
+            metrics.size = len(response.content)
+            metrics.record(request, response)
+        elif response.is_async:
+            response.streaming_content = self._astream(request, response, metrics, response.streaming_content)
+        else:
+            response.streaming_content = self._stream(request, response, metrics, response.streaming_content)
+        return response
+
+    def _stream(self, request, response, metrics, chunks):
+        chunks = iter(chunks)
+        try:
+            while True:
+                token = _current.set(metrics)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    _current.reset(token)
+                if chunk is None:
+                    break
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            metrics.record(request, response)
+
+    async def _astream(self, request, response, metrics, chunks):
+        chunks = aiter(chunks)
+        try:
+            while True:
+                token = _current.set(metrics)
+                try:
+                    chunk = await anext(chunks, None)
+                finally:
+                    _current.reset(token)
+                if chunk is None:
+                    break
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            metrics.record(request, response)
+
+
+class StackSampler:
+    """Samples one thread's stack every ``interval`` seconds from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self.stacks[tuple(f'{entry.name} ({entry.filename}:{entry.lineno})' for entry in stack)] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def report(self, limit):
+        """Functions by inclusive sample share, then the hottest full stacks."""
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for entry in set(stack):
+                inclusive[entry] += count
+        total = max(self.samples, 1)
+        lines = [f'{self.samples} samples every {self.interval * 1000:g} ms', '', 'inclusive  function']
+        lines += [f'{count / total:8.1%}   {entry}' for entry, count in inclusive.most_common(limit)]
+        for stack, count in self.stacks.most_common(3):
+            lines += ['', f'{count / total:.1%} of samples:'] + [f'  {entry}' for entry in stack[-limit:]]
+        return '\n'.join(lines) + '\n'
+
+
+def get_profiling_config():
+    config = {'HEADER': 'X-Profile', 'INTERVAL': 0.001, 'LIMIT': 40}
+    config.update(getattr(settings, 'WATCHMATE_PROFILING', {}))
+    return config
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when a staff user sends the profiling header,
+    and answers with the report instead of the response: ``X-Profile: cprofile``
+    (deterministic, sorted by cumulative time) or ``X-Profile: sample`` (a stack
+    sampler with little overhead). Only the thread running the middleware is
+    profiled: under ASGI that is the event loop, so the report leaves out code
+    run in sync_to_async threads and includes other requests on the loop.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def is_staff(self, request):
+        # API users authenticate per view, so repeat the API's authentication here.
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            return bool(getattr(drf_request.user, 'is_staff', False))
+        except Exception:
+            return False
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_profiling_config()
+        mode = request.headers.get(config['HEADER'], '').lower()
+        if mode not in ('cprofile', 'sample') or not self.is_staff(request):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            self._consume(response)
+            report = self._cprofile_report(profiler, config)
+        else:
+            with StackSampler(threading.get_ident(), config['INTERVAL']) as sampler:
+                response = self.get_response(request)
+                self._consume(response)
+            report = sampler.report(config['LIMIT'])
+        return self._profile_response(report, response, start)
+
+    async def __acall__(self, request):
+        config = get_profiling_config()
+        mode = request.headers.get(config['HEADER'], '').lower()
+        if mode not in ('cprofile', 'sample') or not await sync_to_async(self.is_staff)(request):
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+                await self._aconsume(response)
+            finally:
+                profiler.disable()
+            report = self._cprofile_report(profiler, config)
+        else:
+            with StackSampler(threading.get_ident(), config['INTERVAL']) as sampler:
+                response = await self.get_response(request)
+                await self._aconsume(response)
+            report = sampler.report(config['LIMIT'])
+        return self._profile_response(report, response, start)
+
+    @staticmethod
+    def _cprofile_report(profiler, config):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(config['LIMIT'])
+        return output.getvalue()
+
+    @staticmethod
+    def _profile_response(report, response, start):
+        profile = HttpResponse(report, content_type='text/plain; charset=utf-8')
+        profile['X-Profile-Status'] = response.status_code
+        profile['X-Profile-Duration'] = f'{time.perf_counter() - start:.6f}'
+        return profile
+
+    @staticmethod
+    def _consume(response):
+        """
+        Render streamed bodies inside the profile too. The response is not closed
+        here: that would send request_finished a second time, after the profile.
+        """
+        if response.streaming:
+            for _ in response:
+                pass
+
+    @classmethod
+    async def _aconsume(cls, response):
+        if response.streaming and response.is_async:
+            async for _ in response:
+                pass
+        elif response.streaming:
+            await sync_to_async(cls._consume)(response)
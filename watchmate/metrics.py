@@ -0,0 +1,147 @@
+import bisect
+import hmac
+import ipaddress
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                yield self.name, key, value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects it."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.values = {}  # labels -> [per-bucket counts (last one is +Inf), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    yield f'{self.name}_bucket', key + (('le', _number(bound)),), cumulative
+                yield f'{self.name}_sum', key, total
+                yield f'{self.name}_count', key, cumulative
+
+
+class MetricsRegistry:
+    """In-process metrics of this worker, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, metric_class, name, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, *args)
+            return metric
+
+    def counter(self, name, documentation):
+        return self._register(Counter, name, documentation)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, buckets)
+
+    def reset(self):
+        """Drop every recorded value, keeping the registered metrics."""
+        with self.lock:
+            for metric in self.metrics.values():
+                with metric.lock:
+                    metric.values.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _allowed(request):
+    if settings.DEBUG or getattr(request.user, 'is_staff', False):
+        return True
+    config = getattr(settings, 'WATCHMATE_METRICS', {})
+    token = config.get('TOKEN')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode()):
+        return True
+    # REMOTE_ADDR is the proxy's address behind a reverse proxy, so only list
+    # addresses here when clients reach the server directly.
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in config.get('ALLOWED_IPS', []))
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; open to DEBUG and staff sessions, to
+    "Authorization: Bearer <WATCHMATE_METRICS['TOKEN']>" and to ALLOWED_IPS.
+    """
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -9,9 +9,12 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
+from watchmate.database import database_profile
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,9 +45,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the recorded latency covers every other middleware.
+    'watchmate.instrumentation.InstrumentationMiddleware',
+    'watchmate.instrumentation.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'watchlist_app.response_cache.ResponseCacheMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -74,13 +81,138 @@ WSGI_APPLICATION = 'watchmate.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# WATCHMATE_DB_PROFILE picks 'sqlite' (default) or 'postgresql'; the rest comes from
+# WATCHMATE_DB_* environment variables (see watchmate.database.database_profile):
+# persistent connections (CONN_MAX_AGE, default 600s, with health checks), a psycopg
+# pool (POOL=1, POOL_MIN_SIZE, POOL_MAX_SIZE) and an optional read replica.
+DATABASES = database_profile(os.environ.get('WATCHMATE_DB_PROFILE', 'sqlite'), BASE_DIR)
+
+# Reads go to the 'replica' alias when it is configured.
+DATABASE_ROUTERS = ['watchmate.database.ReadReplicaRouter']
+
+# PRAGMAs run on every new SQLite connection: WAL journal, NORMAL sync, a busy
+# timeout in milliseconds, memory-mapped reads and in-memory temp tables.
+WATCHMATE_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Alias and timeout (seconds) of the cache holding serialized detail payloads.
+WATCHMATE_CACHE_ALIAS = 'default'
+WATCHMATE_CACHE_TIMEOUT = 300
+
+# Concurrent detail cache misses for the same payload share one build
+# (watchlist_app.singleflight). Callers in other processes wait for the builder's
+# cache lock up to WAIT seconds, polling every POLL_INTERVAL; a crashed builder's
+# lock expires after LOCK_TIMEOUT.
+WATCHMATE_SINGLE_FLIGHT = {
+    'ENABLED': True,
+    'LOCK_TIMEOUT': 10,
+    'WAIT': 5,
+    'POLL_INTERVAL': 0.01,
+}
+
+# Change feed (watchlist_app.changefeed, streamed at /watch/changes/). Events older
+# than COMPACT_AFTER are dropped once a later event of the same object exists, and
+# all events older than RETENTION are deleted, both by "manage.py compact_change_feed".
+# Streams check for new events every POLL_INTERVAL seconds, send a keepalive after
+# HEARTBEAT idle seconds and close after MAX_DURATION; clients reconnect after RETRY.
+WATCHMATE_CHANGE_FEED = {
+    'COMPACT_AFTER': timedelta(hours=1),
+    'RETENTION': timedelta(days=7),
+    'POLL_INTERVAL': 0.5,
+    'HEARTBEAT': 15,
+    'MAX_DURATION': 300,
+    'RETRY': 2,
+    'BATCH_SIZE': 500,
+}
+
+# Anonymous responses of ROUTES (watchlist_app.response_cache) are served from the
+# cache for TIMEOUT seconds, then STALE for up to STALE more seconds while one request
+# refreshes them. Other requests for a missing entry wait up to WAIT seconds for the
+# one rendering it. Bodies over MAX_SIZE bytes are not stored, and responses showing
+# more than MAX_TAGS objects are purged by any write to their kind.
+WATCHMATE_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'ROUTES': ['watchlist_app:movie-list', 'watchlist_app:movie-new', 'watchlist_app:streamplatform-list'],
+    'TIMEOUT': 60,
+    'STALE': 300,
+    'LOCK_TIMEOUT': 30,
+    'WAIT': 5,
+    'MAX_SIZE': 8 * 1024 * 1024,
+    'MAX_TAGS': 500,
+}
+
+# Serve WatchListGV and StreamPlatformVS.list through the values()-based fast serializers.
+WATCHMATE_FAST_SERIALIZERS = False
+
+# Watchlist full-text search (watchlist_app.search): 'fts5', 'python' (in-process
+# inverted index) or 'auto', which uses FTS5 whenever its table exists.
+WATCHMATE_SEARCH_BACKEND = 'auto'
+# The 'python' index is per process; it follows other processes' changes through a
+# shared cache version and is rebuilt at least every SEARCH_INDEX_TTL seconds, which
+# bounds how long writes that skip the model signals stay unsearchable.
+WATCHMATE_SEARCH_INDEX_TTL = 300
+
+# Leaderboards (watchlist_app.leaderboards): PRIOR_WEIGHT is how many reviews at the
+# site-wide mean rating every title starts with; a review's trending weight halves
+# every TRENDING_HALF_LIFE; MAX_SIZE caps ?n= on the endpoint.
+WATCHMATE_LEADERBOARD = {
+    'PRIOR_WEIGHT': 10,
+    'TRENDING_HALF_LIFE': timedelta(days=7),
+    'MAX_SIZE': 100,
+}
+
+# Per-request metrics (watchmate.instrumentation) are served in the Prometheus text
+# format at /metrics to DEBUG sessions, staff sessions and scrapers sending
+# "Authorization: Bearer <TOKEN>" (none is accepted while TOKEN is unset).
+# ALLOWED_IPS (addresses or networks) are let in by REMOTE_ADDR, which is only safe
+# without a reverse proxy: behind a local one every client comes from 127.0.0.1.
+WATCHMATE_METRICS = {
+    'TOKEN': os.environ.get('WATCHMATE_METRICS_TOKEN'),
+    'ALLOWED_IPS': [],
+}
+
+# A staff user sending "HEADER: cprofile" or "HEADER: sample" gets a profile of that
+# request back instead of its response. INTERVAL is the sampler's period in seconds,
+# LIMIT the number of functions reported.
+WATCHMATE_PROFILING = {
+    'HEADER': 'X-Profile',
+    'INTERVAL': 0.001,
+    'LIMIT': 40,
+}
+
+# Write-behind task queue (watchlist_app.tasks). MODE is 'thread' (outbox run by an
+# in-process pool of WORKERS threads), 'outbox' (run by "manage.py run_tasks") or
+# 'sync' (run inline; what the test runner uses). Rating recomputes run RATING_DELAY
+# seconds after the first review of a burst, so aggregates lag writes by at most
+# RATING_DELAY + POLL_INTERVAL plus the run itself. Failures are retried after
+# RETRY_DELAY * 2**n seconds, MAX_ATTEMPTS times.
+WATCHMATE_TASKS = {
+    'MODE': 'thread',
+    'WORKERS': 2,
+    'POLL_INTERVAL': 0.5,
+    'BATCH_SIZE': 100,
+    'LEASE': 300,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 5,
+    'RATING_DELAY': 1.0,
+}
+
+TEST_RUNNER = 'watchmate.test_runner.TestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -126,8 +258,8 @@ REST_FRAMEWORK = {
     # ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
-        # 'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_app.api.authentication.CachedTokenAuthentication',
+        'user_app.api.authentication.JWTClaimsAuthentication',
     ],
     # "DEFAULT_THROTTLE_CLASSES": [
     #     "rest_framework.throttling.AnonRateThrottle",
@@ -139,17 +271,44 @@ REST_FRAMEWORK = {
         'review-create': '2/day',
         'review-list': '10/day',
         'review-detail': '2/day',
+        'review-bulk': '100/day',
     },
     # "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     # "PAGE_SIZE": 3 //DEFAULT PAGINATION
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'watchmate.renderers.FastJSONRenderer',
     ],
 }
+# Counter store behind the sliding-window throttles in user_app.api.throtlling. The cache
+# store needs a backend with atomic incr; SQLiteCounterStore takes {'path': ...} instead.
+WATCHMATE_THROTTLE_STORE = {
+    'BACKEND': 'user_app.api.throtlling.CacheCounterStore',
+    'OPTIONS': {'alias': 'default'},
+}
+# Token -> user cache behind user_app.api.authentication.CachedTokenAuthentication.
+# 'local' is a per-process LRU (MAXSIZE entries); 'shared' uses the ALIAS cache so
+# token deletion and user changes are seen by every worker. TTL is in seconds.
+WATCHMATE_TOKEN_CACHE = {
+    'BACKEND': 'local',
+    'MAXSIZE': 10000,
+    'TTL': 300,
+}
+# Revoked JWT ids (see user_app.api.revocation). CAPACITY revocations per token
+# lifetime keep bloom-filter false positives near ERROR_RATE; other workers pick up
+# revocations through the ALIAS cache within SYNC_INTERVAL seconds.
+WATCHMATE_JWT_REVOCATION = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 1e-6,
+    'SYNC_INTERVAL': 5,
+    'ALIAS': 'default',
+}
 SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=15),
+    'TOKEN_OBTAIN_SERIALIZER': 'user_app.api.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'user_app.api.serializers.RevocationCheckingTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'user_app.api.authentication.ClaimsTokenUser',
 
 }
 LOGGING = {
@@ -179,9 +338,10 @@ LOGGING = {
         },
     },
     "loggers": {
+        # DEBUG would log every SQL statement; per-request numbers are in /metrics instead.
         "django": {
             "handlers": ["file", "console"],
-            "level": "DEBUG",
+            "level": "INFO",
             "propagate": True,
         },
         "watchlist_app": {
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs deferred tasks inline, so tests see their effects without waiting for a
+    worker thread, and turns the response cache off so requests reach the views.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.WATCHMATE_TASKS = {**getattr(settings, 'WATCHMATE_TASKS', {}), 'MODE': 'sync'}
+        settings.WATCHMATE_RESPONSE_CACHE = {**getattr(settings, 'WATCHMATE_RESPONSE_CACHE', {}), 'ENABLED': False}
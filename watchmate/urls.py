@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from watchmate.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('watch/', include('watchlist_app.api.urls')),
     path('accounts/', include('user_app.api.urls')),
+    path('metrics', metrics_view, name='metrics'),
     # path('api-auth/', include('rest_framework.urls')),
 ]